@@ -0,0 +1,119 @@
+import contextvars
+import csv
+import functools
+import os
+import threading
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+ACTION_LOG_COLUMNS = [
+    "client_id",
+    "action",
+    "endpoint",
+    "start",
+    "end",
+    "local_ip",
+    "local_port",
+]
+
+# Outermost labelled action running in this thread
+CURRENT_ACTION = contextvars.ContextVar("current_action", default=None)
+
+
+def labelled(func):
+    """Attribute the requests made by `func` to it, unless an outer action runs"""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if CURRENT_ACTION.get() is not None:
+            return func(*args, **kwargs)
+        token = CURRENT_ACTION.set(func.__name__)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            CURRENT_ACTION.reset(token)
+
+    return wrapper
+
+
+class _AddressedHTTPConnection(HTTPConnection):
+    """Connection that remembers its local IP and port once connected, since
+    http.client hands its socket to the response when the server will close"""
+
+    local_address = (None, None)
+
+    def connect(self):
+        super().connect()
+        self.local_address = tuple(self.sock.getsockname()[:2])
+
+
+class _AddressedHTTPSConnection(_AddressedHTTPConnection, HTTPSConnection):
+    pass
+
+
+class _AddressedHTTPPool(HTTPConnectionPool):
+    ConnectionCls = _AddressedHTTPConnection
+
+
+class _AddressedHTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _AddressedHTTPSConnection
+
+
+class LocalAddressAdapter(HTTPAdapter):
+    """Transport adapter that sets `local_address`, the (ip, port) the request
+    was sent from or (None, None), on every response"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _AddressedHTTPPool,
+            "https": _AddressedHTTPSPool,
+        }
+
+    def build_response(self, req, resp):
+        response = super().build_response(req, resp)
+        connection = resp.connection
+        response.local_address = getattr(connection, "local_address", (None, None))
+        return response
+
+
+class ActionLog:
+    """Append-only CSV of requests with the action that made them, for labelling
+    captured flows. One row per request, times in Unix seconds."""
+
+    def __init__(self, path: str, client_id: str):
+        self.client_id = client_id
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        # Open for the life of the log and closed by close()
+        self._file = open(path, "a", newline="", buffering=1)  # noqa: SIM115
+        self._writer = csv.writer(self._file)
+        if new_file:
+            self._writer.writerow(ACTION_LOG_COLUMNS)
+
+    def record(
+        self,
+        endpoint: str,
+        start: float,
+        end: float,
+        local_ip: str | None,
+        local_port: int | None,
+    ) -> None:
+        row = [
+            self.client_id,
+            CURRENT_ACTION.get() or "",
+            endpoint,
+            f"{start:.6f}",
+            f"{end:.6f}",
+            local_ip or "",
+            local_port or "",
+        ]
+        with self._lock:
+            self._writer.writerow(row)
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
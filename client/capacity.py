@@ -0,0 +1,224 @@
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import main
+from load_stats import RequestStats
+from request_mix import replay, trace_patterns
+
+logger = logging.getLogger("capacity")
+
+
+def endpoint_mix(pattern_name: str) -> list[tuple]:
+    """Request-level mix of a traffic pattern: every request of its traced cycles,
+    replayed on its own. Capacity tests need single requests rather than whole
+    patterns, whose built-in sleeps cap the rate."""
+    cycles = trace_patterns(main)[pattern_name]["cycles"]
+    return [
+        (partial(replay, main, request), 1) for cycle in cycles for request in cycle
+    ]
+
+
+def rate_schedule(profile: str, start: float, step: float, step_duration: float):
+    """Return offered load (requests/s) as a function of seconds since start"""
+    if profile == "step":
+        return lambda t: start + step * int(t // step_duration)
+    if profile == "ramp":
+        return lambda t: start + step * t / step_duration
+    raise ValueError(f"Unknown load profile: {profile}")
+
+
+def _dispatch(mix, rate_at, begin: float, end: float, pool, slots) -> int:
+    """Issue requests open-loop at the scheduled rate; return requests shed"""
+    actions = [action for action, _ in mix]
+    weights = [weight for _, weight in mix]
+    shed = 0
+    next_at = time.perf_counter()
+
+    while next_at < end:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        # A full pool means the server can no longer keep up with offered load
+        if slots.acquire(blocking=False):
+            action = random.choices(actions, weights=weights, k=1)[0]
+            future = pool.submit(action)
+            future.add_done_callback(lambda _: slots.release())
+        else:
+            shed += 1
+
+        next_at += 1.0 / max(rate_at(next_at - begin), 0.1)
+
+    return shed
+
+
+def find_capacity(
+    mix_name: str,
+    profile: str = "step",
+    start_rps: float = 5.0,
+    step_rps: float = 5.0,
+    step_duration: float = 15.0,
+    max_rps: float = 1000.0,
+    slo_p99_ms: float = 500.0,
+    slo_error_rate: float = 0.01,
+    concurrency: int = 64,
+) -> dict:
+    """Raise offered load on one pattern's endpoint mix until it breaks the SLO"""
+    mix = endpoint_mix(mix_name)
+    rate_at = rate_schedule(profile, start_rps, step_rps, step_duration)
+    slots = threading.BoundedSemaphore(concurrency)
+    windows = []
+    sustainable = None
+
+    logger.info(f"=== Capacity search: {mix_name} ({profile}) ===")
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        begin = time.perf_counter()
+        window = 0
+        while True:
+            window_start = begin + window * step_duration
+            offered = rate_at(window * step_duration + step_duration / 2)
+            if offered > max_rps:
+                logger.info(f"Reached --max-rps {max_rps:.0f} without saturating")
+                break
+
+            main.STATS = RequestStats()
+            shed = _dispatch(
+                mix, rate_at, begin, window_start + step_duration, pool, slots
+            )
+            stats, main.STATS = main.STATS, RequestStats()
+            summary = stats.summary(elapsed=step_duration)
+            total = summary["total"]
+
+            attempted = total["requests"] + shed
+            error_rate = (total["errors"] + shed) / attempted if attempted else 0.0
+            result = {
+                "offered_rps": offered,
+                "achieved_rps": total["rps"],
+                "p50_ms": total["p50_ms"],
+                "p99_ms": total["p99_ms"],
+                "error_rate": error_rate,
+                "shed": shed,
+                "endpoints": summary["endpoints"],
+            }
+            windows.append(result)
+
+            breaches = []
+            if total["p99_ms"] > slo_p99_ms:
+                breaches.append(f"p99 {total['p99_ms']:.0f}ms > {slo_p99_ms:.0f}ms")
+            if error_rate > slo_error_rate:
+                breaches.append(f"errors {error_rate:.1%} > {slo_error_rate:.1%}")
+            if total["rps"] < 0.9 * offered:
+                breaches.append(f"achieved {total['rps']:.1f} < offered {offered:.1f}")
+
+            logger.info(
+                f"[{mix_name}] offered {offered:7.1f} rps -> achieved "
+                f"{total['rps']:7.1f} rps, p99 {total['p99_ms']:7.1f}ms, "
+                f"errors {error_rate:.2%}" + (" - SLO BREACH" if breaches else "")
+            )
+
+            if breaches:
+                logger.info(f"[{mix_name}] Saturation knee: {', '.join(breaches)}")
+                result["breaches"] = breaches
+                break
+
+            sustainable = result
+            window += 1
+
+    return {
+        "mix": mix_name,
+        "profile": profile,
+        "slo": {"p99_ms": slo_p99_ms, "error_rate": slo_error_rate},
+        "max_sustainable_rps": sustainable["achieved_rps"] if sustainable else 0.0,
+        "knee": windows[-1] if windows and "breaches" in windows[-1] else None,
+        "windows": windows,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Find the maximum sustainable request rate of the server"
+    )
+    parser.add_argument(
+        "--mix",
+        action="append",
+        choices=sorted(main.TRAFFIC_PATTERNS),
+        help="endpoint mix to test (repeatable, default: all)",
+    )
+    parser.add_argument("--profile", choices=["step", "ramp"], default="step")
+    parser.add_argument("--start-rps", type=float, default=5.0)
+    parser.add_argument(
+        "--step-rps",
+        type=float,
+        default=5.0,
+        help="load increase per step (or per step-duration when ramping)",
+    )
+    parser.add_argument(
+        "--step-duration",
+        type=float,
+        default=15.0,
+        help="seconds per step; also the SLO evaluation window",
+    )
+    parser.add_argument("--max-rps", type=float, default=1000.0)
+    parser.add_argument(
+        "--slo-p99-ms",
+        type=float,
+        default=float(os.getenv("SLO_P99_MS", "500")),
+    )
+    parser.add_argument(
+        "--slo-error-rate",
+        type=float,
+        default=float(os.getenv("SLO_ERROR_RATE", "0.01")),
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=64,
+        help="maximum requests in flight; excess requests are shed and count as errors",
+    )
+    parser.add_argument(
+        "--cooldown", type=float, default=10.0, help="pause between endpoint mixes"
+    )
+    parser.add_argument("--output", help="write the capacity report to this JSON file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    # Per-request INFO logs would dominate client CPU at high rates
+    main.logger.setLevel(logging.WARNING)
+    main.run_initial_setup()
+
+    reports = []
+    for i, mix_name in enumerate(args.mix or main.TRAFFIC_PATTERNS):
+        if i:
+            time.sleep(args.cooldown)
+        reports.append(
+            find_capacity(
+                mix_name,
+                args.profile,
+                args.start_rps,
+                args.step_rps,
+                args.step_duration,
+                args.max_rps,
+                args.slo_p99_ms,
+                args.slo_error_rate,
+                args.concurrency,
+            )
+        )
+
+    logger.info("=== Maximum sustainable throughput ===")
+    for report in reports:
+        logger.info(f"{report['mix']:<14}{report['max_sustainable_rps']:>10.1f} rps")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(reports, f, indent=2)
+        logger.info(f"Capacity report saved to {args.output}")
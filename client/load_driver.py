@@ -0,0 +1,279 @@
+import argparse
+import json
+import logging
+import multiprocessing as mp
+import os
+import queue
+import signal
+import threading
+import time
+
+import main
+from load_stats import RequestStats
+
+logger = logging.getLogger("load_driver")
+
+# Seconds between checks that workers still owing results are alive
+RESULT_POLL_SECONDS = 1.0
+
+
+def allocate_virtual_users(users: int, patterns: dict) -> list[str]:
+    """Split virtual users across traffic patterns in proportion to their weights"""
+    total_weight = sum(p["weight"] for p in patterns.values())
+    shares = {name: users * p["weight"] / total_weight for name, p in patterns.items()}
+    counts = {name: int(share) for name, share in shares.items()}
+
+    # Hand out the remaining users by largest remainder
+    remaining = users - sum(counts.values())
+    by_remainder = sorted(shares, key=lambda n: shares[n] - counts[n], reverse=True)
+    for name in by_remainder[:remaining]:
+        counts[name] += 1
+
+    # Interleave patterns so that round-robin sharding keeps each worker's mix
+    assignment = []
+    while any(counts.values()):
+        for name in patterns:
+            if counts[name]:
+                assignment.append(name)
+                counts[name] -= 1
+    return assignment
+
+
+def shard(assignment: list[str], workers: int) -> list[list[str]]:
+    """Distribute virtual users round-robin across worker processes"""
+    return [assignment[i::workers] for i in range(workers)]
+
+
+def _virtual_user(pattern_name: str, stop: threading.Event, deadline: float, model):
+    """Repeat one traffic pattern until shutdown is requested"""
+    while not stop.is_set() and time.time() < deadline:
+        try:
+            if model:
+                main.run_model_traffic(model, pattern_name)
+            else:
+                main.run_pattern_based_traffic(main.TRAFFIC_PATTERNS[pattern_name])
+        except Exception:
+            logger.exception(f"[{main.CLIENT_ID}] Virtual user failed")
+
+
+def run_worker(
+    index: int,
+    patterns: list[str],
+    start_at: float,
+    deadline: float,
+    stop,
+    results,
+    log_level: str,
+    traffic_model: str | None,
+) -> None:
+    """Worker process: run its share of virtual users as threads"""
+    # The parent handles Ctrl+C and tells workers to stop via the shared event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.getLogger().setLevel(log_level)
+    main.CLIENT_ID = f"{main.CLIENT_ID}_w{index:02d}"
+    # A log inherited from the parent would still be named after its CLIENT_ID
+    main.ACTION_LOG = None
+    main.run_initial_setup()
+    model = (
+        main.load_traffic_model(traffic_model, main.ACTIONS) if traffic_model else None
+    )
+
+    # Only requests made after the coordinated start count towards the result
+    main.STATS = RequestStats()
+    time.sleep(max(start_at - time.time(), 0))
+    main.STATS.started_at = time.time()
+
+    local_stop = threading.Event()
+    threads = [
+        threading.Thread(
+            target=_virtual_user, args=(name, local_stop, deadline, model), daemon=True
+        )
+        for name in patterns
+    ]
+    for thread in threads:
+        thread.start()
+
+    stop.wait(max(deadline - time.time(), 0))
+    local_stop.set()
+
+    # Requests still draining after the deadline go to a throwaway collector
+    stats, main.STATS = main.STATS, RequestStats()
+    stats.finished_at = time.time()
+
+    # Patterns sleep between actions, so give in-flight cycles a short grace period
+    grace_until = time.time() + 5
+    for thread in threads:
+        thread.join(max(grace_until - time.time(), 0))
+
+    results.put((index, stats))
+
+
+def _next_result(results, running: dict) -> tuple[int, RequestStats]:
+    """Next worker result; fails if a worker in `running` exits without one"""
+    while True:
+        try:
+            return results.get(timeout=RESULT_POLL_SECONDS)
+        except queue.Empty:
+            pass
+        dead = [i for i, process in running.items() if not process.is_alive()]
+        if dead:
+            # A worker's result is flushed before it exits, so it may be in the
+            # queue by now
+            try:
+                return results.get(timeout=RESULT_POLL_SECONDS)
+            except queue.Empty:
+                codes = {i: running[i].exitcode for i in dead}
+                raise RuntimeError(
+                    f"Load workers exited without results (exit codes {codes})"
+                ) from None
+
+
+def run_load(
+    workers: int,
+    users: int,
+    duration: float,
+    warmup: float = 5.0,
+    log_level: str = "WARNING",
+    traffic_model: str | None = None,
+) -> RequestStats:
+    """Start worker processes, run the load for `duration` and merge their stats"""
+    if traffic_model:
+        model = main.load_traffic_model(traffic_model, main.ACTIONS)
+        patterns = {p.name: {"weight": p.weight} for p in model.patterns}
+    else:
+        patterns = main.TRAFFIC_PATTERNS
+    assignment = allocate_virtual_users(users, patterns)
+    shards = [s for s in shard(assignment, workers) if s]
+
+    ctx = mp.get_context("spawn")
+    stop = ctx.Event()
+    results = ctx.Queue()
+    start_at = time.time() + warmup
+    deadline = start_at + duration
+
+    processes = [
+        ctx.Process(
+            target=run_worker,
+            args=(
+                i,
+                names,
+                start_at,
+                deadline,
+                stop,
+                results,
+                log_level,
+                traffic_model,
+            ),
+            name=f"load-worker-{i}",
+        )
+        for i, names in enumerate(shards)
+    ]
+    logger.info(
+        f"Starting {len(processes)} workers with {users} virtual users "
+        f"for {duration:.0f}s"
+    )
+    for process in processes:
+        process.start()
+
+    merged = RequestStats()
+    running = dict(enumerate(processes))
+    try:
+        while running:
+            index, stats = _next_result(results, running)
+            del running[index]
+            logger.info(
+                f"Worker {index} finished: {sum(stats.requests.values())} requests"
+            )
+            merged.merge(stats)
+    except KeyboardInterrupt:
+        logger.info("Interrupted, stopping workers")
+        stop.set()
+        while running:
+            index, stats = _next_result(results, running)
+            del running[index]
+            merged.merge(stats)
+    finally:
+        # Workers whose results are not read, because one died or the drain
+        # was interrupted, would keep running and block the join
+        for process in running.values():
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+
+    return merged
+
+
+def log_summary(summary: dict) -> None:
+    """Log the merged per-endpoint summary as a table"""
+    logger.info(f"=== Load summary ({summary['elapsed_s']:.1f}s) ===")
+    header = f"{'endpoint':<28}{'requests':>10}{'errors':>8}{'rps':>10}"
+    header += f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    logger.info(header)
+    rows = list(summary["endpoints"].items()) + [("TOTAL", summary["total"])]
+    for endpoint, s in rows:
+        logger.info(
+            f"{endpoint:<28}{s['requests']:>10}{s['errors']:>8}{s['rps']:>10.1f}"
+            f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Multi-process load driver for the HTTPS client"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("LOAD_WORKERS", os.cpu_count() or 1)),
+        help="worker processes (default: number of CPU cores)",
+    )
+    parser.add_argument(
+        "--users",
+        type=int,
+        default=int(os.getenv("LOAD_USERS", "20")),
+        help="total virtual users, spread across workers",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=float(os.getenv("LOAD_DURATION", "60")),
+        help="seconds of load after the coordinated start",
+    )
+    parser.add_argument(
+        "--warmup",
+        type=float,
+        default=5.0,
+        help="seconds allowed for workers to start and log in",
+    )
+    parser.add_argument("--output", help="write the merged summary to this JSON file")
+    parser.add_argument(
+        "--traffic-model",
+        default=main.TRAFFIC_MODEL,
+        help="Markov-chain traffic model file instead of TRAFFIC_PATTERNS",
+    )
+    parser.add_argument(
+        "--worker-log-level",
+        default=os.getenv("LOAD_LOG_LEVEL", "WARNING"),
+        help="log level inside workers (per-request INFO logging costs CPU)",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    stats = run_load(
+        args.workers,
+        args.users,
+        args.duration,
+        args.warmup,
+        args.worker_log_level,
+        args.traffic_model,
+    )
+    summary = stats.summary()
+    log_summary(summary)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        logger.info(f"Summary saved to {args.output}")
@@ -0,0 +1,89 @@
+import math
+import threading
+from array import array
+
+
+def percentile(values, pct: float) -> float:
+    """Return the nearest-rank percentile of an already sorted sequence"""
+    if not values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(values)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+class RequestStats:
+    """Per-endpoint request counters and latencies, mergeable across workers"""
+
+    def __init__(self):
+        self.requests = {}
+        self.errors = {}
+        self.latencies = {}
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, latency: float, ok: bool) -> None:
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            self.latencies.setdefault(endpoint, array("d")).append(latency)
+
+    def merge(self, other: "RequestStats") -> None:
+        with self._lock:
+            for endpoint, count in other.requests.items():
+                self.requests[endpoint] = self.requests.get(endpoint, 0) + count
+            for endpoint, count in other.errors.items():
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + count
+            for endpoint, values in other.latencies.items():
+                self.latencies.setdefault(endpoint, array("d")).extend(values)
+            if other.started_at is not None:
+                self.started_at = min(
+                    self.started_at or other.started_at, other.started_at
+                )
+            if other.finished_at is not None:
+                self.finished_at = max(self.finished_at or 0.0, other.finished_at)
+
+    def summary(self, elapsed: float | None = None) -> dict:
+        """Summarize throughput, error rate and latency percentiles (ms)"""
+        if elapsed is None and self.started_at and self.finished_at:
+            elapsed = self.finished_at - self.started_at
+        elapsed = elapsed or 0.0
+
+        def describe(requests: int, errors: int, values) -> dict:
+            ordered = sorted(values)
+            return {
+                "requests": requests,
+                "errors": errors,
+                "error_rate": errors / requests if requests else 0.0,
+                "rps": requests / elapsed if elapsed else 0.0,
+                "p50_ms": percentile(ordered, 50) * 1000,
+                "p95_ms": percentile(ordered, 95) * 1000,
+                "p99_ms": percentile(ordered, 99) * 1000,
+                "max_ms": (ordered[-1] if ordered else 0.0) * 1000,
+            }
+
+        with self._lock:
+            endpoints = {
+                endpoint: describe(
+                    count, self.errors.get(endpoint, 0), self.latencies[endpoint]
+                )
+                for endpoint, count in sorted(self.requests.items())
+            }
+            everything = array("d")
+            for values in self.latencies.values():
+                everything.extend(values)
+            total = describe(
+                sum(self.requests.values()), sum(self.errors.values()), everything
+            )
+
+        return {"elapsed_s": elapsed, "total": total, "endpoints": endpoints}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
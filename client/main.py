@@ -1,9 +1,17 @@
-import requests
-import urllib3
-import time
+import contextvars
 import logging
-import random
 import os
+import random
+import threading
+import time
+
+import requests
+import urllib3
+
+from action_log import ActionLog, LocalAddressAdapter, labelled
+from load_stats import RequestStats
+from payloads import JSON_HEADERS, PayloadCorpus, build_echo_corpus, metadata_payload
+from traffic_model import TrafficModel, load_traffic_model
 
 logging.basicConfig(
     level=logging.INFO,
@@ -17,30 +25,126 @@ logging.getLogger("urllib3").setLevel(logging.WARNING)
 # Disable SSL warnings for self-signed certificates
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-BASE_URL = "https://server:8443"
+BASE_URL = os.getenv("BASE_URL", "https://server:8443")
 SESSION_TOKEN = None
 CURRENT_USER = None
 
 # Get client instance ID from environment or generate random one
 CLIENT_ID = os.getenv("CLIENT_ID", f"client_{random.randint(1000, 9999)}")
 
+# Per-endpoint request statistics, collected by the load driver
+STATS = RequestStats()
+
+# Per-client request log in this directory, used to label captured flows. Opened
+# on the first request so that load driver workers log under their own CLIENT_ID
+ACTION_LOG_DIR = os.getenv("ACTION_LOG_DIR")
+ACTION_LOG: ActionLog | None = None
+_ACTION_LOG_LOCK = threading.Lock()
+
+# Payload size distribution for the `custom` /echo tier, e.g. "lognormal:median=65536"
+PAYLOAD_DISTRIBUTION = os.getenv("PAYLOAD_DISTRIBUTION")
+PAYLOAD_VARIANTS = int(os.getenv("PAYLOAD_VARIANTS", "16"))
+
+# Pre-encoded request bodies, built on first use
+ECHO_PAYLOADS: dict[str, PayloadCorpus] = {}
+METADATA_PAYLOADS: PayloadCorpus | None = None
+
+# Request sender, sleep, random source and user of the pattern running in this
+# context, when run_pattern_based_traffic was given its own
+_SENDER = contextvars.ContextVar("sender", default=None)
+_SLEEPER = contextvars.ContextVar("sleeper", default=None)
+_RNG = contextvars.ContextVar("rng", default=None)
+_USER = contextvars.ContextVar("user", default=None)
+
+
+def build_payload_corpus():
+    """Encode all request bodies once so the request loop only sends bytes"""
+    global METADATA_PAYLOADS
+
+    ECHO_PAYLOADS.update(
+        build_echo_corpus(CLIENT_ID, PAYLOAD_VARIANTS, PAYLOAD_DISTRIBUTION)
+    )
+    METADATA_PAYLOADS = PayloadCorpus.build(metadata_payload, PAYLOAD_VARIANTS * 4)
+    sizes = {tier: max(map(len, c.bodies)) for tier, c in ECHO_PAYLOADS.items()}
+    logger.info(f"[{CLIENT_ID}] Payload corpus ready, max bytes per tier: {sizes}")
+
+
+def action_log() -> ActionLog | None:
+    """This client's action log, opened under the current CLIENT_ID on first use"""
+    global ACTION_LOG
+    if ACTION_LOG is None and ACTION_LOG_DIR:
+        with _ACTION_LOG_LOCK:
+            if ACTION_LOG is None:
+                path = os.path.join(ACTION_LOG_DIR, f"{CLIENT_ID}.csv")
+                ACTION_LOG = ActionLog(path, CLIENT_ID)
+    return ACTION_LOG
+
+
+def _send(method: str, path: str, route: str | None = None, **kwargs):
+    """Send a request through the running pattern's sender, or to the server"""
+    send = _SENDER.get()
+    if send is not None:
+        return send(method, path, route, **kwargs)
+    return _send_http(method, path, route, **kwargs)
+
+
+def _sleep(seconds: float):
+    """Pause the running pattern"""
+    (_SLEEPER.get() or time.sleep)(seconds)
+
 
+def _rng():
+    """Random source of the running pattern"""
+    return _RNG.get() or random
+
+
+def _current_user() -> str | None:
+    """User the running pattern acts as"""
+    return _USER.get() or CURRENT_USER
+
+
+def _send_http(method: str, path: str, route: str | None = None, **kwargs):
+    """Send a request to the server and record its latency under its route"""
+    endpoint = f"{method} {route or path}"
+    started_at = time.time()
+    start = time.perf_counter()
+    try:
+        # A new session per request, as requests.request uses, with an adapter
+        # that reports the local port the request was sent from
+        with requests.Session() as session:
+            session.mount("https://", LocalAddressAdapter())
+            session.mount("http://", LocalAddressAdapter())
+            response = session.request(
+                method, f"{BASE_URL}{path}", verify=False, **kwargs
+            )
+        local_ip, local_port = response.local_address
+    except Exception:
+        STATS.record(endpoint, time.perf_counter() - start, ok=False)
+        raise
+    elapsed = time.perf_counter() - start
+    STATS.record(endpoint, elapsed, ok=response.status_code < 500)
+    log = action_log()
+    if log is not None:
+        log.record(endpoint, started_at, started_at + elapsed, local_ip, local_port)
+    return response
+
+
+@labelled
 def test_connection():
     """Test basic GET request - creates quick, small flows"""
     try:
-        response = requests.get(f"{BASE_URL}/", verify=False)
+        response = _send("GET", "/")
         logger.info(f"[{CLIENT_ID}] Connection test - Status: {response.status_code}")
     except Exception as e:
         logger.error(f"[{CLIENT_ID}] Connection test failed: {e}")
 
 
+@labelled
 def register_user(username: str, email: str, password: str):
     """Register a new user - small POST request"""
     try:
         payload = {"username": username, "email": email, "password": password}
-        response = requests.post(
-            f"{BASE_URL}/users/register", json=payload, verify=False
-        )
+        response = _send("POST", "/users/register", json=payload)
 
         if response.status_code == 201 or response.status_code == 200:
             logger.info(f"[{CLIENT_ID}] User registered: {username}")
@@ -56,13 +160,14 @@ def register_user(username: str, email: str, password: str):
         return False
 
 
+@labelled
 def login_user(username: str, password: str):
     """Login user and get session token - interactive flow"""
     global SESSION_TOKEN, CURRENT_USER
 
     try:
         payload = {"username": username, "password": password}
-        response = requests.post(f"{BASE_URL}/users/login", json=payload, verify=False)
+        response = _send("POST", "/users/login", json=payload)
 
         if response.status_code == 200:
             data = response.json()
@@ -78,14 +183,16 @@ def login_user(username: str, password: str):
         return False
 
 
-def get_user_info(username: str | None):
+@labelled
+def get_user_info(username: str | None = None):
     """Get user information - small GET request"""
+    username = username or _current_user()
     if username is None:
         logger.warning(f"[{CLIENT_ID}] Cannot get user information: not logged in")
         return
 
     try:
-        response = requests.get(f"{BASE_URL}/users/{username}", verify=False)
+        response = _send("GET", f"/users/{username}", route="/users/{username}")
 
         if response.status_code == 200:
             logger.info(f"[{CLIENT_ID}] User info retrieved for {username}")
@@ -97,19 +204,21 @@ def get_user_info(username: str | None):
         logger.error(f"[{CLIENT_ID}] Get user info failed: {e}")
 
 
+@labelled
 def send_message(content: str):
     """Send a message - variable size POST"""
-    if not CURRENT_USER:
+    user = _current_user()
+    if not user:
         logger.warning(f"[{CLIENT_ID}] Cannot send message: not logged in")
         return
 
     try:
         payload = {
-            "user_id": CURRENT_USER,
+            "user_id": user,
             "content": content,
             "timestamp": time.time(),
         }
-        response = requests.post(f"{BASE_URL}/messages", json=payload, verify=False)
+        response = _send("POST", "/messages", json=payload)
 
         if response.status_code == 200:
             logger.info(f"[{CLIENT_ID}] Message sent ({len(content)} chars)")
@@ -119,12 +228,11 @@ def send_message(content: str):
         logger.error(f"[{CLIENT_ID}] Send message failed: {e}")
 
 
+@labelled
 def get_messages(limit: int = 5):
     """Retrieve messages - medium response size"""
     try:
-        response = requests.get(
-            f"{BASE_URL}/messages", params={"limit": limit, "offset": 0}, verify=False
-        )
+        response = _send("GET", "/messages", params={"limit": limit, "offset": 0})
 
         if response.status_code == 200:
             data = response.json()
@@ -137,10 +245,11 @@ def get_messages(limit: int = 5):
         logger.error(f"[{CLIENT_ID}] Get messages failed: {e}")
 
 
+@labelled
 def get_data():
     """Test GET request with data - small dataset"""
     try:
-        response = requests.get(f"{BASE_URL}/data", verify=False)
+        response = _send("GET", "/data")
 
         if response.status_code == 200:
             logger.info(f"[{CLIENT_ID}] GET /data - Small dataset retrieved")
@@ -148,10 +257,11 @@ def get_data():
         logger.error(f"[{CLIENT_ID}] GET /data failed: {e}")
 
 
+@labelled
 def get_large_data():
     """Get large dataset - creates large transfer flows"""
     try:
-        response = requests.get(f"{BASE_URL}/data/large", verify=False)
+        response = _send("GET", "/data/large")
 
         if response.status_code == 200:
             data = response.json()
@@ -162,15 +272,16 @@ def get_large_data():
         logger.error(f"[{CLIENT_ID}] GET /data/large failed: {e}")
 
 
+@labelled
 def search_query(query: str):
     """Perform search - medium interactive flow"""
     try:
         params = {
             "q": query,
-            "category": random.choice(["tech", "science", "news", None]),
-            "limit": random.randint(5, 15),
+            "category": _rng().choice(["tech", "science", "news", None]),
+            "limit": _rng().randint(5, 15),
         }
-        response = requests.get(f"{BASE_URL}/search", params=params, verify=False)
+        response = _send("GET", "/search", params=params)
 
         if response.status_code == 200:
             data = response.json()
@@ -181,16 +292,18 @@ def search_query(query: str):
         logger.error(f"[{CLIENT_ID}] Search failed: {e}")
 
 
+@labelled
 def upload_file_metadata():
     """Upload file metadata - small POST"""
+    if METADATA_PAYLOADS is None:
+        build_payload_corpus()
+
     try:
-        payload = {
-            "filename": f"document_{random.randint(1, 100)}.pdf",
-            "size": random.randint(1024, 1024000),
-            "content_type": "application/pdf",
-        }
-        response = requests.post(
-            f"{BASE_URL}/upload/metadata", json=payload, verify=False
+        response = _send(
+            "POST",
+            "/upload/metadata",
+            data=METADATA_PAYLOADS.next(_rng()),
+            headers=JSON_HEADERS,
         )
 
         if response.status_code == 200:
@@ -199,57 +312,36 @@ def upload_file_metadata():
         logger.error(f"[{CLIENT_ID}] Upload metadata failed: {e}")
 
 
+@labelled
 def post_echo(size: str = "small"):
     """Test POST request with variable payload sizes"""
+    if not ECHO_PAYLOADS:
+        build_payload_corpus()
+
     try:
-        if size == "tiny":
-            payload = {"ping": "pong"}
-        elif size == "small":
-            payload = {
-                "name": "test",
-                "value": random.randint(1, 100),
-                "timestamp": time.time(),
-            }
-        elif size == "medium":
-            payload = {
-                "name": "test",
-                "value": random.randint(1, 100),
-                "timestamp": time.time(),
-                "data": {"nested": "value", "array": list(range(20))},
-                "metadata": {"client": CLIENT_ID, "iteration": random.randint(1, 1000)},
-            }
-        else:  # large
-            payload = {
-                "name": "test",
-                "value": random.randint(1, 100),
-                "timestamp": time.time(),
-                "data": {"nested": "value", "array": list(range(100))},
-                "metadata": {
-                    "client": CLIENT_ID,
-                    "iteration": random.randint(1, 1000),
-                    "description": "A" * 500,  # Large text field
-                },
-                "extra_fields": [{"id": i, "data": f"field_{i}"} for i in range(50)],
-            }
-
-        response = requests.post(f"{BASE_URL}/echo", json=payload, verify=False)
+        body = ECHO_PAYLOADS.get(size, ECHO_PAYLOADS["large"]).next(_rng())
+        response = _send("POST", "/echo", data=body, headers=JSON_HEADERS)
 
         if response.status_code == 200:
-            logger.info(f"[{CLIENT_ID}] POST /echo ({size}) - Success")
+            logger.info(
+                f"[{CLIENT_ID}] POST /echo ({size}, {len(body)} bytes) - Success"
+            )
     except Exception as e:
         logger.error(f"[{CLIENT_ID}] POST /echo failed: {e}")
 
 
+@labelled
 def health_check_polling():
     """Rapid health checks - creates periodic polling pattern"""
     try:
-        response = requests.get(f"{BASE_URL}/health", verify=False)
+        response = _send("GET", "/health")
         if response.status_code == 200:
             logger.info(f"[{CLIENT_ID}] Health check - OK")
     except Exception as e:
         logger.error(f"[{CLIENT_ID}] Health check failed: {e}")
 
 
+@labelled
 def bulk_message_send():
     """Send multiple messages rapidly - creates burst pattern"""
     messages = [
@@ -262,55 +354,62 @@ def bulk_message_send():
 
     for msg in messages:
         send_message(msg)
-        time.sleep(random.uniform(0.1, 0.3))  # Rapid succession
+        _sleep(_rng().uniform(0.1, 0.3))  # Rapid succession
 
 
+@labelled
 def streaming_simulation():
     """Simulate streaming behavior - steady high throughput"""
     logger.info(f"[{CLIENT_ID}] Starting streaming simulation")
     for i in range(5):
         get_large_data()
-        time.sleep(random.uniform(0.5, 1.0))  # Consistent interval
+        _sleep(_rng().uniform(0.5, 1.0))  # Consistent interval
 
 
+@labelled
 def interactive_session():
     """Simulate interactive user session - variable timing"""
     actions = [
         lambda: send_message("User typing..."),
         lambda: get_messages(3),
         lambda: search_query("update"),
-        lambda: get_user_info(CURRENT_USER),
+        lambda: get_user_info(_current_user()),
         lambda: post_echo("small"),
     ]
 
-    for _ in range(random.randint(3, 7)):
-        action = random.choice(actions)
+    for _ in range(_rng().randint(3, 7)):
+        action = _rng().choice(actions)
         action()
-        time.sleep(random.uniform(1, 3))  # Human-like pauses
+        _sleep(_rng().uniform(1, 3))  # Human-like pauses
 
 
+@labelled
 def api_polling_pattern():
     """Simulate API polling - regular intervals"""
     logger.info(f"[{CLIENT_ID}] API polling pattern")
     for _ in range(10):
         get_data()
-        time.sleep(2.0)  # Fixed interval for periodic detection
+        _sleep(2.0)  # Fixed interval for periodic detection
 
 
+@labelled
 def download_heavy_session():
     """Simulate heavy download activity - large transfers"""
     logger.info(f"[{CLIENT_ID}] Heavy download session")
     for _ in range(3):
         get_large_data()
-        time.sleep(random.uniform(0.2, 0.5))
+        _sleep(_rng().uniform(0.2, 0.5))
 
 
+@labelled
 def mixed_size_uploads():
     """Upload different sized payloads - size variability"""
-    sizes = ["tiny", "small", "medium", "large"]
-    for size in sizes:
+    if not ECHO_PAYLOADS:
+        build_payload_corpus()
+
+    for size in list(ECHO_PAYLOADS):
         post_echo(size)
-        time.sleep(random.uniform(0.5, 1.5))
+        _sleep(_rng().uniform(0.5, 1.5))
 
 
 # Traffic pattern definitions
@@ -374,11 +473,38 @@ TRAFFIC_PATTERNS = {
 }
 
 
+# Actions a traffic model file may reference by name
+ACTIONS = {
+    func.__name__: func
+    for func in (
+        test_connection,
+        get_user_info,
+        send_message,
+        get_messages,
+        get_data,
+        get_large_data,
+        search_query,
+        upload_file_metadata,
+        post_echo,
+        health_check_polling,
+        bulk_message_send,
+        streaming_simulation,
+        interactive_session,
+        api_polling_pattern,
+        download_heavy_session,
+        mixed_size_uploads,
+    )
+}
+
+# Optional Markov-chain traffic model (YAML/JSON) replacing TRAFFIC_PATTERNS
+TRAFFIC_MODEL = os.getenv("TRAFFIC_MODEL")
+
+
 def select_traffic_pattern() -> dict:
     """Select a traffic pattern based on weights"""
     patterns = list(TRAFFIC_PATTERNS.keys())
     weights = [TRAFFIC_PATTERNS[p]["weight"] for p in patterns]
-    selected = random.choices(patterns, weights=weights, k=1)[0]
+    selected = _rng().choices(patterns, weights=weights, k=1)[0]
     logger.info(f"[{CLIENT_ID}] Selected traffic pattern: {selected}")
     return TRAFFIC_PATTERNS[selected]
 
@@ -394,6 +520,7 @@ def run_initial_setup():
     ]
 
     logger.info(f"[{CLIENT_ID}] === Starting setup ===")
+    build_payload_corpus()
     test_connection()
     time.sleep(0.5)
 
@@ -411,23 +538,53 @@ def run_initial_setup():
     time.sleep(0.5)
 
 
-def run_pattern_based_traffic():
-    """Run traffic based on selected pattern"""
-    pattern = select_traffic_pattern()
-    actions = pattern["actions"]
-    sleep_range = pattern["sleep_range"]
-
-    for action_func, duration in actions:
-        try:
-            action_func()
-            time.sleep(duration)
-        except Exception as e:
-            logger.error(f"[{CLIENT_ID}] Action failed: {e}")
-
-    # Sleep according to pattern
-    sleep_time = random.uniform(*sleep_range)
-    logger.info(f"[{CLIENT_ID}] Sleeping for {sleep_time:.1f}s")
-    time.sleep(sleep_time)
+def run_pattern_based_traffic(
+    pattern: dict | None = None,
+    send=None,
+    sleep=None,
+    rng: random.Random | None = None,
+    user: str | None = None,
+):
+    """Run traffic based on selected pattern
+
+    `send(method, path, route, **kwargs)`, `sleep(seconds)`, `rng` and `user`
+    replace the HTTP request, time.sleep, the random module and CURRENT_USER
+    for this run only, without affecting other threads.
+    """
+    overrides = ((_SENDER, send), (_SLEEPER, sleep), (_RNG, rng), (_USER, user))
+    tokens = [(var, var.set(value)) for var, value in overrides if value is not None]
+    try:
+        if pattern is None:
+            pattern = select_traffic_pattern()
+        actions = pattern["actions"]
+        sleep_range = pattern["sleep_range"]
+
+        for action_func, duration in actions:
+            try:
+                action_func()
+                _sleep(duration)
+            except Exception as e:
+                logger.error(f"[{CLIENT_ID}] Action failed: {e}")
+
+        # Sleep according to pattern
+        sleep_time = _rng().uniform(*sleep_range)
+        logger.info(f"[{CLIENT_ID}] Sleeping for {sleep_time:.1f}s")
+        _sleep(sleep_time)
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def run_model_traffic(model: TrafficModel, pattern_name: str | None = None):
+    """Run one Markov-chain cycle of a traffic model pattern"""
+    if pattern_name is None:
+        pattern = model.select_pattern()
+        logger.info(f"[{CLIENT_ID}] Selected traffic model pattern: {pattern.name}")
+    else:
+        pattern = model.by_name[pattern_name]
+
+    steps = model.run_cycle(pattern)
+    logger.info(f"[{CLIENT_ID}] Pattern {pattern.name} finished after {steps} actions")
 
 
 if __name__ == "__main__":
@@ -437,10 +594,17 @@ if __name__ == "__main__":
     # Initial setup
     run_initial_setup()
 
+    model = load_traffic_model(TRAFFIC_MODEL, ACTIONS) if TRAFFIC_MODEL else None
+    if model:
+        logger.info(f"[{CLIENT_ID}] Using traffic model {TRAFFIC_MODEL}")
+
     # Main loop with pattern-based traffic
     cycle_count = 0
     while True:
         cycle_count += 1
         logger.info(f"[{CLIENT_ID}] === Cycle {cycle_count} ===")
 
-        run_pattern_based_traffic()
+        if model:
+            run_model_traffic(model)
+        else:
+            run_pattern_based_traffic()
@@ -0,0 +1,148 @@
+import csv
+import json
+import math
+import random
+import time
+from pathlib import Path
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Built-in /echo payload tiers
+ECHO_TIERS = ("tiny", "small", "medium", "large")
+
+
+def encode(payload: dict) -> bytes:
+    """Serialize a payload exactly like requests' json= argument does"""
+    return json.dumps(payload, allow_nan=False).encode("utf-8")
+
+
+def echo_payload(tier: str, client_id: str) -> dict:
+    """Build one /echo payload of a built-in size tier"""
+    if tier == "tiny":
+        return {"ping": "pong"}
+    if tier == "small":
+        return {
+            "name": "test",
+            "value": random.randint(1, 100),
+            "timestamp": time.time(),
+        }
+    if tier == "medium":
+        return {
+            "name": "test",
+            "value": random.randint(1, 100),
+            "timestamp": time.time(),
+            "data": {"nested": "value", "array": list(range(20))},
+            "metadata": {"client": client_id, "iteration": random.randint(1, 1000)},
+        }
+    # large
+    return {
+        "name": "test",
+        "value": random.randint(1, 100),
+        "timestamp": time.time(),
+        "data": {"nested": "value", "array": list(range(100))},
+        "metadata": {
+            "client": client_id,
+            "iteration": random.randint(1, 1000),
+            "description": "A" * 500,  # Large text field
+        },
+        "extra_fields": [{"id": i, "data": f"field_{i}"} for i in range(50)],
+    }
+
+
+def sized_payload(size: int, client_id: str) -> dict:
+    """Build an /echo payload whose encoded body is `size` bytes (or the minimum)"""
+    payload = {
+        "name": "test",
+        "value": random.randint(1, 100),
+        "metadata": {"client": client_id, "target_size": size},
+        "blob": "",
+    }
+    payload["blob"] = "A" * max(size - len(encode(payload)), 0)
+    return payload
+
+
+def metadata_payload() -> dict:
+    """Build one /upload/metadata payload"""
+    return {
+        "filename": f"document_{random.randint(1, 100)}.pdf",
+        "size": random.randint(1024, 1024000),
+        "content_type": "application/pdf",
+    }
+
+
+def parse_size_distribution(spec: str):
+    """Parse a payload size distribution into a sampler returning byte counts
+
+    Supported specs:
+        fixed:<bytes>
+        lognormal:median=<bytes>,sigma=<float>[,max=<bytes>]
+        empirical:<csv path>[:<column>]
+    """
+    kind, _, args = spec.partition(":")
+
+    if kind == "fixed":
+        size = int(args)
+        return lambda: size
+
+    if kind == "lognormal":
+        params = dict(item.split("=", 1) for item in args.split(",") if item)
+        mu = math.log(float(params["median"]))
+        sigma = float(params.get("sigma", 1.0))
+        upper = int(float(params.get("max", 64 * 1024 * 1024)))
+        return lambda: min(int(random.lognormvariate(mu, sigma)), upper)
+
+    if kind == "empirical":
+        path, column = args, None
+        if not Path(path).exists() and ":" in path:
+            path, column = path.rsplit(":", 1)
+        sizes = _read_sizes(Path(path), column)
+        return lambda: random.choice(sizes)
+
+    raise ValueError(f"Unknown payload size distribution: {spec}")
+
+
+def _read_sizes(path: Path, column: str | None) -> list[int]:
+    """Read sizes from `column` of a CSV (default: `size`, else the first column)"""
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        if column is None:
+            column = "size" if "size" in reader.fieldnames else reader.fieldnames[0]
+        sizes = [int(float(row[column])) for row in reader if row[column]]
+    if not sizes:
+        raise ValueError(f"No sizes found in column '{column}' of {path}")
+    return sizes
+
+
+class PayloadCorpus:
+    """A fixed set of pre-encoded request bodies, sampled in O(1)"""
+
+    def __init__(self, bodies: list[bytes]):
+        self.bodies = bodies
+
+    @classmethod
+    def build(cls, factory, variants: int) -> "PayloadCorpus":
+        return cls([encode(factory()) for _ in range(variants)])
+
+    def next(self, rng=random) -> bytes:
+        return self.bodies[rng.randrange(len(self.bodies))]
+
+    def __len__(self) -> int:
+        return len(self.bodies)
+
+
+def build_echo_corpus(
+    client_id: str, variants: int = 16, distribution: str | None = None
+) -> dict[str, PayloadCorpus]:
+    """Pre-encode /echo bodies for every tier, plus a `custom` tier if configured"""
+    corpus = {
+        tier: PayloadCorpus.build(
+            lambda tier=tier: echo_payload(tier, client_id), variants
+        )
+        for tier in ECHO_TIERS
+    }
+    if distribution:
+        sample_size = parse_size_distribution(distribution)
+        corpus["custom"] = PayloadCorpus.build(
+            lambda: sized_payload(sample_size(), client_id), variants
+        )
+    return corpus
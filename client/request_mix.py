@@ -0,0 +1,106 @@
+import contextvars
+import logging
+import random
+
+from action_log import CURRENT_ACTION
+
+# Cycles traced per pattern; composite actions such as interactive_session pick
+# their requests at random, so a single cycle is not representative
+TRACE_CYCLES = 20
+# User the traced requests are made as when the client is not logged in
+TRACE_USER = "trace"
+
+
+class TracedRequest:
+    """One request of a traced pattern cycle and the action that made it"""
+
+    __slots__ = ("action", "kwargs", "method", "path", "route")
+
+    def __init__(self, action, method, path, route, kwargs):
+        self.action = action
+        self.method = method
+        self.path = path
+        self.route = route
+        self.kwargs = kwargs
+
+    @property
+    def endpoint(self) -> str:
+        return f"{self.method} {self.route or self.path}"
+
+
+class _TracedResponse:
+    """A successful response with an empty JSON body"""
+
+    status_code = 200
+
+    def json(self) -> dict:
+        return {}
+
+
+# Set while trace_patterns runs patterns in this context
+_TRACING = contextvars.ContextVar("tracing", default=False)
+
+
+class _QuietWhileTracing(logging.Filter):
+    """Drop the client's log records of patterns run by trace_patterns"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not _TRACING.get()
+
+
+_QUIET = _QuietWhileTracing()
+
+
+def trace_patterns(client, cycles: int = TRACE_CYCLES, seed: int = 0) -> dict:
+    """Requests made by `cycles` cycles of every TRAFFIC_PATTERNS entry
+
+    `client` is the client's main module. Its patterns run with a sender that
+    records requests instead of sending them, no sleeps and a random source
+    seeded with `seed`, so that every caller sees the same cycles. The client's
+    globals and other threads are left alone. Returns {pattern: {"weight",
+    "cycles"}} with each cycle a list of TracedRequest.
+    """
+    if not client.ECHO_PAYLOADS:
+        client.build_payload_corpus()
+    rng = random.Random(seed)
+    user = client.CURRENT_USER or TRACE_USER
+    client.logger.addFilter(_QUIET)
+    token = _TRACING.set(True)
+    try:
+        return {
+            name: {
+                "weight": pattern["weight"],
+                "cycles": [
+                    _trace_cycle(client, pattern, rng, user) for _ in range(cycles)
+                ],
+            }
+            for name, pattern in client.TRAFFIC_PATTERNS.items()
+        }
+    finally:
+        _TRACING.reset(token)
+
+
+def _trace_cycle(client, pattern: dict, rng: random.Random, user: str) -> list:
+    """Requests of one cycle of `pattern`, recorded instead of sent"""
+    cycle = []
+
+    def record(method: str, path: str, route: str | None, **kwargs):
+        action = CURRENT_ACTION.get()
+        cycle.append(TracedRequest(action, method, path, route, kwargs))
+        return _TracedResponse()
+
+    client.run_pattern_based_traffic(
+        pattern, send=record, sleep=lambda _: None, rng=rng, user=user
+    )
+    return cycle
+
+
+def replay(client, request: TracedRequest):
+    """Send a traced request through the client, attributed to its action"""
+    token = CURRENT_ACTION.set(request.action)
+    try:
+        return client._send(
+            request.method, request.path, request.route, **request.kwargs
+        )
+    finally:
+        CURRENT_ACTION.reset(token)
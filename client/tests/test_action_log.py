@@ -0,0 +1,40 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from action_log import LocalAddressAdapter
+
+
+class PeerHandler(BaseHTTPRequestHandler):
+    """Answers with the client address the server saw"""
+
+    def do_GET(self):
+        body = f"{self.client_address[0]}:{self.client_address[1]}".encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.mark.parametrize("protocol", ["HTTP/1.0", "HTTP/1.1"])
+def test_response_carries_local_address(protocol, monkeypatch):
+    # HTTP/1.0 closes the connection, so http.client hands the socket over
+    monkeypatch.setattr(PeerHandler, "protocol_version", protocol)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PeerHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with requests.Session() as session:
+            session.mount("http://", LocalAddressAdapter())
+            response = session.get(f"http://127.0.0.1:{server.server_port}/")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    ip, port = response.local_address
+    assert response.text == f"{ip}:{port}"
@@ -0,0 +1,94 @@
+import random
+import threading
+from collections import Counter
+from types import SimpleNamespace
+
+import main
+from request_mix import TRACE_USER, replay, trace_patterns
+
+
+def test_traces_every_pattern_without_sending(monkeypatch):
+    sent = []
+    monkeypatch.setattr(main, "_send_http", lambda *args, **kwargs: sent.append(args))
+    if not main.ECHO_PAYLOADS:
+        main.build_payload_corpus()
+    user = main.CURRENT_USER
+    state = random.getstate()
+    traced = trace_patterns(main, cycles=3)
+
+    assert traced.keys() == main.TRAFFIC_PATTERNS.keys()
+    assert sent == []
+    assert main.CURRENT_USER == user
+    assert random.getstate() == state
+    for name, pattern in traced.items():
+        assert pattern["weight"] == main.TRAFFIC_PATTERNS[name]["weight"]
+        assert len(pattern["cycles"]) == 3
+
+
+def test_runner_overrides_stay_in_their_thread(monkeypatch):
+    sent = []
+    monkeypatch.setattr(main, "_send_http", lambda *args, **kwargs: sent.append(args))
+    recorded = []
+    sleeping, resume = threading.Event(), threading.Event()
+
+    def sleep(seconds):
+        sleeping.set()
+        resume.wait(5)
+
+    def record(method, path, route, **kwargs):
+        recorded.append((method, path))
+        return SimpleNamespace(status_code=200)
+
+    pattern = {"actions": [(main.get_data, 0)], "sleep_range": (0, 0)}
+    runner = threading.Thread(
+        target=main.run_pattern_based_traffic,
+        args=(pattern,),
+        kwargs={"send": record, "sleep": sleep, "user": "other"},
+    )
+    runner.start()
+    assert sleeping.wait(5)
+    # The runner is paused inside the pattern; this thread is unaffected
+    main._send("GET", "/health")
+    assert main._current_user() == main.CURRENT_USER
+    resume.set()
+    runner.join(5)
+    assert recorded == [("GET", "/data")]
+    assert sent == [("GET", "/health", None)]
+
+
+def test_composite_actions_are_expanded():
+    traced = trace_patterns(main, cycles=1)
+    (api_client,) = traced["api_client"]["cycles"]
+    assert Counter(r.endpoint for r in api_client) == {
+        "GET /health": 1,
+        "GET /data": 11,
+    }
+    assert {r.action for r in api_client} == {
+        "health_check_polling",
+        "get_data",
+        "api_polling_pattern",
+    }
+    (bursty,) = traced["bursty"]["cycles"]
+    assert Counter(r.endpoint for r in bursty) == {
+        "POST /messages": 5,
+        "GET /data/large": 5,
+        "POST /echo": 5,
+    }
+
+
+def test_tracing_is_seeded():
+    def endpoints(traced):
+        return [[r.endpoint for r in c] for c in traced["interactive"]["cycles"]]
+
+    assert endpoints(trace_patterns(main, seed=1)) == endpoints(
+        trace_patterns(main, seed=1)
+    )
+
+
+def test_replay_sends_the_traced_request(monkeypatch):
+    cycles = trace_patterns(main)["interactive"]["cycles"]
+    request = next(r for c in cycles for r in c if r.route is not None)
+    sent = []
+    monkeypatch.setattr(main, "_send", lambda *args, **kwargs: sent.append(args))
+    replay(main, request)
+    assert sent == [("GET", f"/users/{TRACE_USER}", "/users/{username}")]
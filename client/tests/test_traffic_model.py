@@ -0,0 +1,93 @@
+import random
+from collections import Counter
+
+import pytest
+
+from traffic_model import (
+    END,
+    TrafficModel,
+    build_alias_table,
+    compile_pattern,
+    sample_alias,
+)
+
+
+def alias_distribution(prob: list[float], alias: list[int]) -> list[float]:
+    """Exact probability of each index under an alias table."""
+    n = len(prob)
+    mass = [p / n for p in prob]
+    for i, p in enumerate(prob):
+        mass[alias[i]] += (1 - p) / n
+    return mass
+
+
+@pytest.mark.parametrize(
+    "weights",
+    [[1], [1, 1, 1, 1], [1, 2, 3, 4], [0.7, 0.2, 0.1], [1000, 1, 0.001, 5]],
+)
+def test_alias_table_reproduces_weights(weights):
+    prob, alias = build_alias_table(weights)
+    total = sum(weights)
+    assert alias_distribution(prob, alias) == pytest.approx(
+        [w / total for w in weights], abs=1e-12
+    )
+
+
+def test_alias_sampling_frequencies():
+    random.seed(0)
+    weights = [5, 1, 3, 1]
+    prob, alias = build_alias_table(weights)
+    draws = 100_000
+    counts = Counter(sample_alias(prob, alias) for _ in range(draws))
+    for i, weight in enumerate(weights):
+        expected = weight / sum(weights)
+        # Five standard deviations of a binomial proportion
+        tolerance = 5 * (expected * (1 - expected) / draws) ** 0.5
+        assert counts[i] / draws == pytest.approx(expected, abs=tolerance)
+
+
+def test_zero_weight_is_never_sampled():
+    random.seed(1)
+    prob, alias = build_alias_table([1, 0, 1])
+    assert alias_distribution(prob, alias)[1] == 0
+    assert 1 not in {sample_alias(prob, alias) for _ in range(10_000)}
+
+
+@pytest.mark.parametrize("weights", [[], [0, 0]])
+def test_alias_table_needs_positive_weight(weights):
+    with pytest.raises(ValueError):
+        build_alias_table(weights)
+
+
+def test_compiled_transitions_drop_zero_weights():
+    actions = {"home": lambda: None, "search": lambda: None}
+    spec = {
+        "states": {
+            "home": {"action": "home", "next": {"search": 3, "home": 0, END: 1}},
+            "search": {"action": "search"},
+        }
+    }
+    pattern = compile_pattern("browse", spec, actions)
+    home = pattern.states[0]
+    assert home.targets == [1, -1]
+    assert alias_distribution(home.prob, home.alias) == pytest.approx([0.75, 0.25])
+
+
+def test_failing_action_does_not_end_the_cycle(caplog):
+    calls = []
+
+    def fail():
+        calls.append("fail")
+        raise RuntimeError("server unreachable")
+
+    actions = {"fail": fail, "home": lambda: calls.append("home")}
+    spec = {
+        "states": {
+            "fail": {"action": "fail", "next": {"home": 1}},
+            "home": {"action": "home"},
+        }
+    }
+    model = TrafficModel([compile_pattern("browse", spec, actions)])
+    assert model.run_cycle(model.patterns[0], sleep=lambda _: None) == 2
+    assert calls == ["fail", "home"]
+    assert "browse.fail failed" in caplog.text
@@ -0,0 +1,208 @@
+import json
+import logging
+import math
+import random
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+END = "end"
+
+
+def build_alias_table(weights: list[float]) -> tuple[list[float], list[int]]:
+    """Vose's alias method: O(n) setup for O(1) sampling from a discrete distribution"""
+    n = len(weights)
+    total = sum(weights)
+    if n == 0 or total <= 0:
+        raise ValueError("Alias table needs at least one positive weight")
+
+    scaled = [w * n / total for w in weights]
+    prob = [1.0] * n
+    alias = list(range(n))
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+    while small and large:
+        s, g = small.pop(), large.pop()
+        prob[s], alias[s] = scaled[s], g
+        scaled[g] -= 1.0 - scaled[s]
+        (small if scaled[g] < 1.0 else large).append(g)
+
+    # Leftovers are 1.0 up to rounding error
+    return prob, alias
+
+
+def sample_alias(prob: list[float], alias: list[int]) -> int:
+    """Draw one index from an alias table using a single random number"""
+    u = random.random() * len(prob)
+    i = int(u)
+    return i if u - i < prob[i] else alias[i]
+
+
+def compile_think_time(spec) -> Callable[[], float]:
+    """Compile a think-time spec into a zero-argument sampler returning seconds
+
+    Supported specs: a number, {fixed: s}, {uniform: [low, high]},
+    {exponential: mean}, {normal: [mean, std]}, {lognormal: {median: s, sigma: x}}
+    """
+    if spec is None:
+        return lambda: 0.0
+    if isinstance(spec, (int, float)):
+        return lambda: float(spec)
+    if not isinstance(spec, dict) or len(spec) != 1:
+        raise ValueError(f"Invalid think_time: {spec!r}")
+
+    ((kind, value),) = spec.items()
+    if kind == "fixed":
+        return lambda: float(value)
+    if kind == "uniform":
+        low, high = value
+        return lambda: random.uniform(low, high)
+    if kind == "exponential":
+        rate = 1.0 / value
+        return lambda: random.expovariate(rate)
+    if kind == "normal":
+        mean, std = value
+        return lambda: max(random.gauss(mean, std), 0.0)
+    if kind == "lognormal":
+        mu, sigma = math.log(value["median"]), value.get("sigma", 1.0)
+        return lambda: random.lognormvariate(mu, sigma)
+    raise ValueError(f"Unknown think_time distribution: {kind}")
+
+
+class CompiledState:
+    """One state of a compiled chain: its bound action, think-time sampler and
+    alias table over the next states"""
+
+    __slots__ = ("alias", "call", "name", "prob", "targets", "think")
+
+    def __init__(self, name, call, think, prob, alias, targets):
+        self.name = name
+        self.call = call
+        self.think = think
+        self.prob = prob
+        self.alias = alias
+        self.targets = targets  # state indices, -1 ends the chain
+
+
+class CompiledPattern:
+    """A compiled chain: its states, the alias table of its start state, the
+    step limit of one cycle and the sleep after it"""
+
+    __slots__ = ("end_sleep", "max_steps", "name", "start", "states", "weight")
+
+    def __init__(self, name, weight, states, start, max_steps, end_sleep):
+        self.name = name
+        self.weight = weight
+        self.states = states
+        self.start = start  # (prob, alias, targets)
+        self.max_steps = max_steps
+        self.end_sleep = end_sleep
+
+
+def _transition_table(next_spec: dict, index: dict, where: str):
+    targets = []
+    weights = []
+    for target, weight in next_spec.items():
+        if target != END and target not in index:
+            raise ValueError(f"{where}: unknown state '{target}'")
+        if weight < 0:
+            raise ValueError(f"{where}: negative probability for '{target}'")
+        if weight > 0:
+            targets.append(-1 if target == END else index[target])
+            weights.append(weight)
+    prob, alias = build_alias_table(weights)
+    return prob, alias, targets
+
+
+def _bind_action(state: dict, actions: dict, where: str):
+    name = state.get("action")
+    if name not in actions:
+        raise ValueError(f"{where}: unknown action '{name}'")
+    func = actions[name]
+    args = list(state.get("args", []))
+    # Payload references name a pre-encoded corpus tier, e.g. post_echo("large")
+    if "payload" in state:
+        args.append(state["payload"])
+    return (lambda: func(*args)) if args else func
+
+
+def compile_pattern(name: str, spec: dict, actions: dict) -> CompiledPattern:
+    states_spec = spec["states"]
+    index = {state: i for i, state in enumerate(states_spec)}
+
+    states = []
+    for state_name, state in states_spec.items():
+        where = f"{name}.{state_name}"
+        states.append(
+            CompiledState(
+                state_name,
+                _bind_action(state, actions, where),
+                compile_think_time(state.get("think_time")),
+                *_transition_table(state.get("next", {END: 1}), index, where),
+            )
+        )
+
+    start = spec.get("start", next(iter(states_spec)))
+    if isinstance(start, str):
+        start = {start: 1}
+
+    return CompiledPattern(
+        name,
+        spec.get("weight", 1),
+        states,
+        _transition_table(start, index, f"{name}.start"),
+        spec.get("max_steps", 100),
+        compile_think_time(spec.get("end_sleep")),
+    )
+
+
+class TrafficModel:
+    """Markov-chain traffic patterns compiled into alias tables"""
+
+    def __init__(self, patterns: list[CompiledPattern]):
+        self.patterns = patterns
+        self.by_name = {p.name: p for p in patterns}
+        self._prob, self._alias = build_alias_table([p.weight for p in patterns])
+
+    def select_pattern(self) -> CompiledPattern:
+        return self.patterns[sample_alias(self._prob, self._alias)]
+
+    def run_cycle(self, pattern: CompiledPattern, sleep=time.sleep) -> int:
+        """Walk one chain from its start state until `end`; return actions run"""
+        prob, alias, targets = pattern.start
+        current = targets[sample_alias(prob, alias)]
+        steps = 0
+
+        while current >= 0 and steps < pattern.max_steps:
+            state = pattern.states[current]
+            try:
+                state.call()
+            except Exception:
+                logger.exception(f"Action {pattern.name}.{state.name} failed")
+            sleep(state.think())
+            steps += 1
+            current = state.targets[sample_alias(state.prob, state.alias)]
+
+        sleep(pattern.end_sleep())
+        return steps
+
+
+def load_traffic_model(path: str, actions: dict) -> TrafficModel:
+    """Load a YAML or JSON traffic model file and compile it"""
+    text = Path(path).read_text()
+    if path.endswith(".json"):
+        spec = json.loads(text)
+    else:
+        spec = yaml.safe_load(text)
+
+    return TrafficModel(
+        [
+            compile_pattern(name, pattern, actions)
+            for name, pattern in spec["patterns"].items()
+        ]
+    )
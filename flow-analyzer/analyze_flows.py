@@ -1,9 +1,55 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import argparse
+import functools
+import json
 import logging
+import os
+import time
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from flow_io import (
+    FlowTail,
+    expand_flow_inputs,
+    is_capture,
+    iter_flows,
+    load_flows,
+    memory_usage_mb,
+    read_header,
+    source_fingerprint,
+    write_flow_dataset,
+)
+from flow_labels import (
+    EXPECTED_FLOW_TYPES,
+    confusion_matrix,
+    label_flows,
+    read_action_logs,
+)
+from flow_model import FlowClassifier
+from flow_periodicity import conversation_periodicity
+from flow_pipeline import (
+    ALL_COLUMNS,
+    DERIVE,
+    FIGURE,
+    REPORT,
+    SOURCE,
+    STAGE_CACHE_DIR_NAME,
+    Stage,
+    StageCache,
+    plan_stages,
+    source_columns,
+    stage_keys,
+)
+from flow_profiles import PROFILE_LEVELS, HostProfiler
+from flow_report import render_html, write_json
+from flow_rules import DEFAULT_RULES_PATH, load_flow_rules
+from flow_stats import FlowAggregates, RunningCovariance
+from flow_timeseries import ALL_FLOWS, BYTE_COLUMNS, traffic_buckets
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(levelname)s - %(message)s",
@@ -11,97 +57,196 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Set style for better-looking plots
-sns.set_style("whitegrid")
-plt.rcParams["figure.figsize"] = (12, 8)
 
+@functools.cache
+def plotting():
+    """Import and style the plotting stack on first use.
+
+    Matplotlib and seaborn dominate start-up time, so runs without figure stages
+    never import them.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.set_style("whitegrid")
+    plt.rcParams["figure.figsize"] = (12, 8)
+    return plt, sns
+
+
+# Above this many flows, scatter-style plots bin flows instead of drawing markers
+DENSITY_THRESHOLD = int(os.getenv("DENSITY_THRESHOLD", "50000"))
+# Hexagons across the x axis and time buckets per timeline in density mode; these,
+# not the flow count, bound rendering time and PNG size
+DENSITY_GRIDSIZE = 150
+TIMELINE_BUCKETS = 1000
+
+
+# Identifier columns that are numeric but not flow features
+NON_FEATURE_COLUMNS = [
+    "src_ip",
+    "dst_ip",
+    "src_port",
+    "dst_port",
+    "protocol",
+    "timestamp",
+]
+STRONG_CORRELATION = 0.7
+# Features shown in the correlation heatmap (0 disables it)
+CORRELATION_TOP_K = int(os.getenv("CORRELATION_TOP_K", "20"))
+
+# Classified flow export: a partitioned Parquet dataset directory or one CSV
+EXPORT_FORMAT = os.getenv("EXPORT_FORMAT", "parquet")
+EXPORT_OUTPUTS = {"parquet": "flows_classified", "csv": "flows_classified.csv"}
 
-def load_flow_data(csv_path: str) -> pd.DataFrame:
-    """Load CICFlowMeter CSV data."""
+# Width of the traffic_over_time buckets in seconds
+TRAFFIC_BUCKET_SECONDS = float(os.getenv("TRAFFIC_BUCKET_SECONDS", "10"))
+
+# Client action logs (file, directory or glob) for labelling flows
+ACTION_LOG = os.getenv("ACTION_LOG", "/data/actions")
+
+# Minimum autocorrelation at the dominant lag for a conversation to be a beacon
+BEACON_STRENGTH = 0.5
+
+# Keys tracked per profile level before the lightest are evicted (Space-Saving);
+# below this many distinct hosts or host-port pairs the profiles are exact
+HOST_PROFILE_CAPACITY = int(os.getenv("HOST_PROFILE_CAPACITY", "100000"))
+
+# Flow classification rules, highest priority first
+FLOW_RULES = load_flow_rules(os.getenv("FLOW_RULES", DEFAULT_RULES_PATH))
+
+
+def load_flow_data(
+    csv_path: str, columns: list[str] | None = None, use_cache: bool = True
+) -> pd.DataFrame:
+    """Load CICFlowMeter CSV data with compact dtypes, via the Parquet cache."""
     try:
-        df = pd.read_csv(csv_path)
-        logger.info(f"Loaded {len(df)} flows from {csv_path}")
+        df = load_flows(csv_path, columns, use_cache)
+        logger.info(
+            f"Loaded {len(df)} flows ({len(df.columns)} columns, "
+            f"{memory_usage_mb(df):.1f} MB) from {csv_path}"
+        )
         return df
     except Exception as e:
         logger.error(f"Failed to load CSV: {e}")
         raise
 
 
-def basic_statistics(df: pd.DataFrame, output_dir: Path) -> None:
-    """Display basic flow statistics and save summary table."""
-    logger.info("=== Basic Flow Statistics ===")
-    logger.info(f"Total flows: {len(df)}")
-    logger.info(f"Unique source IPs: {df['src_ip'].nunique()}")
-    logger.info(f"Unique destination IPs: {df['dst_ip'].nunique()}")
-
-    # Create summary statistics table
-    summary_stats = pd.DataFrame(
-        {
-            "Metric": [
-                "Total Flows",
-                "Unique Source IPs",
-                "Unique Destination IPs",
-                "Mean Flow Duration (s)",
-                "Max Flow Duration (s)",
-                "Min Flow Duration (s)",
-                "Mean Packet Size (bytes)",
-                "Mean Throughput (bytes/s)",
-            ],
-            "Value": [
-                len(df),
-                df["src_ip"].nunique(),
-                df["dst_ip"].nunique(),
-                f"{df['flow_duration'].mean():.4f}",
-                f"{df['flow_duration'].max():.4f}",
-                f"{df['flow_duration'].min():.4f}",
-                f"{df['pkt_size_avg'].mean():.2f}",
-                f"{df['flow_byts_s'].mean():.2f}",
-            ],
-        }
+def use_density(df: pd.DataFrame) -> bool:
+    """Whether plots of `df` should use binned density rendering."""
+    return len(df) > DENSITY_THRESHOLD
+
+
+def density_plot(ax, x, y, log: bool = False, cmap: str = "viridis", colorbar=True):
+    """Draw a hexbin of flow density instead of one marker per flow."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    keep = np.isfinite(x) & np.isfinite(y)
+    if log:
+        keep &= (x > 0) & (y > 0)
+    scale = "log" if log else "linear"
+    hexbin = ax.hexbin(
+        x[keep],
+        y[keep],
+        gridsize=DENSITY_GRIDSIZE,
+        bins="log",
+        mincnt=1,
+        cmap=cmap,
+        xscale=scale,
+        yscale=scale,
     )
+    if colorbar:
+        ax.figure.colorbar(hexbin, ax=ax, label="Flows (log scale)")
+    return hexbin
 
-    # Save summary table
+
+def time_offsets(df: pd.DataFrame) -> pd.Series:
+    """Seconds from the first flow start, without sorting."""
+    timestamp = pd.to_datetime(df["timestamp"])
+    return (timestamp - timestamp.min()).dt.total_seconds()
+
+
+def bucket_by_time(
+    offsets: pd.Series, buckets: int = TIMELINE_BUCKETS
+) -> tuple[pd.Series, float]:
+    """Assign flows to at most `buckets` equal time buckets (at least 1s wide)."""
+    width = max(float(offsets.max()) / buckets, 1.0)
+    return (offsets // width).astype(np.int64), width
+
+
+def summary_columns() -> list[str]:
+    """Source columns of the summaries: FlowAggregates inputs and SUMMARY_STAGES'."""
+    columns = source_columns(plan_stages(STAGES, SUMMARY_STAGES))
+    return list(dict.fromkeys([*FlowAggregates.INPUT_COLUMNS, *columns]))
+
+
+def summary_chunks(
+    csv_path: str, columns: list[str] | None = None
+) -> Iterator[pd.DataFrame]:
+    """Stream a flow file with the columns of SUMMARY_STAGES derived per chunk."""
+    plan = plan_stages(STAGES, SUMMARY_STAGES)
+    needed = list(dict.fromkeys(summary_columns() + (columns or [])))
+    for chunk in iter_flows(csv_path, needed):
+        for stage in plan:
+            derived = stage.derive(chunk, **CHUNK_STAGE_PARAMS.get(stage.name, {}))
+            for column in stage.outputs:
+                chunk[column] = derived[column].to_numpy()
+        yield chunk
+
+
+def write_summaries(aggregates: FlowAggregates, output_dir: Path) -> None:
+    summary_stats = aggregates.summary_statistics()
     summary_stats.to_csv(output_dir / "summary_statistics.csv", index=False)
     logger.info(
         f"\nSummary statistics saved to {output_dir / 'summary_statistics.csv'}"
     )
     logger.info(f"\n{summary_stats.to_string(index=False)}")
 
+    report_df = aggregates.summary_report()
+    report_df.to_csv(output_dir / "summary_report.csv", index=False)
+    logger.info("\n=== SUMMARY REPORT ===")
+    logger.info(f"\n{report_df.to_string(index=False)}")
 
-def classify_flows(df: pd.DataFrame) -> pd.DataFrame:
-    """Classify flows based on characteristics."""
-    df = df.copy()
-
-    # Classification based on packet characteristics
-    conditions = [
-        # Large data transfer: high byte count, longer duration
-        (df["totlen_bwd_pkts"] > 2000) & (df["flow_duration"] > 0.04),
-        # Quick request-response: small packets, fast
-        (df["pkt_size_avg"] < 200) & (df["flow_duration"] < 0.05),
-        # Interactive session: medium packets, variable timing
-        (df["pkt_size_avg"].between(200, 400)) & (df["flow_iat_std"] > 0.01),
-        # Bulk transfer: many packets, steady rate
-        (df["tot_fwd_pkts"] + df["tot_bwd_pkts"] > 15),
-    ]
 
-    choices = ["Large Data", "Quick Request", "Interactive", "Bulk Transfer"]
-    df["flow_type"] = pd.Series("Other", index=df.index)
+def summarize_flows(csv_path: str, output_dir: Path) -> FlowAggregates:
+    """Summary statistics and report in one streaming pass over the file.
 
-    for condition, choice in zip(conditions, choices):
-        df.loc[condition, "flow_type"] = choice
+    Memory stays fixed however many flows there are (see FlowAggregates); the
+    distinct IP counts and quantiles are sketch estimates whose error bounds are
+    written next to each value.
+    """
+    logger.info("=== Basic Flow Statistics ===")
+    aggregates = FlowAggregates()
+    for chunk in summary_chunks(csv_path):
+        aggregates.update(chunk)
+    write_summaries(aggregates, output_dir)
+    return aggregates
 
-    logger.info("\n=== Flow Classification ===")
-    logger.info(f"\n{df['flow_type'].value_counts()}")
 
-    return df
+def classify_flows(df: pd.DataFrame, log_rules: bool = True) -> pd.Series:
+    """Classify flows with FLOW_RULES into a categorical flow type.
+
+    With `log_rules`, logs how many flows each rule matched and was assigned.
+    """
+    flow_types, counts = FLOW_RULES.classify(df)
+
+    if log_rules:
+        logger.info("\n=== Flow Classification ===")
+        logger.info(f"\n{counts.to_string(index=False)}")
+
+    return pd.Series(flow_types, index=df.index, name="flow_type")
 
 
 def plot_flow_classification(df: pd.DataFrame, output_dir: Path) -> None:
     """Create pie chart of flow classifications."""
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
+    plt, sns = plotting()
+    _, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
 
     # Flow type distribution
     flow_counts = df["flow_type"].value_counts()
+    flow_counts = flow_counts[flow_counts > 0]
     colors = sns.color_palette("Set2", len(flow_counts))
     ax1.pie(
         flow_counts.values,
@@ -127,27 +272,32 @@ def plot_flow_classification(df: pd.DataFrame, output_dir: Path) -> None:
     plt.close()
 
 
-def analyze_timing_patterns(df: pd.DataFrame, output_dir: Path) -> None:
-    """Analyze timing patterns in flows with visualizations."""
-    logger.info("\n=== Timing Pattern Analysis ===")
-
-    # Group by rough timing characteristics
-    df["timing_category"] = pd.cut(
+def timing_categories(df: pd.DataFrame) -> pd.Series:
+    """Group flows by rough timing characteristics."""
+    return pd.cut(
         df["flow_iat_mean"],
         bins=[0, 0.001, 0.01, 0.1, float("inf")],
         labels=["Very Fast", "Fast", "Medium", "Slow"],
     )
 
-    logger.info(f"\nTiming distribution:\n{df['timing_category'].value_counts()}")
 
-    # Burst vs steady traffic
-    df["traffic_pattern"] = "Steady"
-    df.loc[df["flow_iat_std"] > df["flow_iat_mean"], "traffic_pattern"] = "Bursty"
+def traffic_patterns(df: pd.DataFrame) -> pd.Series:
+    """Label flows as bursty or steady traffic."""
+    pattern = pd.Series("Steady", index=df.index)
+    pattern[df["flow_iat_std"] > df["flow_iat_mean"]] = "Bursty"
+    return pattern
+
+
+def analyze_timing_patterns(df: pd.DataFrame, output_dir: Path) -> None:
+    """Analyze timing patterns in flows with visualizations."""
+    plt, sns = plotting()
+    logger.info("\n=== Timing Pattern Analysis ===")
 
+    logger.info(f"\nTiming distribution:\n{df['timing_category'].value_counts()}")
     logger.info(f"\nTraffic pattern:\n{df['traffic_pattern'].value_counts()}")
 
     # Create timing visualization
-    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+    _, axes = plt.subplots(2, 2, figsize=(16, 12))
 
     # 1. Timing category distribution
     timing_counts = df["timing_category"].value_counts()
@@ -181,13 +331,16 @@ def analyze_timing_patterns(df: pd.DataFrame, output_dir: Path) -> None:
     axes[1, 0].set_yscale("log")
 
     # 4. IAT mean vs std scatter
-    axes[1, 1].scatter(
-        df["flow_iat_mean"],
-        df["flow_iat_std"],
-        alpha=0.6,
-        c=df["traffic_pattern"].map({"Steady": 0, "Bursty": 1}),
-        cmap="coolwarm",
-    )
+    if use_density(df):
+        density_plot(axes[1, 1], df["flow_iat_mean"], df["flow_iat_std"], log=True)
+    else:
+        axes[1, 1].scatter(
+            df["flow_iat_mean"],
+            df["flow_iat_std"],
+            alpha=0.6,
+            c=df["traffic_pattern"].map({"Steady": 0, "Bursty": 1}),
+            cmap="coolwarm",
+        )
     axes[1, 1].set_title(
         "IAT Mean vs Standard Deviation", fontsize=12, fontweight="bold"
     )
@@ -202,8 +355,18 @@ def analyze_timing_patterns(df: pd.DataFrame, output_dir: Path) -> None:
     plt.close()
 
 
+def size_categories(df: pd.DataFrame) -> pd.Series:
+    """Group flows by average packet size."""
+    return pd.cut(
+        df["pkt_size_avg"],
+        bins=[0, 200, 400, 1000, float("inf")],
+        labels=["Small", "Medium", "Large", "Very Large"],
+    )
+
+
 def analyze_packet_sizes(df: pd.DataFrame, output_dir: Path) -> None:
     """Analyze packet size distributions with visualizations."""
+    plt, sns = plotting()
     logger.info("\n=== Packet Size Analysis ===")
 
     logger.info(f"Average forward packet size: {df['fwd_pkt_len_mean'].mean():.2f}")
@@ -235,12 +398,15 @@ def analyze_packet_sizes(df: pd.DataFrame, output_dir: Path) -> None:
     logger.info(f"\n{size_summary.to_string(index=False)}")
 
     # Create visualizations
-    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+    _, axes = plt.subplots(2, 2, figsize=(16, 12))
 
     # 1. Forward vs Backward packet size comparison
-    axes[0, 0].scatter(
-        df["fwd_pkt_len_mean"], df["bwd_pkt_len_mean"], alpha=0.6, c="steelblue"
-    )
+    if use_density(df):
+        density_plot(axes[0, 0], df["fwd_pkt_len_mean"], df["bwd_pkt_len_mean"])
+    else:
+        axes[0, 0].scatter(
+            df["fwd_pkt_len_mean"], df["bwd_pkt_len_mean"], alpha=0.6, c="steelblue"
+        )
     axes[0, 0].plot(
         [0, df[["fwd_pkt_len_mean", "bwd_pkt_len_mean"]].max().max()],
         [0, df[["fwd_pkt_len_mean", "bwd_pkt_len_mean"]].max().max()],
@@ -256,11 +422,6 @@ def analyze_packet_sizes(df: pd.DataFrame, output_dir: Path) -> None:
     axes[0, 0].legend()
 
     # 2. Packet size distribution by category
-    df["size_category"] = pd.cut(
-        df["pkt_size_avg"],
-        bins=[0, 200, 400, 1000, float("inf")],
-        labels=["Small", "Medium", "Large", "Very Large"],
-    )
     size_counts = df["size_category"].value_counts()
     axes[0, 1].bar(
         range(len(size_counts)),
@@ -287,7 +448,7 @@ def analyze_packet_sizes(df: pd.DataFrame, output_dir: Path) -> None:
     data_to_plot = [
         df[df["flow_type"] == ft]["pkt_size_avg"].values for ft in flow_types
     ]
-    bp = axes[1, 1].boxplot(data_to_plot, labels=flow_types, patch_artist=True)
+    bp = axes[1, 1].boxplot(data_to_plot, tick_labels=flow_types, patch_artist=True)
     for patch, color in zip(bp["boxes"], sns.color_palette("Set2", len(flow_types))):
         patch.set_facecolor(color)
     axes[1, 1].set_title("Packet Size by Flow Type", fontsize=12, fontweight="bold")
@@ -303,13 +464,17 @@ def analyze_packet_sizes(df: pd.DataFrame, output_dir: Path) -> None:
     plt.close()
 
 
+def flag_periodic(df: pd.DataFrame) -> pd.Series:
+    """Flag flows whose packet timing looks like periodic polling."""
+    # Low IAT variance suggests periodic polling
+    return (df["flow_iat_std"] < 0.01) & (df["flow_iat_mean"] > 0.001)
+
+
 def detect_periodic_traffic(df: pd.DataFrame, output_dir: Path) -> None:
     """Detect periodic/polling behavior with visualization."""
+    plt, sns = plotting()
     logger.info("\n=== Periodic Traffic Detection ===")
 
-    # Low IAT variance suggests periodic polling
-    df["is_periodic"] = (df["flow_iat_std"] < 0.01) & (df["flow_iat_mean"] > 0.001)
-
     periodic_count = df["is_periodic"].sum()
     logger.info(f"Periodic/polling flows detected: {periodic_count}")
 
@@ -320,7 +485,7 @@ def detect_periodic_traffic(df: pd.DataFrame, output_dir: Path) -> None:
         logger.info(f"  Mean packet size: {periodic['pkt_size_avg'].mean():.2f}")
 
         # Create periodic traffic visualization
-        fig, axes = plt.subplots(1, 2, figsize=(16, 6))
+        _, axes = plt.subplots(1, 2, figsize=(16, 6))
 
         # 1. Periodic vs Non-periodic distribution
         periodic_counts = df["is_periodic"].value_counts()
@@ -333,8 +498,25 @@ def detect_periodic_traffic(df: pd.DataFrame, output_dir: Path) -> None:
         axes[0].set_title("Periodic Traffic Detection", fontsize=14, fontweight="bold")
 
         # 2. Time series of flows (if timestamp available)
-        if "timestamp" in df.columns:
-            df["timestamp"] = pd.to_datetime(df["timestamp"])
+        if "timestamp" in df.columns and use_density(df):
+            offsets = time_offsets(df)
+            periodic_mask = df["is_periodic"].to_numpy()
+            for mask, cmap in [(~periodic_mask, "Blues"), (periodic_mask, "Reds")]:
+                density_plot(
+                    axes[1],
+                    offsets[mask],
+                    df["pkt_size_avg"][mask],
+                    cmap=cmap,
+                    colorbar=False,
+                )
+            axes[1].set_title(
+                "Traffic Pattern Over Time (blue: non-periodic, red: periodic)",
+                fontsize=14,
+                fontweight="bold",
+            )
+            axes[1].set_xlabel("Time (seconds from start)", fontsize=12)
+            axes[1].set_ylabel("Packet Size (bytes)", fontsize=12)
+        elif "timestamp" in df.columns:
             df_sorted = df.sort_values("timestamp")
             periodic_mask = df_sorted["is_periodic"]
 
@@ -368,59 +550,156 @@ def detect_periodic_traffic(df: pd.DataFrame, output_dir: Path) -> None:
         plt.close()
 
 
-def correlation_analysis(df: pd.DataFrame, output_dir: Path) -> None:
-    """Analyze correlations between key features with heatmap."""
-    logger.info("\n=== Feature Correlations ===")
+def detect_beacons(
+    df: pd.DataFrame, output_dir: Path, strength: float = BEACON_STRENGTH
+) -> pd.DataFrame:
+    """Find conversations whose flows start at a regular interval."""
+    logger.info("\n=== Beacon Detection ===")
 
-    # Select key features for correlation
-    features = [
-        "flow_duration",
-        "pkt_size_avg",
-        "flow_byts_s",
-        "flow_iat_mean",
-        "tot_fwd_pkts",
-        "tot_bwd_pkts",
-        "fwd_pkt_len_mean",
-        "bwd_pkt_len_mean",
-    ]
+    periodicity = conversation_periodicity(df)
+    scored = periodicity.dropna(subset=["strength"])
+    scored = scored.assign(beacon=scored["strength"] >= strength)
+    scored = scored.sort_values(["beacon", "strength"], ascending=False)
+    scored.to_csv(output_dir / "beacon_intervals.csv", index=False)
 
-    corr_matrix = df[features].corr()
-
-    # Find strong correlations (> 0.7)
-    logger.info("\nStrong correlations (> 0.7):")
-    strong_corr = []
-    for i in range(len(features)):
-        for j in range(i + 1, len(features)):
-            corr_value = corr_matrix.iloc[i, j]
-            if abs(corr_value) > 0.7:  # type: ignore
-                logger.info(f"  {features[i]} <-> {features[j]}: {corr_value:.3f}")
-                strong_corr.append(
-                    {
-                        "Feature 1": features[i],
-                        "Feature 2": features[j],
-                        "Correlation": corr_value,
-                    }
-                )
+    beacons = scored[scored["beacon"]]
+    logger.info(
+        f"{len(beacons)} of {len(scored)} scored conversations are periodic "
+        f"({len(periodicity)} conversations in total)"
+    )
+    for row in beacons.head(20).itertuples(index=False):
+        logger.info(
+            f"  {row.src_ip} -> {row.dst_ip}:{row.dst_port} every "
+            f"{row.period_s:.0f}s ({row.flows} flows, strength {row.strength:.2f})"
+        )
+    return scored
+
+
+def profile_hosts(
+    csv_path: str,
+    output_dir: Path,
+    top_k: int = 20,
+    capacity: int = HOST_PROFILE_CAPACITY,
+    timeline_buckets: int = 48,
+) -> dict[str, pd.DataFrame]:
+    """Traffic profiles of the heaviest source hosts and host-port pairs.
+
+    Streams the file twice with fixed memory. The first pass groups every chunk
+    by key and keeps the `capacity` heaviest keys by bytes; the second gathers
+    throughput percentiles and a byte timeline for the `top_k` heaviest, which
+    heavy_hitters.html shows as a table with one sparkline per row.
+    """
+    logger.info("\n=== Host Profiles ===")
+    profilers = {
+        name: HostProfiler(keys, FLOW_RULES.categories, capacity)
+        for name, keys in PROFILE_LEVELS.items()
+    }
+    first = last = None
+    for chunk in summary_chunks(csv_path, ["dst_port", "timestamp"] + BYTE_COLUMNS):
+        for profiler in profilers.values():
+            profiler.count(chunk)
+        if len(chunk):
+            start, end = chunk["timestamp"].min(), chunk["timestamp"].max()
+            first = start if first is None else min(first, start)
+            last = end if last is None else max(last, end)
+
+    for profiler in profilers.values():
+        profiler.select(top_k, timeline_buckets)
+    if first is not None:
+        span = max((last - first).total_seconds(), 1.0)
+        bucket_seconds = span * (1 + 1e-9) / timeline_buckets
+        columns = ["src_ip", "dst_port", "timestamp", "flow_byts_s"] + BYTE_COLUMNS
+        for chunk in iter_flows(csv_path, columns):
+            offsets = (chunk["timestamp"] - first).dt.total_seconds().to_numpy()
+            buckets = (offsets // bucket_seconds).astype(np.int64)
+            for profiler in profilers.values():
+                profiler.describe(chunk, buckets.clip(0, timeline_buckets - 1))
+
+    profiles = {}
+    report = {"summary": {}}
+    for name, profiler in profilers.items():
+        profiles[name] = profile = profiler.profiles()
+        profile.to_csv(output_dir / name, index=False)
+        level = " / ".join(profiler.keys)
+        report["summary"][f"Max byte overcount per {level}"] = profiler.heavy.floor
+        rows = profile.assign(bytes_over_time=list(profiler.timeline))
+        report[f"top_{name.removesuffix('_profiles.csv')}s"] = rows.to_dict("records")
+    if first is not None:
+        spacing = f"{timeline_buckets} buckets of {bucket_seconds:.0f}s"
+        report["summary"]["Timeline"] = f"{first} to {last}, {spacing}"
+    (output_dir / "heavy_hitters.html").write_text(
+        render_html(report, title="Heavy Hitters")
+    )
 
-    # Save strong correlations table
-    if strong_corr:
-        pd.DataFrame(strong_corr).to_csv(
-            output_dir / "strong_correlations.csv", index=False
+    hosts = profiles["host_profiles.csv"]
+    for row in hosts.head(10).itertuples(index=False):
+        logger.info(
+            f"  {row.src_ip}: {row.share:.1%} of bytes, {row.flows} flows, "
+            f"mostly {row.main_flow_type}"
         )
+    logger.info(f"Host profiles saved to {output_dir / 'heavy_hitters.html'}")
+    return profiles
+
+
+def strong_correlations(
+    corr_matrix: pd.DataFrame, threshold: float = STRONG_CORRELATION
+) -> pd.DataFrame:
+    """Feature pairs with |r| above `threshold`, strongest first."""
+    values = corr_matrix.to_numpy()
+    rows, cols = np.triu_indices(len(values), k=1)
+    pair_values = values[rows, cols]
+    strong = np.abs(np.nan_to_num(pair_values)) > threshold
+    order = np.argsort(-np.abs(pair_values[strong]), kind="stable")
+    features = corr_matrix.columns.to_numpy()
+    return pd.DataFrame(
+        {
+            "Feature 1": features[rows[strong][order]],
+            "Feature 2": features[cols[strong][order]],
+            "Correlation": pair_values[strong][order],
+        }
+    )
+
 
-    # Create correlation heatmap
-    plt.figure(figsize=(12, 10))
+def cluster_order(corr_matrix: pd.DataFrame) -> list[str]:
+    """Order features so correlated ones sit together (spectral seriation)."""
+    similarity = np.abs(np.nan_to_num(corr_matrix.to_numpy()))
+    laplacian = np.diag(similarity.sum(axis=1)) - similarity
+    _, vectors = np.linalg.eigh(laplacian)
+    fiedler = vectors[:, 1] if len(similarity) > 1 else vectors[:, 0]
+    return list(corr_matrix.columns[np.argsort(fiedler, kind="stable")])
+
+
+def plot_correlation_heatmap(
+    corr_matrix: pd.DataFrame, output_dir: Path, top_k: int
+) -> None:
+    """Clustered heatmap of the `top_k` most strongly correlated features."""
+    plt, sns = plotting()
+    strength = corr_matrix.abs().where(~np.eye(len(corr_matrix), dtype=bool))
+    features = strength.max().dropna().nlargest(top_k).index
+    subset = corr_matrix.loc[features, features]
+    order = cluster_order(subset)
+    subset = subset.loc[order, order]
+
+    size = max(8, 0.5 * len(subset))
+    plt.figure(figsize=(size + 2, size))
     sns.heatmap(
-        corr_matrix,
-        annot=True,
+        subset,
+        annot=len(subset) <= 12,
         fmt=".2f",
         cmap="coolwarm",
         center=0,
+        vmin=-1,
+        vmax=1,
         square=True,
-        linewidths=1,
+        linewidths=0.5,
         cbar_kws={"shrink": 0.8},
     )
-    plt.title("Feature Correlation Heatmap", fontsize=16, fontweight="bold", pad=20)
+    plt.title(
+        f"Feature Correlation Heatmap (top {len(subset)} features)",
+        fontsize=16,
+        fontweight="bold",
+        pad=20,
+    )
     plt.tight_layout()
     plt.savefig(output_dir / "correlation_heatmap.png", dpi=300, bbox_inches="tight")
     logger.info(
@@ -429,21 +708,64 @@ def correlation_analysis(df: pd.DataFrame, output_dir: Path) -> None:
     plt.close()
 
 
+def feature_columns(csv_path: str) -> list[str]:
+    """Numeric flow feature columns of a flow CSV."""
+    return [c for c in read_header(csv_path) if c not in NON_FEATURE_COLUMNS]
+
+
+def correlation_analysis(
+    csv_path: str, output_dir: Path, top_k: int = CORRELATION_TOP_K
+) -> pd.DataFrame:
+    """Correlate all numeric flow features, streaming the file in chunks."""
+    logger.info("\n=== Feature Correlations ===")
+
+    features = feature_columns(csv_path)
+    covariance = RunningCovariance(features)
+    for chunk in iter_flows(csv_path, features):
+        covariance.update(chunk)
+    return write_correlations(covariance, output_dir, top_k)
+
+
+def write_correlations(
+    covariance: RunningCovariance, output_dir: Path, top_k: int = CORRELATION_TOP_K
+) -> pd.DataFrame:
+    """Save the correlation matrix, the strong pairs and the heatmap."""
+    corr_matrix = covariance.correlation()
+    corr_matrix.to_csv(output_dir / "correlation_matrix.csv")
+
+    strong_corr = strong_correlations(corr_matrix)
+    logger.info(
+        f"{len(strong_corr)} strong correlations (|r| > {STRONG_CORRELATION}) "
+        f"among {len(covariance.columns)} features"
+    )
+    for row in strong_corr.head(20).itertuples(index=False):
+        logger.info(f"  {row[0]} <-> {row[1]}: {row[2]:.3f}")
+    strong_corr.to_csv(output_dir / "strong_correlations.csv", index=False)
+
+    if top_k > 0:
+        plot_correlation_heatmap(corr_matrix, output_dir, top_k)
+    return corr_matrix
+
+
 def create_traffic_timeline(df: pd.DataFrame, output_dir: Path) -> None:
     """Create timeline visualization of traffic patterns."""
+    plt, _ = plotting()
     if "timestamp" not in df.columns:
         logger.warning("No timestamp column found, skipping timeline visualization")
         return
 
     logger.info("\n=== Creating Traffic Timeline ===")
 
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    if use_density(df):
+        plot_bucketed_timeline(df, output_dir)
+        return
+
     df_sorted = df.sort_values("timestamp")
     df_sorted["time_offset"] = (
         df_sorted["timestamp"] - df_sorted["timestamp"].min()
     ).dt.total_seconds()
 
-    fig, axes = plt.subplots(3, 1, figsize=(16, 12))
+    _, axes = plt.subplots(3, 1, figsize=(16, 12))
 
     # 1. Throughput over time
     axes[0].plot(
@@ -490,66 +812,947 @@ def create_traffic_timeline(df: pd.DataFrame, output_dir: Path) -> None:
     plt.close()
 
 
-def create_summary_report(df: pd.DataFrame, output_dir: Path) -> None:
-    """Create a comprehensive summary report."""
-    logger.info("\n=== Creating Summary Report ===")
+def plot_bucketed_timeline(df: pd.DataFrame, output_dir: Path) -> None:
+    """Timeline of per-bucket aggregates, used instead of per-flow markers."""
+    plt, _ = plotting()
+    buckets, width = bucket_by_time(time_offsets(df))
+    grouped = df.groupby(buckets)
+    throughput = grouped["flow_byts_s"].agg(["mean", "max"])
+    duration = grouped["flow_duration"].agg(["mean", "max"])
+    packet_size = df.pivot_table(
+        index=buckets,
+        columns="flow_type",
+        values="pkt_size_avg",
+        aggfunc="mean",
+        observed=True,
+    )
+    start = throughput.index.to_numpy() * width
+
+    _, axes = plt.subplots(3, 1, figsize=(16, 12), sharex=True)
+
+    # 1. Throughput over time
+    axes[0].plot(start, throughput["mean"], label="Mean")
+    axes[0].plot(start, throughput["max"], alpha=0.5, label="Max")
+    axes[0].set_title(
+        f"Throughput Over Time ({width:.0f}s buckets)", fontsize=12, fontweight="bold"
+    )
+    axes[0].set_ylabel("Bytes/s", fontsize=10)
+    axes[0].set_yscale("log")
+    axes[0].legend()
+    axes[0].grid(True, alpha=0.3)
+
+    # 2. Packet size over time, per flow type
+    for flow_type in packet_size.columns:
+        axes[1].plot(
+            packet_size.index.to_numpy() * width,
+            packet_size[flow_type],
+            label=flow_type,
+            alpha=0.8,
+        )
+    axes[1].set_title(
+        "Mean Packet Size Over Time by Flow Type", fontsize=12, fontweight="bold"
+    )
+    axes[1].set_ylabel("Packet Size (bytes)", fontsize=10)
+    axes[1].legend()
+    axes[1].grid(True, alpha=0.3)
+
+    # 3. Flow duration over time
+    axes[2].bar(start, duration["mean"], width=width, alpha=0.7, color="coral")
+    axes[2].plot(start, duration["max"], color="darkred", alpha=0.5, label="Max")
+    axes[2].set_title("Flow Duration Over Time", fontsize=12, fontweight="bold")
+    axes[2].set_xlabel("Time (seconds from start)", fontsize=10)
+    axes[2].set_ylabel("Duration (s)", fontsize=10)
+    axes[2].legend()
+    axes[2].grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    plt.savefig(output_dir / "traffic_timeline.png", dpi=300, bbox_inches="tight")
+    logger.info(f"Traffic timeline saved to {output_dir / 'traffic_timeline.png'}")
+    plt.close()
+
+
+def traffic_over_time(
+    df: pd.DataFrame,
+    output_dir: Path,
+    bucket_seconds: float = TRAFFIC_BUCKET_SECONDS,
+    rolling_seconds: float = 60.0,
+) -> pd.DataFrame:
+    """Load per fixed time bucket, overall and by flow type, as a table and plot."""
+    plt, _ = plotting()
+    logger.info("\n=== Traffic Over Time ===")
 
+    table = traffic_buckets(df, bucket_seconds, rolling_seconds)
+    table.to_csv(output_dir / "traffic_buckets.csv", index=False)
+    logger.info(
+        f"{table['bucket_start'].nunique()} buckets of {bucket_seconds:g}s saved to "
+        f"{output_dir / 'traffic_buckets.csv'}"
+    )
+
+    by_type = table[table["flow_type"] != ALL_FLOWS].pivot(
+        index="bucket_start", columns="flow_type"
+    )
+    overall = table[table["flow_type"] == ALL_FLOWS].set_index("bucket_start")
+    by_type = by_type.reindex(overall.index).fillna(0)
+    flow_types = list(by_type["flows"].columns)
+
+    _, axes = plt.subplots(3, 1, figsize=(16, 12), sharex=True)
+
+    # 1. Rolling throughput, stacked by flow type
+    axes[0].stackplot(
+        overall.index,
+        *(by_type["rolling_throughput_bps"][t] for t in flow_types),
+        labels=flow_types,
+        alpha=0.8,
+    )
+    axes[0].set_title(
+        f"Throughput ({rolling_seconds:g}s rolling mean of {bucket_seconds:g}s "
+        "buckets)",
+        fontsize=12,
+        fontweight="bold",
+    )
+    axes[0].set_ylabel("Bytes/s", fontsize=10)
+    axes[0].legend(loc="upper right")
+    axes[0].grid(True, alpha=0.3)
+
+    # 2. Flows started per bucket
+    axes[1].stackplot(
+        overall.index, *(by_type["flows"][t] for t in flow_types), alpha=0.8
+    )
+    axes[1].set_title("New Flows per Bucket", fontsize=12, fontweight="bold")
+    axes[1].set_ylabel("Flows", fontsize=10)
+    axes[1].grid(True, alpha=0.3)
+
+    # 3. Concurrently active flows
+    axes[2].step(overall.index, overall["active_flows"], where="post", color="black")
+    axes[2].set_title("Active Flows", fontsize=12, fontweight="bold")
+    axes[2].set_xlabel("Time", fontsize=10)
+    axes[2].set_ylabel("Flows", fontsize=10)
+    axes[2].grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    plt.savefig(output_dir / "traffic_over_time.png", dpi=300, bbox_inches="tight")
+    logger.info(f"Traffic over time saved to {output_dir / 'traffic_over_time.png'}")
+    plt.close()
+    return table
+
+
+def category_shares(values: pd.Series) -> list[dict]:
+    """Count and share of each value, most common first."""
+    counts = values.astype(str).value_counts()
+    shares = counts / counts.sum() if len(values) else counts
+    return [
+        {values.name: name, "flows": int(count), "share": float(share)}
+        for name, count, share in zip(counts.index, counts, shares)
+    ]
+
+
+def write_flow_report(df: pd.DataFrame, output_dir: Path) -> dict:
+    """Summary and classification results as report.json and report.html.
+
+    The HTML page is self-contained (inline CSS, no images), so it can be
+    opened or mailed on its own and needs no plotting libraries.
+    """
+    logger.info("\n=== Writing Flow Report ===")
+
+    aggregates = FlowAggregates()
+    aggregates.update(df)
+    summary = aggregates.summary_report()
+    by_type = (
+        df.assign(bytes=df[BYTE_COLUMNS].sum(axis=1))
+        .groupby("flow_type", observed=True)
+        .agg(
+            flows=("bytes", "size"),
+            bytes=("bytes", "sum"),
+            mean_duration_s=("flow_duration", "mean"),
+            mean_packet_size=("pkt_size_avg", "mean"),
+        )
+        .sort_values("flows", ascending=False)
+    )
+    by_type.insert(1, "share", by_type["flows"] / max(len(df), 1))
     report = {
-        "Total Flows": len(df),
-        "Unique Source IPs": df["src_ip"].nunique(),
-        "Unique Destination IPs": df["dst_ip"].nunique(),
-        "Average Flow Duration (s)": df["flow_duration"].mean(),
-        "Average Throughput (bytes/s)": df["flow_byts_s"].mean(),
-        "Average Packet Size (bytes)": df["pkt_size_avg"].mean(),
-        "Total Forward Packets": df["tot_fwd_pkts"].sum(),
-        "Total Backward Packets": df["tot_bwd_pkts"].sum(),
-        "Most Common Flow Type": df["flow_type"].mode()[0],
-        "Periodic Flows": df["is_periodic"].sum(),
-        "Non-Periodic Flows": (~df["is_periodic"]).sum(),
+        "summary": dict(zip(summary["Metric"], summary["Value"])),
+        "distribution": aggregates.summary_statistics().to_dict("records"),
+        "flow_types": by_type.reset_index().to_dict("records"),
+        "timing_categories": category_shares(df["timing_category"]),
+        "traffic_patterns": category_shares(df["traffic_pattern"]),
+        "size_categories": category_shares(df["size_category"]),
     }
+    write_json(report, output_dir / "report.json")
+    (output_dir / "report.html").write_text(render_html(report))
+    logger.info(f"Report saved to {output_dir / 'report.json'} and report.html")
+    return report
+
+
+def time_buckets(timestamps: pd.Series, freq: str) -> pd.Series:
+    """Start of the `freq` bucket of each flow as a compact sortable label."""
+    codes, starts = pd.factorize(timestamps.dt.floor(freq))
+    labels = np.asarray(starts.strftime("%Y%m%dT%H%M%S"), dtype=object)
+    return pd.Series(labels[codes], index=timestamps.index)
 
+
+def label_client_actions(
+    df: pd.DataFrame,
+    output_dir: Path,
+    action_log: str = ACTION_LOG,
+    tolerance_s: float = 1.0,
+    match_ip: bool = True,
+) -> pd.DataFrame | None:
+    """Label flows with the client action behind them and score the classifier."""
+    logger.info("\n=== Client Action Labels ===")
+
+    try:
+        actions = read_action_logs(action_log)
+    except FileNotFoundError as e:
+        logger.warning(f"{e}, skipping flow labelling")
+        return None
+
+    labels = label_flows(df, actions, tolerance_s, match_ip)
+    matched = labels["action"].notna()
+    logger.info(
+        f"Matched {matched.sum()} of {len(df)} flows to {len(actions)} logged requests"
+    )
+    labelled = pd.concat([df[matched], labels[matched]], axis=1)
+    labelled["action"] = labelled["action"].astype(str)
+    write_flow_dataset(labelled, output_dir / "flows_labelled", ["action"])
+
+    per_action = pd.crosstab(labelled["action"], labelled["flow_type"].astype(str))
+    per_action.to_csv(output_dir / "action_flow_types.csv")
+    confusion = confusion_matrix(labelled["action"], labelled["flow_type"])
+    confusion.to_csv(output_dir / "classifier_confusion.csv")
+
+    scored = confusion.to_numpy().sum()
+    if scored:
+        correct = sum(
+            confusion.at[t, t] for t in confusion.index if t in confusion.columns
+        )
+        logger.info(
+            f"Classifier accuracy on {scored} labelled flows: {correct / scored:.1%}"
+        )
+    logger.info(f"\n{confusion.to_string()}")
+    return labelled
+
+
+def export_classified_flows(
+    df: pd.DataFrame,
+    output_dir: Path,
+    file_format: str = EXPORT_FORMAT,
+    time_partition: str | None = None,
+) -> None:
+    """Write the flows with their derived classification columns.
+
+    Parquet output is a dataset directory partitioned by flow type and, with
+    `time_partition` (a pandas frequency such as "1h"), by time bucket.
+    """
+    if file_format == "csv":
+        output_path = output_dir / EXPORT_OUTPUTS["csv"]
+        df.to_csv(output_path, index=False)
+    elif file_format == "parquet":
+        output_path = output_dir / EXPORT_OUTPUTS["parquet"]
+        partition_by = ["flow_type"]
+        if time_partition:
+            df = df.assign(time_bucket=time_buckets(df["timestamp"], time_partition))
+            partition_by.append("time_bucket")
+        write_flow_dataset(df, output_path, partition_by)
+    else:
+        raise ValueError(f"Unknown export format: {file_format}")
+    logger.info(f"Classified flows saved to {output_path}")
+
+
+def train_flow_classifier(
+    csv_path: str,
+    output_dir: Path,
+    target: str = "rules",
+    epochs: int = 2,
+    batch_size: int = 8192,
+    learning_rate: float = 0.1,
+    holdout_every: int = 10,
+    score_batch: int = 262_144,
+) -> FlowClassifier | None:
+    """Train a softmax flow classifier chunk by chunk and score it.
+
+    `target="rules"` learns the FLOW_RULES flow types; `target="actions"` learns
+    the flow type expected from the client action behind each flow (ACTION_LOG).
+    Every `holdout_every`-th flow is kept out of training to measure accuracy.
+    The file is streamed once for the feature scaling and once per epoch, so
+    memory depends on the chunk size, not on the number of flows.
+    """
+    logger.info("\n=== Learned Flow Classifier ===")
+
+    actions = None
+    if target == "rules":
+        classes = FLOW_RULES.categories
+        label_columns = FLOW_RULES.columns
+    elif target == "actions":
+        try:
+            actions = read_action_logs(ACTION_LOG)
+        except FileNotFoundError as e:
+            logger.warning(f"{e}, skipping classifier training")
+            return None
+        classes = sorted(set(EXPECTED_FLOW_TYPES.values()))
+        label_columns = ["src_ip", "src_port", "timestamp"]
+    else:
+        raise ValueError(f"Unknown classifier target: {target}")
+
+    features = feature_columns(csv_path)
+    columns = features + [c for c in label_columns if c not in features]
+    model = FlowClassifier(features, classes, learning_rate)
+
+    def labelled_chunks():
+        """Chunks with their class codes (-1: unlabelled) and holdout mask."""
+        offset = 0
+        for chunk in iter_flows(csv_path, columns):
+            if actions is None:
+                labels = FLOW_RULES.classify(chunk)[0]
+            else:
+                labels = label_flows(chunk, actions)["action"].map(EXPECTED_FLOW_TYPES)
+            holdout = np.arange(offset, offset + len(chunk)) % holdout_every == 0
+            offset += len(chunk)
+            yield chunk, model.class_codes(labels), holdout
+
+    started = time.perf_counter()
+    for chunk in iter_flows(csv_path, features):
+        model.update_scaler(chunk)
+    trained = 0
+    for epoch in range(epochs):
+        for chunk, codes, holdout in labelled_chunks():
+            train = ~holdout & (codes >= 0)
+            x = model.transform(chunk[train])
+            model.partial_fit(x, codes[train], batch_size)
+            trained += len(x)
+        logger.info(f"Epoch {epoch + 1}/{epochs} done")
+    training_time = time.perf_counter() - started
+    model.save(output_dir / "flow_classifier.npz")
+
+    k = len(classes)
+    confusion = np.zeros(k * k, dtype=np.int64)
+    agreed = labelled = scored = 0
+    scoring_time = 0.0
+    for chunk, codes, holdout in labelled_chunks():
+        started = time.perf_counter()
+        predicted = model.predict_codes(model.transform(chunk), score_batch)
+        scoring_time += time.perf_counter() - started
+        scored += len(chunk)
+        known = codes >= 0
+        agreed += int((predicted[known] == codes[known]).sum())
+        labelled += int(known.sum())
+        test = holdout & known
+        confusion += np.bincount(codes[test] * k + predicted[test], minlength=k * k)
+
+    confusion = pd.DataFrame(
+        confusion.reshape(k, k),
+        index=pd.Index(classes, name="expected"),
+        columns=pd.Index(classes, name="predicted"),
+    )
+    confusion.to_csv(output_dir / "classifier_holdout_confusion.csv")
+    holdout_flows = confusion.to_numpy().sum()
+    holdout_correct = np.trace(confusion.to_numpy())
+    report = {
+        "Target": target,
+        "Features": len(features),
+        "Training Flows (all epochs)": trained,
+        "Holdout Flows": holdout_flows,
+        "Holdout Accuracy": holdout_correct / holdout_flows if holdout_flows else None,
+        "Agreement on Labelled Flows": agreed / labelled if labelled else None,
+        "Training Time (s)": training_time,
+        "Scoring Throughput (flows/s)": scored / scoring_time if scoring_time else None,
+    }
     report_df = pd.DataFrame(list(report.items()), columns=["Metric", "Value"])
-    report_df.to_csv(output_dir / "summary_report.csv", index=False)
+    report_df.to_csv(output_dir / "classifier_training.csv", index=False)
 
-    logger.info("\n=== SUMMARY REPORT ===")
     logger.info(f"\n{report_df.to_string(index=False)}")
+    logger.info(f"\n{confusion.to_string()}")
+    return model
+
+
+# Derived stages behind the flow type and periodicity counts of the summaries
+SUMMARY_STAGES = ["classify_flows", "flag_periodic"]
+
+# Parameters overriding those of STAGES when a derive stage runs once per chunk;
+# the classification rule table is logged once per run, not per chunk
+CHUNK_STAGE_PARAMS = {"classify_flows": {"log_rules": False}}
+
+# Flow columns that derived stages add
+CLASSIFICATION_COLUMNS = [
+    "flow_type",
+    "timing_category",
+    "traffic_pattern",
+    "size_category",
+    "is_periodic",
+]
+
+# Figures depend on the density threshold through use_density()
+FIGURE_VERSION = f"density={DENSITY_THRESHOLD}"
+
+# Analysis DAG. Stage order breaks ties between independent stages.
+STAGES = {
+    stage.name: stage
+    for stage in [
+        Stage(
+            "classify_flows",
+            classify_flows,
+            DERIVE,
+            FLOW_RULES.columns,
+            ["flow_type"],
+            version=FLOW_RULES.digest,
+        ),
+        Stage(
+            "timing_categories",
+            timing_categories,
+            DERIVE,
+            ["flow_iat_mean"],
+            ["timing_category"],
+        ),
+        Stage(
+            "traffic_patterns",
+            traffic_patterns,
+            DERIVE,
+            ["flow_iat_mean", "flow_iat_std"],
+            ["traffic_pattern"],
+        ),
+        Stage(
+            "size_categories",
+            size_categories,
+            DERIVE,
+            ["pkt_size_avg"],
+            ["size_category"],
+        ),
+        Stage(
+            "flag_periodic",
+            flag_periodic,
+            DERIVE,
+            ["flow_iat_mean", "flow_iat_std"],
+            ["is_periodic"],
+        ),
+        # Streams the source file, deriving flow_type and is_periodic per chunk
+        Stage(
+            "summarize_flows",
+            summarize_flows,
+            SOURCE,
+            [],
+            ["summary_statistics.csv", "summary_report.csv"],
+            version=FLOW_RULES.digest,
+        ),
+        Stage(
+            "plot_flow_classification",
+            plot_flow_classification,
+            FIGURE,
+            ["flow_duration", "flow_type"],
+            ["flow_classification.png"],
+        ),
+        Stage(
+            "analyze_timing_patterns",
+            analyze_timing_patterns,
+            FIGURE,
+            ["flow_iat_mean", "flow_iat_std", "timing_category", "traffic_pattern"],
+            ["timing_analysis.png"],
+            version=FIGURE_VERSION,
+        ),
+        Stage(
+            "analyze_packet_sizes",
+            analyze_packet_sizes,
+            FIGURE,
+            [
+                "fwd_pkt_len_mean",
+                "bwd_pkt_len_mean",
+                "pkt_size_avg",
+                "fwd_pkt_len_max",
+                "bwd_pkt_len_max",
+                "pkt_len_max",
+                "fwd_pkt_len_min",
+                "bwd_pkt_len_min",
+                "pkt_len_min",
+                "size_category",
+                "flow_type",
+            ],
+            ["packet_size_summary.csv", "packet_size_analysis.png"],
+            version=FIGURE_VERSION,
+        ),
+        Stage(
+            "detect_periodic_traffic",
+            detect_periodic_traffic,
+            FIGURE,
+            ["flow_iat_std", "flow_iat_mean", "pkt_size_avg", "timestamp"]
+            + ["is_periodic"],
+            ["periodic_traffic.png"],
+            version=FIGURE_VERSION,
+        ),
+        Stage(
+            "create_traffic_timeline",
+            create_traffic_timeline,
+            FIGURE,
+            ["timestamp", "flow_byts_s", "pkt_size_avg", "flow_duration", "flow_type"],
+            ["traffic_timeline.png"],
+            version=FIGURE_VERSION,
+        ),
+        Stage(
+            "traffic_over_time",
+            traffic_over_time,
+            FIGURE,
+            ["timestamp", "flow_duration"] + BYTE_COLUMNS + ["flow_type"],
+            ["traffic_buckets.csv", "traffic_over_time.png"],
+            params={"bucket_seconds": TRAFFIC_BUCKET_SECONDS, "rolling_seconds": 60.0},
+        ),
+        Stage(
+            "detect_beacons",
+            detect_beacons,
+            REPORT,
+            ["src_ip", "dst_ip", "dst_port", "timestamp"],
+            ["beacon_intervals.csv"],
+            params={"strength": BEACON_STRENGTH},
+        ),
+        Stage(
+            "profile_hosts",
+            profile_hosts,
+            SOURCE,
+            [],
+            list(PROFILE_LEVELS) + ["heavy_hitters.html"],
+            params={
+                "top_k": 20,
+                "capacity": HOST_PROFILE_CAPACITY,
+                "timeline_buckets": 48,
+            },
+            version=FLOW_RULES.digest,
+        ),
+        # Streams the source file in chunks instead of reading the loaded frame
+        Stage(
+            "correlation_analysis",
+            correlation_analysis,
+            SOURCE,
+            [],
+            ["correlation_matrix.csv", "strong_correlations.csv"],
+            params={"top_k": CORRELATION_TOP_K},
+        ),
+        Stage(
+            "write_flow_report",
+            write_flow_report,
+            REPORT,
+            [
+                "src_ip",
+                "dst_ip",
+                "flow_duration",
+                "flow_byts_s",
+                "pkt_size_avg",
+                "tot_fwd_pkts",
+                "tot_bwd_pkts",
+            ]
+            + BYTE_COLUMNS
+            + CLASSIFICATION_COLUMNS,
+            ["report.json", "report.html"],
+        ),
+        Stage(
+            "label_client_actions",
+            label_client_actions,
+            REPORT,
+            [ALL_COLUMNS] + CLASSIFICATION_COLUMNS,
+            ["flows_labelled", "action_flow_types.csv", "classifier_confusion.csv"],
+            params={"action_log": ACTION_LOG, "tolerance_s": 1.0, "match_ip": True},
+        ),
+        Stage(
+            "export_classified_flows",
+            export_classified_flows,
+            REPORT,
+            [ALL_COLUMNS] + CLASSIFICATION_COLUMNS,
+            [EXPORT_OUTPUTS[EXPORT_FORMAT]],
+            params={"file_format": EXPORT_FORMAT, "time_partition": None},
+        ),
+        Stage(
+            "train_flow_classifier",
+            train_flow_classifier,
+            SOURCE,
+            [],
+            [
+                "flow_classifier.npz",
+                "classifier_training.csv",
+                "classifier_holdout_confusion.csv",
+            ],
+            params={
+                "target": "rules",
+                "epochs": 2,
+                "batch_size": 8192,
+                "learning_rate": 0.1,
+                "holdout_every": 10,
+                "score_batch": 262_144,
+            },
+            version=FLOW_RULES.digest,
+        ),
+    ]
+}
+
+# Stages that only run when requested with --stages
+OPTIONAL_STAGES = ["train_flow_classifier"]
+
+# Default stages of --report-only runs, which never import the plotting stack
+REPORT_ONLY_STAGES = ["summarize_flows", "write_flow_report"]
+
+REPORT_STAGES = [
+    name
+    for name, stage in STAGES.items()
+    if stage.kind != DERIVE and name not in OPTIONAL_STAGES
+]
+
+# Report stages that can be computed from per-file partial aggregates
+MERGEABLE_STAGES = ["summarize_flows", "correlation_analysis"]
+
+
+def _render_figure(
+    stage_name: str, columns: list[str], shared_path: str, output_dir: Path
+) -> tuple:
+    """Process pool task: draw one figure from the shared Arrow file."""
+    started = time.perf_counter()
+    with pa.memory_map(shared_path) as source:
+        table = pa.ipc.open_file(source).read_all()
+        df = table.select(columns).to_pandas()
+    stage = STAGES[stage_name]
+    stage.func(df, output_dir, **stage.params)
+    return stage_name, time.perf_counter() - started
+
+
+def render_figures(
+    df: pd.DataFrame,
+    stages: list[Stage],
+    output_dir: Path,
+    workers: int | None = None,
+) -> None:
+    """Draw figure stages in parallel, each in its own process.
+
+    The input columns are written once to an uncompressed Arrow IPC file that every
+    worker memory-maps, instead of pickling a DataFrame per task.
+    """
+    if not stages:
+        return
+    columns = []
+    for stage in stages:
+        columns += [c for c in stage.inputs if c not in columns]
+
+    shared_path = output_dir / ".figure_input.arrow"
+    table = pa.Table.from_pandas(df[columns], preserve_index=False)
+    with (
+        pa.OSFile(str(shared_path), "wb") as sink,
+        pa.ipc.new_file(sink, table.schema) as writer,
+    ):
+        writer.write_table(table)
+    del table
+
+    workers = workers or min(len(stages), os.cpu_count() or 1)
+    started = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(
+                    _render_figure,
+                    stage.name,
+                    stage.inputs,
+                    str(shared_path),
+                    output_dir,
+                )
+                for stage in stages
+            ]
+            for future in as_completed(futures):
+                name, elapsed = future.result()
+                logger.info(f"Figure stage {name} finished in {elapsed:.1f}s")
+    finally:
+        shared_path.unlink(missing_ok=True)
+    logger.info(
+        f"Rendered {len(stages)} figure stages with {workers} workers in "
+        f"{time.perf_counter() - started:.1f}s"
+    )
+
+
+def run_pipeline(
+    csv_path: str,
+    output_dir: Path,
+    targets: list[str],
+    cache_dir: Path | None = None,
+    force: bool = False,
+    workers: int | None = None,
+) -> None:
+    """Run `targets` and the stages they depend on, reusing cached results.
+
+    Derived columns are cached per stage, keyed by the input fingerprint, the
+    stage's code and parameters and the keys upstream of it. Report stages are
+    skipped when their outputs were already written for the same key.
+    """
+    plan = plan_stages(STAGES, targets)
+    keys = stage_keys(plan, source_fingerprint(csv_path))
+    cache = StageCache(cache_dir or output_dir / STAGE_CACHE_DIR_NAME)
+
+    reports = []
+    for stage in plan:
+        if stage.kind == DERIVE and stage.name not in targets:
+            continue
+        current = stage.kind != DERIVE and not force
+        if current and cache.report_is_current(stage, keys[stage.name], output_dir):
+            logger.info(f"Stage {stage.name} is up to date, skipping")
+            continue
+        reports.append(stage)
+    if not reports:
+        return
+
+    # Only the derived columns and source columns the remaining stages need
+    needed = plan_stages(STAGES, [stage.name for stage in reports])
+    derived = {}
+    for stage in needed:
+        if stage.kind == DERIVE and not force:
+            derived[stage.name] = cache.load_columns(stage, keys[stage.name])
+    compute = [
+        stage
+        for stage in needed
+        if stage.kind == DERIVE and derived.get(stage.name) is None
+    ]
+    readers = [
+        stage for stage in needed if stage.kind not in (DERIVE, SOURCE)
+    ] + compute
+    df = None
+    if readers:
+        columns = source_columns(readers)
+        if columns is not None:
+            # Cached derived columns are attached below, not read from the file
+            outputs = {
+                c for stage in needed if stage.kind == DERIVE for c in stage.outputs
+            }
+            columns = [c for c in columns if c not in outputs]
+        df = load_flow_data(csv_path, columns)
+
+    for stage in needed:
+        if stage.kind != DERIVE:
+            continue
+        columns = derived.get(stage.name)
+        if columns is None:
+            started = time.perf_counter()
+            columns = stage.derive(df)
+            cache.save_columns(stage, keys[stage.name], columns)
+            logger.info(
+                f"Stage {stage.name} computed in {time.perf_counter() - started:.2f}s"
+            )
+        else:
+            logger.info(f"Stage {stage.name} loaded from cache")
+        # Without readers every derived column came from the cache and no
+        # report or figure stage needs the frame
+        if df is None:
+            continue
+        for column in stage.outputs:
+            df[column] = columns[column].to_numpy()
+
+    figures = [stage for stage in reports if stage.kind == FIGURE]
+    render_figures(df, figures, output_dir, workers)
+    for stage in figures:
+        cache.mark_report(stage, keys[stage.name])
+
+    for stage in reports:
+        if stage.kind == REPORT:
+            stage.func(df, output_dir, **stage.params)
+        elif stage.kind == SOURCE:
+            stage.func(csv_path, output_dir, **stage.params)
+        else:
+            continue
+        cache.mark_report(stage, keys[stage.name])
+
+
+def follow_flow_csv(csv_path: str, output_dir: Path, interval: float) -> None:
+    """Analyze a growing flow CSV, updating the summaries as rows are appended."""
+    logger.info(f"Following {csv_path}, refreshing every {interval:.0f}s")
+    tail = FlowTail(csv_path, summary_columns())
+    aggregates = FlowAggregates()
+
+    while True:
+        started = time.perf_counter()
+        chunk = tail.poll()
+        if chunk is not None and len(chunk):
+            chunk["flow_type"] = classify_flows(chunk, log_rules=False)
+            chunk["is_periodic"] = flag_periodic(chunk)
+            aggregates.update(chunk)
+
+            aggregates.summary_statistics().to_csv(
+                output_dir / "summary_statistics.csv", index=False
+            )
+            aggregates.summary_report().to_csv(
+                output_dir / "summary_report.csv", index=False
+            )
+            logger.info(
+                f"+{len(chunk)} flows ({aggregates.flows} total) processed in "
+                f"{time.perf_counter() - started:.3f}s"
+            )
+        time.sleep(interval)
+
+
+def _aggregate_flow_file(
+    csv_path: str, features: list[str]
+) -> tuple[str, FlowAggregates, RunningCovariance, float]:
+    """Process pool task: partial aggregates of one flow file, read in chunks."""
+    started = time.perf_counter()
+    aggregates = FlowAggregates()
+    covariance = RunningCovariance(features)
+    for chunk in summary_chunks(csv_path, features):
+        aggregates.update(chunk)
+        covariance.update(chunk)
+    return csv_path, aggregates, covariance, time.perf_counter() - started
+
+
+def analyze_flow_files(
+    csv_paths: list[str],
+    output_dir: Path,
+    targets: list[str],
+    workers: int | None = None,
+) -> None:
+    """Map-reduce the summary and correlation stages over many flow files.
+
+    Each worker folds one file into mergeable partial aggregates; the partials
+    are merged as they arrive and written as the same outputs a single file
+    produces. Stages that need every flow in one frame are skipped.
+    """
+    skipped = [name for name in targets if name not in MERGEABLE_STAGES]
+    if skipped:
+        logger.warning(f"Stages need a single input file, skipping: {skipped}")
+    targets = [name for name in targets if name in MERGEABLE_STAGES]
+    if not targets:
+        return
+
+    features = feature_columns(csv_paths[0])
+    aggregates = FlowAggregates()
+    covariance = RunningCovariance(features)
+    workers = workers or min(len(csv_paths), os.cpu_count() or 1)
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_aggregate_flow_file, path, features) for path in csv_paths
+        ]
+        for future in as_completed(futures):
+            path, partial, partial_covariance, elapsed = future.result()
+            aggregates.merge(partial)
+            covariance.merge(partial_covariance)
+            logger.info(
+                f"Aggregated {partial.flows} flows from {path} in {elapsed:.1f}s"
+            )
+    logger.info(
+        f"Aggregated {aggregates.flows} flows from {len(csv_paths)} files with "
+        f"{workers} workers in {time.perf_counter() - started:.1f}s"
+    )
+
+    if "summarize_flows" in targets:
+        write_summaries(aggregates, output_dir)
+    if "correlation_analysis" in targets:
+        logger.info("\n=== Feature Correlations ===")
+        write_correlations(
+            covariance, output_dir, **STAGES["correlation_analysis"].params
+        )
+
+
+def _parse_value(text: str):
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return text
+
+
+def apply_overrides(overrides: list[str]) -> None:
+    """Apply `stage.param=value` overrides to the stage parameters."""
+    for override in overrides:
+        target, _, value = override.partition("=")
+        stage_name, _, param = target.partition(".")
+        if stage_name not in STAGES or param not in STAGES[stage_name].params:
+            raise ValueError(f"Unknown stage parameter: {target}")
+        STAGES[stage_name].params[param] = _parse_value(value)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Analyze CICFlowMeter flow data")
+    parser.add_argument(
+        "--input",
+        default="/data/flow.csv",
+        help="flow CSV or pcap, directory of them or quoted glob such as 'flow-*.csv'",
+    )
+    parser.add_argument("--output-dir", default="/data/analysis")
+    parser.add_argument(
+        "--stages",
+        help="comma-separated stages to run (default: every report stage but "
+        "train_flow_classifier); the stages they depend on are added automatically",
+    )
+    parser.add_argument(
+        "--set",
+        dest="overrides",
+        action="append",
+        default=[],
+        metavar="STAGE.PARAM=VALUE",
+        help="override a stage parameter (repeatable)",
+    )
+    parser.add_argument(
+        "--cache-dir", help=f"stage cache (default: OUTPUT_DIR/{STAGE_CACHE_DIR_NAME})"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="re-run stages even if cached"
+    )
+    parser.add_argument(
+        "--workers", type=int, help="worker processes for figures or input files"
+    )
+    parser.add_argument(
+        "--follow",
+        type=float,
+        default=os.getenv("FOLLOW_INTERVAL"),
+        metavar="SECONDS",
+        help="keep analyzing rows appended to the input every SECONDS",
+    )
+    parser.add_argument(
+        "--report-only",
+        action="store_true",
+        default=os.getenv("REPORT_ONLY", "").lower() in ("1", "true", "yes"),
+        help="skip figures and write the summary as JSON and HTML without "
+        "importing matplotlib or seaborn",
+    )
+    parser.add_argument(
+        "--list-stages", action="store_true", help="print the stages and exit"
+    )
+    return parser.parse_args()
 
 
 def main():
     """Main analysis pipeline."""
-    csv_path = "/data/flow.csv"
-    output_dir = Path("/data/analysis")
-    output_dir.mkdir(exist_ok=True)
+    args = parse_args()
 
-    if not Path(csv_path).exists():
-        logger.error(f"CSV file not found: {csv_path}")
+    if args.list_stages:
+        for name, stage in STAGES.items():
+            outputs = ", ".join(stage.outputs)
+            print(f"{name:<26}{stage.kind:<8}{outputs}")
+        return
+
+    csv_paths = expand_flow_inputs(args.input)
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    if not csv_paths:
+        logger.error(f"CSV file not found: {args.input}")
         logger.info("Run: docker compose run cicflowmeter")
         return
 
-    # Load data
-    df = load_flow_data(csv_path)
-
-    # Run analyses
-    basic_statistics(df, output_dir)
-    df = classify_flows(df)
-
-    # Generate visualizations
-    # plot_flow_classification(df, output_dir)
-    # analyze_timing_patterns(df, output_dir)
-    # analyze_packet_sizes(df, output_dir)
-    detect_periodic_traffic(df, output_dir)
-    # correlation_analysis(df, output_dir)
-    # create_traffic_timeline(df, output_dir)
-    # create_summary_report(df, output_dir)
-
-    # Export classified flows
-    output_path = output_dir / "flows_classified.csv"
-    df.to_csv(output_path, index=False)
+    if args.follow:
+        if len(csv_paths) > 1 or is_capture(csv_paths[0]):
+            logger.error("--follow needs a single flow CSV")
+            return
+        follow_flow_csv(csv_paths[0], output_dir, float(args.follow))
+        return
+
+    apply_overrides(args.overrides)
+    targets = args.stages.split(",") if args.stages else REPORT_STAGES
+    if args.report_only:
+        targets = args.stages.split(",") if args.stages else REPORT_ONLY_STAGES
+        figures = [t for t in targets if t in STAGES and STAGES[t].kind == FIGURE]
+        if figures:
+            logger.warning(f"Skipping figure stages in report-only mode: {figures}")
+        targets = [name for name in targets if name not in figures]
+        STAGES["correlation_analysis"].params["top_k"] = 0  # no heatmap
+    if len(csv_paths) > 1:
+        analyze_flow_files(csv_paths, output_dir, targets, args.workers)
+    else:
+        run_pipeline(
+            csv_paths[0],
+            output_dir,
+            targets,
+            Path(args.cache_dir) if args.cache_dir else None,
+            args.force,
+            args.workers,
+        )
+
     logger.info("\n=== Analysis complete ===")
     logger.info(f"Results saved to: {output_dir}/")
-    logger.info("  - Classified flows: flows_classified.csv")
-    logger.info("  - Summary statistics: summary_statistics.csv")
-    logger.info("  - Visualizations: *.png files")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,219 @@
+import argparse
+import json
+import logging
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+import analyze_flows
+from analyze_flows import REPORT_STAGES, STAGES
+from flow_io import load_flows, read_flow_csv
+from flow_pipeline import DERIVE, SOURCE, plan_stages, source_columns
+from synth_flows import FlowSynthesizer, write_synthetic_csv
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+logger = logging.getLogger("benchmark")
+
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+
+
+def measure(func, allocations: bool) -> tuple[dict, object]:
+    """Wall time of one call and, optionally, its peak traced allocation."""
+    started = time.perf_counter()
+    result = func()
+    timing = {"seconds": time.perf_counter() - started}
+    if allocations:
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        timing["peak_alloc_mb"] = peak / 1024**2
+    return timing, result
+
+
+def bench_loading(csv_path: str, allocations: bool) -> dict:
+    """CSV parsing, Parquet cache build and cached reads of one synthetic file."""
+    results = {}
+    results["read_flow_csv"], _ = measure(lambda: read_flow_csv(csv_path), allocations)
+    # The first load converts the CSV to the Parquet cache, later ones read it
+    results["load_flows_cold"], _ = measure(lambda: load_flows(csv_path), False)
+    results["load_flows_cached"], _ = measure(lambda: load_flows(csv_path), allocations)
+    return results
+
+
+def bench_stages(
+    df: pd.DataFrame,
+    csv_path: str | None,
+    output_dir: Path,
+    allocations: bool,
+) -> dict:
+    """Time every analysis stage in dependency order on one frame."""
+    results = {}
+    for stage in plan_stages(STAGES, REPORT_STAGES):
+        reads_file = stage.kind == SOURCE or stage.name == "export_classified_flows"
+        if reads_file and csv_path is None:
+            results[stage.name] = {"skipped": "needs a file on disk"}
+            continue
+        if stage.kind == DERIVE:
+            timing, columns = measure(lambda stage=stage: stage.derive(df), allocations)
+            for column in stage.outputs:
+                df[column] = columns[column].to_numpy()
+        elif stage.kind == SOURCE:
+            timing, _ = measure(
+                lambda stage=stage: stage.func(csv_path, output_dir, **stage.params),
+                allocations,
+            )
+        else:
+            timing, _ = measure(
+                lambda stage=stage: stage.func(df, output_dir, **stage.params),
+                allocations,
+            )
+        results[stage.name] = timing
+        logger.info(f"  {stage.name:<28}{timing['seconds']:>10.3f}s")
+    return results
+
+
+def bench_size(
+    synthesizer: FlowSynthesizer, rows: int, args: argparse.Namespace
+) -> dict:
+    logger.info(f"=== {rows} flows ===")
+    result = {}
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        output_dir = Path(workdir)
+        csv_path = None
+        if rows <= args.file_max_rows:
+            # Large enough files would dominate the run, so only smaller sizes
+            # exercise the loading path and the stages that read the file
+            csv_path = str(output_dir / "flow.csv")
+            started = time.perf_counter()
+            write_synthetic_csv(synthesizer, rows, csv_path)
+            result["generate_seconds"] = time.perf_counter() - started
+            result["csv_mb"] = Path(csv_path).stat().st_size / 1024**2
+            result["loading"] = bench_loading(csv_path, args.allocations)
+            df = load_flows(csv_path)
+        else:
+            # Only the columns of the stages that run on an in-memory frame
+            in_memory = [n for n in REPORT_STAGES if n != "export_classified_flows"]
+            columns = source_columns(plan_stages(STAGES, in_memory))
+            started = time.perf_counter()
+            df = pd.concat(
+                synthesizer.iter_chunks(rows, columns=columns), ignore_index=True
+            )
+            result["generate_seconds"] = time.perf_counter() - started
+
+        result["frame_mb"] = df.memory_usage(deep=True).sum() / 1024**2
+        result["stages"] = bench_stages(df, csv_path, output_dir, args.allocations)
+    result["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """List stages whose time grew more than `threshold` at the same size"""
+    regressions = []
+    for size, result in current["sizes"].items():
+        before_stages = baseline.get("sizes", {}).get(size, {}).get("stages", {})
+        for name, timing in result["stages"].items():
+            before = before_stages.get(name, {}).get("seconds")
+            after = timing.get("seconds")
+            if before and after and (after - before) / before > threshold:
+                regressions.append(
+                    f"{name} @ {size} rows: {before:.3f}s -> {after:.3f}s "
+                    f"({(after - before) / before:+.1%})"
+                )
+    return regressions
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Time and memory-profile every analysis stage at several sizes"
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda text: [int(size) for size in text.split(",")],
+        default=DEFAULT_SIZES,
+        help="comma-separated row counts (default: 10000,1000000,10000000)",
+    )
+    parser.add_argument("--sample", default="/data/flow.csv")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--file-max-rows",
+        type=int,
+        default=1_000_000,
+        help="largest size written to a CSV to benchmark loading and file stages",
+    )
+    parser.add_argument("--workdir", help="directory for temporary files")
+    parser.add_argument(
+        "--no-allocations",
+        dest="allocations",
+        action="store_false",
+        help="skip the tracemalloc pass",
+    )
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.20,
+        help="relative slowdown reported as a regression",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    # The stages log their findings at INFO, which would bury the timings
+    logging.getLogger(analyze_flows.__name__).setLevel(logging.WARNING)
+
+    synthesizer = FlowSynthesizer(read_flow_csv(args.sample), seed=args.seed)
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "parameters": {
+            "sample": args.sample,
+            "seed": args.seed,
+            "density_threshold": analyze_flows.DENSITY_THRESHOLD,
+        },
+        "sizes": {
+            str(rows): bench_size(synthesizer, rows, args) for rows in args.sizes
+        },
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            logger.warning(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        logger.info(f"No regressions against {args.compare}")
@@ -0,0 +1,217 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.json as pa_json
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request, Response
+
+from analyze_flows import CHUNK_STAGE_PARAMS, CLASSIFICATION_COLUMNS, STAGES
+from flow_pipeline import DERIVE, source_columns
+
+logger = logging.getLogger(__name__)
+
+# A batch is labelled once it holds MAX_BATCH_ROWS flows or its oldest request
+# has waited MAX_BATCH_DELAY_MS, whichever comes first
+MAX_BATCH_ROWS = int(os.getenv("MAX_BATCH_ROWS", "16384"))
+MAX_BATCH_DELAY_MS = float(os.getenv("MAX_BATCH_DELAY_MS", "5"))
+SERVICE_PORT = int(os.getenv("CLASSIFY_PORT", "8600"))
+# Longer than uvicorn's 5 s default: pooled clients that reuse a connection just
+# as the server drops it see failed requests
+KEEP_ALIVE_SECONDS = 60
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+JSON_LINES = "application/x-ndjson"
+
+# Batches kept for the latency and throughput figures of /stats
+STATS_WINDOW = 1000
+
+LABEL_STAGES = [stage for stage in STAGES.values() if stage.kind == DERIVE]
+INPUT_COLUMNS = source_columns(LABEL_STAGES)
+
+
+def label_batch(df: pd.DataFrame) -> pd.DataFrame:
+    """Flow type, timing, pattern, size and periodicity labels of a batch."""
+    labels = pd.DataFrame(index=range(len(df)))
+    for stage in LABEL_STAGES:
+        derived = stage.derive(df, **CHUNK_STAGE_PARAMS.get(stage.name, {}))
+        for column in stage.outputs:
+            labels[column] = derived[column].to_numpy()
+    return labels[CLASSIFICATION_COLUMNS]
+
+
+def parse_flows(body: bytes, content_type: str) -> pd.DataFrame:
+    """Flow records from an Arrow IPC stream or JSON lines, label inputs only."""
+    if content_type.startswith(ARROW_STREAM):
+        table = pa.ipc.open_stream(body).read_all()
+    else:
+        table = pa_json.read_json(pa.BufferReader(body))
+    missing = set(INPUT_COLUMNS) - set(table.column_names)
+    if missing:
+        raise ValueError(f"Flow records lack columns {sorted(missing)}")
+    schema = pa.schema([(column, pa.float64()) for column in INPUT_COLUMNS])
+    return table.select(INPUT_COLUMNS).cast(schema).to_pandas()
+
+
+def encode_labels(labels: pd.DataFrame, content_type: str) -> Response:
+    if content_type.startswith(ARROW_STREAM):
+        table = pa.Table.from_pandas(labels, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(sink.getvalue().to_pybytes(), media_type=ARROW_STREAM)
+    columns = {
+        column: (
+            labels[column].astype(str).tolist()
+            if column != "is_periodic"
+            else labels[column].tolist()
+        )
+        for column in labels.columns
+    }
+    return Response(json.dumps(columns), media_type="application/json")
+
+
+class MicroBatcher:
+    """Collects concurrent requests into one DataFrame per batch, labels it with
+    a single vectorized pass and hands every request its slice of the result."""
+
+    def __init__(
+        self, max_rows: int = MAX_BATCH_ROWS, max_delay_ms: float = MAX_BATCH_DELAY_MS
+    ):
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000
+        self.queue = asyncio.Queue()
+        self.batches = deque(maxlen=STATS_WINDOW)
+        self.total_batches = 0
+        self.total_flows = 0
+
+    async def submit(self, df: pd.DataFrame) -> pd.DataFrame:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((df, future, time.perf_counter()))
+        return await future
+
+    async def _next_batch(self) -> list[tuple]:
+        batch = [await self.queue.get()]
+        rows = len(batch[0][0])
+        deadline = batch[0][2] + self.max_delay
+        while rows < self.max_rows:
+            timeout = deadline - time.perf_counter()
+            try:
+                if timeout > 0:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                else:
+                    item = self.queue.get_nowait()
+            except (TimeoutError, asyncio.QueueEmpty):
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _label_batch(self, batch: list[tuple]) -> None:
+        started = time.perf_counter()
+        frames = [df for df, _, _ in batch]
+        try:
+            labels = label_batch(pd.concat(frames, ignore_index=True))
+        except Exception as e:  # noqa: BLE001 - raised again in every waiting request
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finished = time.perf_counter()
+
+        offset = 0
+        for df, future, _ in batch:
+            if not future.done():
+                part = labels.iloc[offset : offset + len(df)]
+                future.set_result(part.reset_index(drop=True))
+            offset += len(df)
+
+        flows = len(labels)
+        latency = finished - batch[0][2]
+        self.batches.append((flows, finished - started, latency))
+        self.total_batches += 1
+        self.total_flows += flows
+        logger.debug(
+            f"Batch of {flows} flows from {len(batch)} requests: "
+            f"{(finished - started) * 1000:.1f} ms labelling, "
+            f"{latency * 1000:.1f} ms since the first request"
+        )
+
+    async def run(self) -> None:
+        while True:
+            self._label_batch(await self._next_batch())
+
+    def stats(self) -> dict:
+        """Batch sizes, latencies and labelling throughput of recent batches."""
+        if not self.batches:
+            return {"batches": 0, "flows": 0}
+        flows, compute, latency = (np.array(v) for v in zip(*self.batches))
+        return {
+            "batches": self.total_batches,
+            "flows": self.total_flows,
+            "recent_batches": len(flows),
+            "mean_batch_flows": float(flows.mean()),
+            "compute_ms_mean": float(compute.mean() * 1000),
+            "latency_ms_p50": float(np.percentile(latency, 50) * 1000),
+            "latency_ms_p99": float(np.percentile(latency, 99) * 1000),
+            "flows_per_second": float(flows.sum() / compute.sum()),
+        }
+
+
+batcher = MicroBatcher()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    task = asyncio.create_task(batcher.run())
+    yield
+    task.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.post("/classify")
+async def classify(request: Request) -> Response:
+    """Label flow records sent as JSON lines or as an Arrow IPC stream.
+
+    JSON requests get a JSON object of label columns, Arrow requests an Arrow
+    stream, both in the order of the submitted flows.
+    """
+    content_type = request.headers.get("content-type", JSON_LINES)
+    try:
+        df = parse_flows(await request.body(), content_type)
+    except (ValueError, pa.ArrowInvalid) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if df.empty:
+        raise HTTPException(status_code=422, detail="No flow records")
+    labels = await batcher.submit(df)
+    return encode_labels(labels, content_type)
+
+
+@app.get("/stats")
+async def stats():
+    return batcher.stats()
+
+
+@app.get("/health")
+async def health():
+    return {"status": "healthy", "inputs": INPUT_COLUMNS}
+
+
+if __name__ == "__main__":
+    # Per-request access logs would cost more than labelling small requests
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=SERVICE_PORT,
+        access_log=False,
+        timeout_keep_alive=KEEP_ALIVE_SECONDS,
+    )
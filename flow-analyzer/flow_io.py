@@ -0,0 +1,420 @@
+import glob
+import hashlib
+import io
+import logging
+import os
+import shutil
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from flow_pcap import PCAP_COLUMNS, iter_pcap_flows
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Bump when the cached column types change so old caches are rebuilt
+CACHE_VERSION = "1"
+CACHE_DIR_NAME = ".flow_cache"
+
+# Rows converted to Arrow at a time, and the row group size of written datasets
+DATASET_BATCH_ROWS = 256 * 1024
+
+# Packet captures are read by extracting their flows instead of as CSV
+CAPTURE_SUFFIXES = (".pcap", ".pcapng", ".cap")
+
+# CICFlowMeter columns that hold identifiers or whole-number counts. Every other
+# numeric column is a rate, mean, deviation or time and is read as float32.
+CATEGORICAL_COLUMNS = ["src_ip", "dst_ip"]
+INTEGER_DTYPES = {
+    "src_port": "uint16",
+    "dst_port": "uint16",
+    "protocol": "uint16",
+    "tot_fwd_pkts": "uint32",
+    "tot_bwd_pkts": "uint32",
+    "totlen_fwd_pkts": "int64",
+    "totlen_bwd_pkts": "int64",
+    "fwd_pkt_len_max": "uint32",
+    "fwd_pkt_len_min": "uint32",
+    "bwd_pkt_len_max": "uint32",
+    "bwd_pkt_len_min": "uint32",
+    "pkt_len_max": "uint32",
+    "pkt_len_min": "uint32",
+    "fwd_header_len": "int64",
+    "bwd_header_len": "int64",
+    "fwd_seg_size_min": "uint32",
+    "fwd_act_data_pkts": "uint32",
+    "fwd_psh_flags": "uint32",
+    "bwd_psh_flags": "uint32",
+    "fwd_urg_flags": "uint32",
+    "bwd_urg_flags": "uint32",
+    "fin_flag_cnt": "uint32",
+    "syn_flag_cnt": "uint32",
+    "rst_flag_cnt": "uint32",
+    "psh_flag_cnt": "uint32",
+    "ack_flag_cnt": "uint32",
+    "urg_flag_cnt": "uint32",
+    "ece_flag_cnt": "uint32",
+    "cwr_flag_count": "uint32",
+    "init_fwd_win_byts": "int32",
+    "init_bwd_win_byts": "int32",
+    "subflow_fwd_pkts": "uint32",
+    "subflow_bwd_pkts": "uint32",
+    "subflow_fwd_byts": "int64",
+    "subflow_bwd_byts": "int64",
+}
+
+
+def is_capture(path: str) -> bool:
+    return Path(path).suffix.lower() in CAPTURE_SUFFIXES
+
+
+def expand_flow_inputs(pattern: str) -> list[str]:
+    """Flow CSVs and captures named by a file, a directory or a glob."""
+    path = Path(pattern)
+    if path.is_dir():
+        suffixes = (".csv",) + CAPTURE_SUFFIXES
+        return sorted(str(p) for p in path.iterdir() if p.suffix.lower() in suffixes)
+    if path.exists():
+        return [pattern]
+    return sorted(p for p in glob.glob(pattern) if Path(p).is_file())
+
+
+def read_header(csv_path: str) -> list[str]:
+    """Return the column names of a flow CSV without reading any rows."""
+    if is_capture(csv_path):
+        return list(PCAP_COLUMNS)
+    return list(pd.read_csv(csv_path, nrows=0).columns)
+
+
+def flow_dtypes(columns: Iterable[str]) -> dict:
+    """Compact dtypes for the given CICFlowMeter columns."""
+    dtypes = {}
+    for column in columns:
+        if column in CATEGORICAL_COLUMNS:
+            dtypes[column] = "category"
+        elif column in INTEGER_DTYPES:
+            dtypes[column] = INTEGER_DTYPES[column]
+        elif column != "timestamp":
+            dtypes[column] = "float32"
+    return dtypes
+
+
+def _read_options(csv_path: str, columns: Iterable[str] | None) -> dict:
+    header = read_header(csv_path)
+    if columns is None:
+        usecols = header
+    else:
+        wanted = set(columns)
+        missing = wanted - set(header)
+        if missing:
+            logger.warning(f"Columns not in {csv_path}: {sorted(missing)}")
+        # Keep file order so projected frames look like the full file
+        usecols = [column for column in header if column in wanted]
+
+    options = {"usecols": usecols, "dtype": flow_dtypes(usecols)}
+    if "timestamp" in usecols:
+        options["parse_dates"] = ["timestamp"]
+        options["date_format"] = TIMESTAMP_FORMAT
+    return options
+
+
+def _widen_integers(options: dict) -> dict:
+    """Read integer columns as float32 when a file has blanks or fractions in them."""
+    dtypes = {
+        column: "float32" if column in INTEGER_DTYPES else dtype
+        for column, dtype in options["dtype"].items()
+    }
+    return {**options, "dtype": dtypes}
+
+
+def _iter_capture_flows(
+    capture_path: str, columns: Iterable[str] | None, chunksize: int
+) -> Iterator[pd.DataFrame]:
+    """Flows extracted from a packet capture, typed like a flow CSV."""
+    usecols = _read_options(capture_path, columns)["usecols"]
+    for chunk in iter_pcap_flows(capture_path, chunksize):
+        yield chunk[usecols].astype(flow_dtypes(usecols))
+
+
+def read_flow_csv(csv_path: str, columns: Iterable[str] | None = None) -> pd.DataFrame:
+    """Read a flow CSV with compact dtypes, optionally only some columns."""
+    if is_capture(csv_path):
+        return pd.concat(
+            _iter_capture_flows(csv_path, columns, 500_000), ignore_index=True
+        )
+    options = _read_options(csv_path, columns)
+    try:
+        return pd.read_csv(csv_path, **options)
+    except ValueError as e:
+        logger.warning(f"Integer columns could not be parsed ({e}), using float32")
+        return pd.read_csv(csv_path, **_widen_integers(options))
+
+
+def iter_flow_chunks(
+    csv_path: str,
+    columns: Iterable[str] | None = None,
+    chunksize: int = 500_000,
+) -> Iterator[pd.DataFrame]:
+    """Yield a flow CSV in typed chunks of at most `chunksize` rows."""
+    if is_capture(csv_path):
+        yield from _iter_capture_flows(csv_path, columns, chunksize)
+        return
+    options = _read_options(csv_path, columns)
+    rows_done = 0
+    while True:
+        try:
+            skip = range(1, rows_done + 1) if rows_done else None
+            reader = pd.read_csv(
+                csv_path, chunksize=chunksize, skiprows=skip, **options
+            )
+            for chunk in reader:
+                rows_done += len(chunk)
+                yield chunk
+            return
+        except ValueError as e:
+            if options["dtype"] == _widen_integers(options)["dtype"]:
+                raise
+            # Resume after the rows already yielded with widened dtypes
+            logger.warning(f"Integer columns could not be parsed ({e}), using float32")
+            options = _widen_integers(options)
+
+
+class FlowTail:
+    """Incrementally read rows appended to a flow CSV that is still being written."""
+
+    def __init__(self, csv_path: str, columns: Iterable[str] | None = None):
+        self.csv_path = csv_path
+        self.columns = columns
+        self.offset = 0
+        self.header = None
+        self.options = None
+
+    def _read_header(self, f) -> bool:
+        line = f.readline()
+        if not line.endswith(b"\n"):
+            return False
+        self.header = line.decode().strip().split(",")
+        wanted = self.header if self.columns is None else set(self.columns)
+        usecols = [column for column in self.header if column in wanted]
+        self.options = {"usecols": usecols, "dtype": flow_dtypes(usecols)}
+        if "timestamp" in usecols:
+            self.options["parse_dates"] = ["timestamp"]
+            self.options["date_format"] = TIMESTAMP_FORMAT
+        self.offset = f.tell()
+        return True
+
+    def poll(self) -> pd.DataFrame | None:
+        """Parse complete rows appended since the last poll, if any."""
+        if not os.path.exists(self.csv_path):
+            return None
+        if os.path.getsize(self.csv_path) < self.offset:
+            logger.warning(f"{self.csv_path} was truncated, reading from the start")
+            self.offset, self.header = 0, None
+
+        with open(self.csv_path, "rb") as f:
+            if self.header is None and not self._read_header(f):
+                return None
+            f.seek(self.offset)
+            data = f.read()
+
+        # Only consume whole lines; the writer may be in the middle of one
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return None
+        self.offset += end
+
+        buffer = io.BytesIO(data[:end])
+        try:
+            return pd.read_csv(buffer, names=self.header, header=None, **self.options)
+        except ValueError:
+            buffer.seek(0)
+            options = _widen_integers(self.options)
+            return pd.read_csv(buffer, names=self.header, header=None, **options)
+
+
+def memory_usage_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 1024**2
+
+
+def source_fingerprint(csv_path: str, mode: str = "stat") -> str:
+    """Identify a source file by size and mtime, or by a hash of its contents."""
+    stat = os.stat(csv_path)
+    if mode == "stat":
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+    if mode == "hash":
+        digest = hashlib.blake2b(digest_size=16)
+        with open(csv_path, "rb") as f:
+            while block := f.read(8 * 1024 * 1024):
+                digest.update(block)
+        return f"{stat.st_size}-{digest.hexdigest()}"
+    raise ValueError(f"Unknown fingerprint mode: {mode}")
+
+
+def cache_path_for(csv_path: str, cache_dir: str | None = None) -> Path:
+    """Parquet cache location for a CSV (default: a hidden dir next to it)."""
+    source = Path(csv_path)
+    directory = Path(cache_dir) if cache_dir else source.parent / CACHE_DIR_NAME
+    # Keep a capture's cache apart from the cache of a CSV with the same stem
+    name = source.name if is_capture(csv_path) else source.stem
+    return directory / f"{name}.parquet"
+
+
+def _cache_key(fingerprint: str) -> str:
+    return f"v{CACHE_VERSION}:{fingerprint}"
+
+
+def cache_is_valid(cache_path: Path, key: str) -> bool:
+    if not cache_path.exists():
+        return False
+    try:
+        metadata = pq.read_schema(cache_path).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return False
+    return metadata.get(b"flow_cache_key") == key.encode()
+
+
+def build_flow_cache(csv_path: str, cache_path: Path, key: str) -> None:
+    """Convert a flow CSV to Parquet chunk by chunk, one row group per chunk."""
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    partial = cache_path.with_suffix(".parquet.tmp")
+    writer = None
+    rows = 0
+    try:
+        for chunk in iter_flow_chunks(csv_path):
+            # Chunks have their own categories; store plain strings and let the
+            # reader dictionary-encode the whole column
+            for column in CATEGORICAL_COLUMNS:
+                if column in chunk:
+                    chunk[column] = chunk[column].astype(str)
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                schema = table.schema.with_metadata({"flow_cache_key": key})
+                writer = pq.ParquetWriter(partial, schema, compression="zstd")
+            writer.write_table(table.cast(writer.schema))
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        raise ValueError(f"No rows in {csv_path}")
+    os.replace(partial, cache_path)
+    logger.info(f"Cached {rows} flows from {csv_path} in {cache_path}")
+
+
+def _cache_columns(cache_path: Path, columns: Iterable[str] | None):
+    """Columns to read from a flow cache and those to read as categoricals, so
+    that IPs come out typed like a CSV's."""
+    available = pq.read_schema(cache_path).names
+    if columns is not None:
+        wanted = set(columns)
+        columns = [column for column in available if column in wanted]
+    dictionary = [
+        column
+        for column in CATEGORICAL_COLUMNS
+        if column in available and (columns is None or column in columns)
+    ]
+    return columns, dictionary
+
+
+def read_flow_cache(cache_path: Path, columns: Iterable[str] | None = None):
+    """Read (some columns of) a Parquet flow cache through a memory map."""
+    columns, dictionary = _cache_columns(cache_path, columns)
+    table = pq.read_table(
+        cache_path, columns=columns, memory_map=True, read_dictionary=dictionary
+    )
+    return table.to_pandas()
+
+
+def load_flows(
+    csv_path: str,
+    columns: Iterable[str] | None = None,
+    use_cache: bool = True,
+    cache_dir: str | None = None,
+    fingerprint: str = "stat",
+) -> pd.DataFrame:
+    """Load flows through the Parquet cache, rebuilding it if the CSV changed."""
+    if not use_cache:
+        return read_flow_csv(csv_path, columns)
+
+    cache_path = cache_path_for(csv_path, cache_dir)
+    key = _cache_key(source_fingerprint(csv_path, fingerprint))
+    if not cache_is_valid(cache_path, key):
+        logger.info(f"Flow cache for {csv_path} missing or stale, rebuilding")
+        try:
+            build_flow_cache(csv_path, cache_path, key)
+        except (OSError, ValueError, pa.ArrowException) as e:
+            logger.warning(f"Could not build flow cache ({e}), reading CSV")
+            return read_flow_csv(csv_path, columns)
+
+    return read_flow_cache(cache_path, columns)
+
+
+def iter_flows(
+    csv_path: str,
+    columns: Iterable[str] | None = None,
+    chunksize: int = 500_000,
+    use_cache: bool = True,
+    cache_dir: str | None = None,
+) -> Iterator[pd.DataFrame]:
+    """Yield flows in chunks, from a valid Parquet cache when there is one."""
+    cache_path = cache_path_for(csv_path, cache_dir)
+    key = _cache_key(source_fingerprint(csv_path))
+    if not use_cache or not cache_is_valid(cache_path, key):
+        yield from iter_flow_chunks(csv_path, columns, chunksize)
+        return
+
+    columns, dictionary = _cache_columns(cache_path, columns)
+    parquet = pq.ParquetFile(cache_path, memory_map=True, read_dictionary=dictionary)
+    for batch in parquet.iter_batches(batch_size=chunksize, columns=columns):
+        yield batch.to_pandas()
+
+
+def write_flow_dataset(
+    df: pd.DataFrame,
+    path: Path,
+    partition_by: list[str],
+    batch_rows: int = DATASET_BATCH_ROWS,
+) -> None:
+    """Write flows as a zstd Parquet dataset, hive-partitioned by `partition_by`.
+
+    The frame is converted and written one batch at a time, so only a batch is
+    held in Arrow memory. The dataset is written next to `path` and swapped in
+    when complete, which also drops partitions from a previous run.
+    """
+    path = Path(path)
+    partial = path.with_name(f"{path.name}.tmp")
+    shutil.rmtree(partial, ignore_errors=True)
+
+    schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+    for column in partition_by:
+        schema = schema.set(
+            schema.get_field_index(column), pa.field(column, pa.string())
+        )
+
+    def batches():
+        for start in range(0, len(df), batch_rows):
+            chunk = df.iloc[start : start + batch_rows]
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            yield from table.cast(schema).to_batches()
+
+    ds.write_dataset(
+        batches(),
+        partial,
+        schema=schema,
+        format="parquet",
+        partitioning=partition_by,
+        partitioning_flavor="hive",
+        basename_template="part-{i}.parquet",
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+        max_rows_per_group=batch_rows,
+    )
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(partial, path)
+    logger.info(f"Wrote {len(df)} flows to {path} partitioned by {partition_by}")
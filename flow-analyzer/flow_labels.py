@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+from flow_io import expand_flow_inputs
+
+# Flow type each client action is meant to produce, as described in the client
+# docs. Actions whose traffic depends on their arguments, like post_echo, are left
+# out and only appear in the per-action table.
+EXPECTED_FLOW_TYPES = {
+    "test_connection": "Quick Request",
+    "register_user": "Quick Request",
+    "get_user_info": "Quick Request",
+    "get_data": "Quick Request",
+    "upload_file_metadata": "Quick Request",
+    "health_check_polling": "Quick Request",
+    "api_polling_pattern": "Quick Request",
+    "login_user": "Interactive",
+    "send_message": "Interactive",
+    "get_messages": "Interactive",
+    "search_query": "Interactive",
+    "interactive_session": "Interactive",
+    "get_large_data": "Large Data",
+    "download_heavy_session": "Large Data",
+    "bulk_message_send": "Bulk Transfer",
+    "streaming_simulation": "Bulk Transfer",
+}
+
+LABEL_COLUMNS = ["client_id", "action", "endpoint"]
+
+
+def read_action_logs(pattern: str) -> pd.DataFrame:
+    """Client action logs from a file, a directory of them or a glob."""
+    paths = expand_flow_inputs(pattern)
+    if not paths:
+        raise FileNotFoundError(f"No action logs found at {pattern}")
+    actions = pd.concat(
+        [
+            pd.read_csv(
+                path,
+                dtype={"client_id": "category", "action": "category"},
+                keep_default_na=False,
+                na_values={"local_ip": [""], "local_port": [""]},
+            )
+            for path in paths
+        ],
+        ignore_index=True,
+    )
+    actions = actions.dropna(subset=["local_port"])
+    for column in ("start", "end"):
+        actions[column] = pd.to_datetime(actions[column], unit="s").astype(
+            "datetime64[ns]"
+        )
+    actions["local_port"] = actions["local_port"].astype(np.int64)
+    return actions
+
+
+def _endpoint_keys(
+    flow_ips: pd.Series, flow_ports, action_ips: pd.Series, action_ports
+) -> tuple[np.ndarray, np.ndarray]:
+    """Integer (ip, port) keys sharing one IP code space, for the join's `by`."""
+    ips = pd.Categorical(flow_ips.astype(str))
+    action_codes = pd.Categorical(
+        action_ips.astype(str), categories=ips.categories
+    ).codes
+    flow_keys = ips.codes.astype(np.int64) * 65536 + np.asarray(flow_ports, np.int64)
+    # IPs never seen in the flows get code -1, so they can match nothing
+    action_keys = np.where(
+        action_codes >= 0,
+        action_codes.astype(np.int64) * 65536 + np.asarray(action_ports, np.int64),
+        -1,
+    )
+    return flow_keys, action_keys
+
+
+def label_flows(
+    flows: pd.DataFrame,
+    actions: pd.DataFrame,
+    tolerance_s: float = 1.0,
+    match_ip: bool = True,
+) -> pd.DataFrame:
+    """Client, action and endpoint of the request behind each flow (NaN if none).
+
+    A flow matches the latest request from its source port (and IP) that started
+    no later than the flow, and that had not ended more than `tolerance_s`
+    before it. Flow timestamps are whole seconds, so the flow may have started up
+    to a second after its timestamp. Both sides are sorted once and joined with
+    merge_asof, which is O((n + m) log(n + m)) instead of a cross product.
+    """
+    if match_ip:
+        flow_keys, action_keys = _endpoint_keys(
+            flows["src_ip"],
+            flows["src_port"],
+            actions["local_ip"],
+            actions["local_port"],
+        )
+    else:
+        flow_keys = flows["src_port"].to_numpy(np.int64)
+        action_keys = actions["local_port"].to_numpy(np.int64)
+
+    slack = pd.Timedelta(seconds=1 + tolerance_s)
+    left = pd.DataFrame(
+        {
+            "key": flow_keys,
+            "latest_start": flows["timestamp"].to_numpy("datetime64[ns]") + slack,
+        }
+    )
+    left["row"] = np.arange(len(left))
+    right = actions[["start", "end"] + LABEL_COLUMNS].assign(key=action_keys)
+    joined = pd.merge_asof(
+        left.sort_values("latest_start"),
+        right.sort_values("start"),
+        left_on="latest_start",
+        right_on="start",
+        by="key",
+        direction="backward",
+    ).sort_values("row")
+
+    # The request must still have been running when the flow started
+    earliest_start = joined["latest_start"] - slack
+    valid = (
+        joined["end"] + pd.Timedelta(seconds=tolerance_s) >= earliest_start
+    ).to_numpy()
+    labels = joined[LABEL_COLUMNS].reset_index(drop=True)
+    labels = labels.where(pd.Series(valid, index=labels.index), axis=0)
+    return labels.set_index(flows.index)
+
+
+def confusion_matrix(actions: pd.Series, flow_types: pd.Series) -> pd.DataFrame:
+    """Expected flow type (from the action) against the classified flow type."""
+    expected = actions.map(EXPECTED_FLOW_TYPES)
+    known = expected.notna()
+    return pd.crosstab(
+        expected[known].rename("expected"),
+        flow_types[known].astype(str).rename("predicted"),
+    )
@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+
+from flow_stats import RunningMoments
+
+# Standardized features are clipped to this many standard deviations, which also
+# bounds the infinite rates of zero-duration flows
+FEATURE_CLIP = 10.0
+
+
+class FlowClassifier:
+    """Multinomial logistic regression over CICFlowMeter features.
+
+    Features are log-scaled and standardized with moments gathered in a first
+    pass (`update_scaler`), then the model is trained chunk by chunk with
+    mini-batch SGD (`partial_fit`). Everything runs on float32 matrices.
+    """
+
+    def __init__(
+        self,
+        features: list[str],
+        classes: list[str],
+        learning_rate: float = 0.1,
+        momentum: float = 0.9,
+        l2: float = 1e-5,
+        seed: int = 0,
+    ):
+        self.features = list(features)
+        self.classes = list(classes)
+        self.learning_rate = learning_rate
+        self.momentum = momentum
+        self.l2 = l2
+        self.rng = np.random.default_rng(seed)
+        self.moments = [RunningMoments() for _ in self.features]
+        self.mean = np.zeros(len(self.features), dtype=np.float32)
+        self.scale = np.ones(len(self.features), dtype=np.float32)
+        self.weights = np.zeros((len(self.features), len(self.classes)), np.float32)
+        self.bias = np.zeros(len(self.classes), dtype=np.float32)
+        self._velocity = (np.zeros_like(self.weights), np.zeros_like(self.bias))
+
+    def _raw_matrix(self, df: pd.DataFrame) -> np.ndarray:
+        """Signed log1p of the features: they span many orders of magnitude."""
+        values = df[self.features].to_numpy(np.float32)
+        sign = np.sign(values)
+        np.log1p(np.abs(values, out=values), out=values)
+        values *= sign
+        return values
+
+    def update_scaler(self, df: pd.DataFrame) -> None:
+        """Fold a chunk into the per-feature moments used for standardizing."""
+        values = self._raw_matrix(df)
+        for i, moments in enumerate(self.moments):
+            moments.update(values[:, i])
+        self.mean = np.array([m.mean for m in self.moments], dtype=np.float32)
+        std = np.array([m.std for m in self.moments], dtype=np.float32)
+        self.scale = np.where(std > 0, std, 1).astype(np.float32)
+
+    def transform(self, df: pd.DataFrame) -> np.ndarray:
+        """Standardized float32 feature matrix of a chunk of flows."""
+        values = self._raw_matrix(df)
+        values -= self.mean
+        values /= self.scale
+        np.nan_to_num(
+            values, copy=False, nan=0.0, posinf=FEATURE_CLIP, neginf=-FEATURE_CLIP
+        )
+        return np.clip(values, -FEATURE_CLIP, FEATURE_CLIP, out=values)
+
+    def class_codes(self, labels) -> np.ndarray:
+        """Class index of each label, -1 for labels the model does not know."""
+        return pd.Categorical(labels, categories=self.classes).codes.astype(np.int64)
+
+    def _probabilities(self, x: np.ndarray) -> np.ndarray:
+        logits = x @ self.weights + self.bias
+        logits -= logits.max(axis=1, keepdims=True)
+        np.exp(logits, out=logits)
+        logits /= logits.sum(axis=1, keepdims=True)
+        return logits
+
+    def partial_fit(self, x: np.ndarray, y: np.ndarray, batch_size: int = 8192):
+        """One shuffled pass of mini-batch SGD with momentum over a chunk."""
+        order = self.rng.permutation(len(x))
+        velocity_w, velocity_b = self._velocity
+        for start in range(0, len(order), batch_size):
+            batch = order[start : start + batch_size]
+            xb = x[batch]
+            gradient = self._probabilities(xb)
+            gradient[np.arange(len(batch)), y[batch]] -= 1
+            gradient /= len(batch)
+            velocity_w *= self.momentum
+            velocity_w -= self.learning_rate * (
+                xb.T @ gradient + self.l2 * self.weights
+            )
+            velocity_b *= self.momentum
+            velocity_b -= self.learning_rate * gradient.sum(axis=0)
+            self.weights += velocity_w
+            self.bias += velocity_b
+        return self
+
+    def predict_codes(self, x: np.ndarray, batch_size: int = 262_144) -> np.ndarray:
+        """Class index of every row, scored in large batches."""
+        codes = np.empty(len(x), dtype=np.int64)
+        for start in range(0, len(x), batch_size):
+            logits = x[start : start + batch_size] @ self.weights
+            codes[start : start + batch_size] = (logits + self.bias).argmax(axis=1)
+        return codes
+
+    def predict(self, df: pd.DataFrame, batch_size: int = 262_144) -> pd.Categorical:
+        codes = self.predict_codes(self.transform(df), batch_size)
+        return pd.Categorical.from_codes(codes, categories=self.classes)
+
+    def save(self, path) -> None:
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                features=np.array(self.features),
+                classes=np.array(self.classes),
+                mean=self.mean,
+                scale=self.scale,
+                weights=self.weights,
+                bias=self.bias,
+            )
+
+    @classmethod
+    def load(cls, path) -> "FlowClassifier":
+        with np.load(path) as saved:
+            model = cls(saved["features"].tolist(), saved["classes"].tolist())
+            model.mean = saved["mean"]
+            model.scale = saved["scale"]
+            model.weights = saved["weights"]
+            model.bias = saved["bias"]
+        return model
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+CONVERSATION_KEYS = ["src_ip", "dst_ip", "dst_port"]
+
+# A conversation needs this many flows and repetitions of a period to be scored
+MIN_FLOWS = 4
+MIN_REPETITIONS = 3
+
+# Upper bound on the cells of one batched FFT (rows x transform length)
+MAX_BATCH_CELLS = 4_000_000
+
+
+def _start_seconds(timestamps: pd.Series) -> np.ndarray:
+    return timestamps.to_numpy("datetime64[ns]").astype(np.int64) / 1e9
+
+
+def _dominant_lags(
+    counts: np.ndarray, lengths: np.ndarray, flows: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Best autocorrelation lag and its strength for each row of a count matrix.
+
+    Rows are zero-padded beyond their length, so the FFT gives the linear
+    (not circular) autocorrelation of the mean-removed series.
+    """
+    n_fft = counts.shape[1]
+    columns = np.arange(n_fft)
+    inside = columns < lengths[:, None]
+    series = np.where(inside, counts - (flows / lengths)[:, None], 0.0)
+
+    spectrum = np.fft.rfft(series, axis=1)
+    acf = np.fft.irfft(spectrum.real**2 + spectrum.imag**2, n=n_fft, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        acf /= acf[:, :1]
+
+    # Only lags that repeat MIN_REPETITIONS times inside the conversation
+    valid = (columns >= 1) & (columns <= (lengths // MIN_REPETITIONS)[:, None])
+    acf = np.where(valid & np.isfinite(acf), acf, -np.inf)
+    lags = acf.argmax(axis=1)
+    strength = acf[np.arange(len(acf)), lags]
+    return lags, np.where(np.isfinite(strength), strength, np.nan)
+
+
+def conversation_periodicity(
+    df: pd.DataFrame, bin_seconds: float = 1.0, min_flows: int = MIN_FLOWS
+) -> pd.DataFrame:
+    """Dominant period of flow starts for every (src_ip, dst_ip, dst_port).
+
+    Flow start times are binned into per-conversation count series. Their
+    autocorrelations are computed in batched FFTs, grouping conversations by
+    transform length. `strength` is the normalized autocorrelation at the
+    dominant lag: 1 for perfectly regular starts, near 0 for random ones.
+    """
+    group = df.groupby(CONVERSATION_KEYS, observed=True, sort=False).ngroup()
+    group = group.to_numpy()
+    seconds = _start_seconds(df["timestamp"])
+
+    order = np.lexsort((seconds, group))
+    group, seconds = group[order], seconds[order]
+    first = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    last = np.r_[first[1:], len(group)] - 1
+
+    flows = last - first + 1
+    start = seconds[first]
+    bins = ((seconds - start[group]) // bin_seconds).astype(np.int64)
+    lengths = bins[last] + 1
+
+    result = pd.DataFrame(
+        {
+            "flows": flows,
+            "span_s": seconds[last] - start,
+            "period_s": np.nan,
+            "strength": np.nan,
+        }
+    )
+
+    eligible = np.flatnonzero((flows >= min_flows) & (lengths >= MIN_REPETITIONS * 2))
+    n_fft = 2 ** np.ceil(np.log2(2 * lengths[eligible])).astype(np.int64)
+    row_of = np.full(len(flows), -1)
+    for size in np.unique(n_fft):
+        same_size = eligible[n_fft == size]
+        batch_rows = max(MAX_BATCH_CELLS // size, 1)
+        for offset in range(0, len(same_size), batch_rows):
+            batch = same_size[offset : offset + batch_rows]
+            row_of[batch] = np.arange(len(batch))
+            rows = row_of[group]
+            member = rows >= 0
+            counts = np.bincount(
+                rows[member] * size + bins[member], minlength=len(batch) * size
+            ).reshape(len(batch), size)
+            row_of[batch] = -1
+
+            lags, strength = _dominant_lags(counts, lengths[batch], flows[batch])
+            result.loc[batch, "period_s"] = lags * bin_seconds
+            result.loc[batch, "strength"] = strength
+
+    keys = df[CONVERSATION_KEYS].iloc[order[first]].reset_index(drop=True)
+    return pd.concat([keys, result], axis=1)
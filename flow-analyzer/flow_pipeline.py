@@ -0,0 +1,257 @@
+import hashlib
+import heapq
+import inspect
+import json
+import logging
+import os
+from graphlib import TopologicalSorter
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+# Stage kinds: derive stages add columns, the others write files to the output dir.
+# Figure stages run in worker processes, source stages read the input file themselves.
+DERIVE = "derive"
+REPORT = "report"
+FIGURE = "figure"
+SOURCE = "source"
+
+# Input placeholder for every column of the source file
+ALL_COLUMNS = "*"
+
+STAGE_CACHE_DIR_NAME = ".stage_cache"
+
+
+class Stage:
+    """One analysis step with the columns it reads and the columns or files it writes.
+
+    Derive stages return a Series (one output column) or a DataFrame of their
+    output columns and must not modify the frame they are given.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func,
+        kind: str,
+        inputs: list[str],
+        outputs: list[str],
+        params: dict | None = None,
+        version: str = "",
+    ):
+        self.name = name
+        self.func = func
+        self.kind = kind
+        self.inputs = inputs
+        self.outputs = outputs
+        self.params = params or {}
+        self.version = version
+
+    def derive(self, df: pd.DataFrame, **params) -> pd.DataFrame:
+        """Output columns of the stage on `df`; `params` override the stage's."""
+        result = self.func(df, **{**self.params, **params})
+        if isinstance(result, pd.Series):
+            result = result.to_frame(self.outputs[0])
+        missing = set(self.outputs) - set(result.columns)
+        if missing:
+            raise ValueError(f"Stage {self.name} did not produce {sorted(missing)}")
+        return result[self.outputs].reset_index(drop=True)
+
+
+def dependencies(stages: dict[str, Stage]) -> dict[str, set[str]]:
+    """Derive stages each stage depends on through its input columns."""
+    producers = {}
+    for stage in stages.values():
+        if stage.kind == DERIVE:
+            for column in stage.outputs:
+                if column in producers:
+                    raise ValueError(f"Column {column} is derived by two stages")
+                producers[column] = stage.name
+    return {
+        name: {producers[c] for c in stage.inputs if c in producers}
+        for name, stage in stages.items()
+    }
+
+
+def plan_stages(stages: dict[str, Stage], targets: list[str]) -> list[Stage]:
+    """The target stages and everything upstream of them, in dependency order.
+
+    Whenever several stages are ready, the one declared first runs first.
+    """
+    unknown = [name for name in targets if name not in stages]
+    if unknown:
+        raise ValueError(f"Unknown stages: {unknown}")
+
+    graph = {}
+    depends_on = dependencies(stages)
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in graph:
+            graph[name] = depends_on[name]
+            pending.extend(depends_on[name])
+
+    position = {name: i for i, name in enumerate(stages)}
+    sorter = TopologicalSorter(graph)
+    sorter.prepare()
+    ready = []
+    order = []
+    while sorter.is_active():
+        for name in sorter.get_ready():
+            heapq.heappush(ready, (position[name], name))
+        _, name = heapq.heappop(ready)
+        order.append(name)
+        sorter.done(name)
+    return [stages[name] for name in order]
+
+
+def source_columns(plan: list[Stage]) -> list[str] | None:
+    """Source file columns the stages read, or None if any reads every column."""
+    derived = {c for stage in plan if stage.kind == DERIVE for c in stage.outputs}
+    columns = []
+    for stage in plan:
+        if stage.kind == SOURCE:
+            continue
+        if ALL_COLUMNS in stage.inputs:
+            return None
+        columns += [c for c in stage.inputs if c not in derived and c not in columns]
+    return columns
+
+
+# Module-level values folded into a stage's code fingerprint when it reads them,
+# alone or in containers that hold nothing else
+_PLAIN_TYPES = (type(None), bool, int, float, str, bytes)
+
+
+def _plain_repr(value) -> str | None:
+    """Repr of a value that is the same in every process, or None if there is none.
+
+    Stages stand for their name and version; other objects, whose repr may hold
+    their address, make the value unfit for a fingerprint.
+    """
+    if isinstance(value, _PLAIN_TYPES):
+        return repr(value)
+    if isinstance(value, Stage):
+        return f"Stage({value.name!r}, {value.version!r})"
+    if isinstance(value, dict):
+        keys = [_plain_repr(k) for k in value]
+        values = [_plain_repr(v) for v in value.values()]
+        items = [f"{k}: {v}" for k, v in zip(keys, values, strict=True)]
+        if None in keys or None in values:
+            return None
+    elif isinstance(value, (tuple, list, set, frozenset)):
+        items = [_plain_repr(v) for v in value]
+        if None in items:
+            return None
+        # Set order depends on the per-process string hash seed
+        if isinstance(value, (set, frozenset)):
+            items.sort()
+    else:
+        return None
+    return f"{type(value).__name__}[{', '.join(items)}]"
+
+
+def _code_constants(code) -> list:
+    """Constants of a code object and of the functions nested in it."""
+    constants = []
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            constants += _code_constants(const)
+        else:
+            constants.append(const)
+    return constants
+
+
+def code_fingerprint(func, _seen: set | None = None) -> str:
+    """Hash of a function's source and constants, the plain module-level values
+    it reads and, recursively, the helpers it calls from the same directory.
+
+    Bytecode alone misses edits to literals such as bin edges or thresholds.
+    """
+    seen = _seen if _seen is not None else set()
+    seen.add(func)
+    code = func.__code__
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        source = code.co_code.hex()
+    parts = [source, repr(_code_constants(code))]
+    directory = os.path.dirname(code.co_filename)
+    for name in sorted(set(code.co_names)):
+        value = func.__globals__.get(name)
+        if inspect.isfunction(value):
+            helper = value.__code__.co_filename
+            if value not in seen and os.path.dirname(helper) == directory:
+                parts.append(f"{name}:{code_fingerprint(value, seen)}")
+        elif (plain := _plain_repr(value)) is not None:
+            parts.append(f"{name}={plain}")
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def stage_keys(plan: list[Stage], fingerprint: str) -> dict[str, str]:
+    """Cache key per stage from the input fingerprint, its code and parameters
+    and the keys of the stages upstream of it."""
+    depends_on = dependencies({stage.name: stage for stage in plan})
+    keys = {}
+    for stage in plan:
+        spec = {
+            "source": fingerprint,
+            "stage": stage.name,
+            "code": code_fingerprint(stage.func),
+            "version": stage.version,
+            "params": stage.params,
+            "upstream": sorted(keys[name] for name in depends_on[stage.name]),
+        }
+        encoded = json.dumps(spec, sort_keys=True, default=str).encode()
+        keys[stage.name] = hashlib.sha256(encoded).hexdigest()
+    return keys
+
+
+class StageCache:
+    """Derived columns as Parquet files and the keys of reports already written."""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def _columns_path(self, stage: Stage, key: str) -> Path:
+        return self.directory / f"{stage.name}-{key[:16]}.parquet"
+
+    def _manifest_path(self, stage: Stage) -> Path:
+        return self.directory / f"{stage.name}.json"
+
+    def load_columns(self, stage: Stage, key: str) -> pd.DataFrame | None:
+        path = self._columns_path(stage, key)
+        if not path.exists():
+            return None
+        try:
+            return pq.read_table(path, memory_map=True).to_pandas()
+        except (OSError, pa.ArrowInvalid) as e:
+            logger.warning(f"Ignoring unreadable stage cache {path}: {e}")
+            return None
+
+    def save_columns(self, stage: Stage, key: str, columns: pd.DataFrame) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for stale in self.directory.glob(f"{stage.name}-*.parquet"):
+            stale.unlink()
+        path = self._columns_path(stage, key)
+        partial = path.with_suffix(".parquet.tmp")
+        columns.to_parquet(partial, index=False, compression="zstd")
+        os.replace(partial, path)
+
+    def report_is_current(self, stage: Stage, key: str, output_dir: Path) -> bool:
+        """Whether the stage already wrote all its outputs for this key."""
+        path = self._manifest_path(stage)
+        if not path.exists():
+            return False
+        manifest = json.loads(path.read_text())
+        return manifest.get("key") == key and all(
+            (output_dir / output).exists() for output in stage.outputs
+        )
+
+    def mark_report(self, stage: Stage, key: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._manifest_path(stage).write_text(json.dumps({"key": key}))
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+from flow_sketches import KLLSketch, SpaceSaving
+from flow_timeseries import BYTE_COLUMNS
+
+# Key levels of the profiles and the output they are written to
+PROFILE_LEVELS = {
+    "host_profiles.csv": ["src_ip"],
+    "host_port_profiles.csv": ["src_ip", "dst_port"],
+}
+PACKET_COLUMNS = ["tot_fwd_pkts", "tot_bwd_pkts"]
+PROFILE_QUANTILES = [0.5, 0.95, 0.99]
+
+
+def key_sums(df: pd.DataFrame, keys: list[str], flow_types: list[str]) -> pd.DataFrame:
+    """Bytes, flows, packets and flows of each type per key, in one groupby."""
+    types = pd.Categorical(df["flow_type"], categories=flow_types)
+    frame = pd.get_dummies(types, dtype=np.int64).set_axis(flow_types, axis=1)
+    frame.insert(0, "bytes", df[BYTE_COLUMNS].sum(axis=1).to_numpy(np.float64))
+    frame.insert(1, "flows", 1)
+    frame.insert(2, "packets", df[PACKET_COLUMNS].sum(axis=1).to_numpy(np.int64))
+    for i, key in enumerate(keys):
+        frame.insert(i, key, df[key].to_numpy())
+    sums = frame.groupby(keys, observed=True, sort=False).sum()
+    # Plain string IPs, so that indexes of chunks with other categories align
+    return sums.set_axis(_plain_index(sums.index), axis=0)
+
+
+def _plain_index(index: pd.Index) -> pd.Index:
+    if isinstance(index, pd.MultiIndex):
+        levels = [index.get_level_values(0).astype(str)]
+        levels += [index.get_level_values(i) for i in range(1, index.nlevels)]
+        return pd.MultiIndex.from_arrays(levels, names=index.names)
+    return index.astype(str)
+
+
+class HostProfiler:
+    """Traffic profile of the heaviest keys (hosts or host-port pairs) of a file.
+
+    `count` runs over every chunk first and keeps the `capacity` heaviest keys by
+    bytes; `select` then fixes the `top_k` heavy hitters, and `describe` runs
+    over every chunk again to gather their throughput percentiles and timelines.
+    """
+
+    def __init__(self, keys: list[str], flow_types: list[str], capacity: int):
+        self.keys = keys
+        self.flow_types = flow_types
+        self.heavy = SpaceSaving(capacity, "bytes")
+        self.total_bytes = 0.0
+        self.top = None
+
+    def count(self, chunk: pd.DataFrame) -> None:
+        sums = key_sums(chunk, self.keys, self.flow_types)
+        self.total_bytes += float(sums["bytes"].sum())
+        self.heavy.update(sums)
+
+    def _empty_sums(self) -> pd.DataFrame:
+        """Sums of no flows at all, with the columns of key_sums and the error."""
+        if len(self.keys) > 1:
+            index = pd.MultiIndex.from_tuples([], names=self.keys)
+        else:
+            index = pd.Index([], dtype=object, name=self.keys[0])
+        columns = ["bytes", "flows", "packets", *self.flow_types, "error"]
+        return pd.DataFrame(0, index=index, columns=columns)
+
+    def select(self, top_k: int, buckets: int) -> None:
+        if self.heavy.table is None:
+            self.top = self._empty_sums()
+        else:
+            self.top = self.heavy.top(top_k)
+        self.quantiles = [KLLSketch() for _ in range(len(self.top))]
+        self.timeline = np.zeros((len(self.top), buckets))
+
+    def describe(self, chunk: pd.DataFrame, buckets: np.ndarray) -> None:
+        """Fold in the throughput and start bucket of the heavy hitters' flows."""
+        hosts = self.top.index.get_level_values(0).unique()
+        mask = chunk["src_ip"].astype(str).isin(hosts).to_numpy()
+        if not mask.any():
+            return
+        rows = chunk[mask]
+        keys = _plain_index(pd.MultiIndex.from_frame(rows[self.keys]))
+        if len(self.keys) == 1:
+            keys = keys.get_level_values(0)
+        position = self.top.index.get_indexer(keys)
+        known = position >= 0
+        position, bucket = position[known], buckets[mask][known]
+        throughput = rows["flow_byts_s"].to_numpy(np.float64)[known]
+        size = rows[BYTE_COLUMNS].sum(axis=1).to_numpy(np.float64)[known]
+
+        width = self.timeline.shape[1]
+        self.timeline += np.bincount(
+            position * width + bucket, weights=size, minlength=self.timeline.size
+        ).reshape(self.timeline.shape)
+        order = np.argsort(position, kind="stable")
+        bounds = np.searchsorted(position[order], np.arange(len(self.top) + 1))
+        for i, sketch in enumerate(self.quantiles):
+            sketch.update(throughput[order[bounds[i] : bounds[i + 1]]])
+
+    def profiles(self) -> pd.DataFrame:
+        """One row per heavy hitter, heaviest first."""
+        top = self.top
+        table = top[["flows", "bytes", "packets"]].astype(np.int64)
+        table.insert(1, "share", top["bytes"] / self.total_bytes)
+        table["bytes_error"] = top["error"].astype(np.int64)
+        flows = top["flows"].where(top["flows"] > 0)
+        table["main_flow_type"] = top[self.flow_types].idxmax(axis=1)
+        for flow_type in self.flow_types:
+            column = "share_" + flow_type.lower().replace(" ", "_")
+            table[column] = top[flow_type] / flows
+        percentiles = np.array([s.quantiles(PROFILE_QUANTILES) for s in self.quantiles])
+        for i, q in enumerate(PROFILE_QUANTILES):
+            table[f"throughput_p{q * 100:g}"] = (
+                percentiles[:, i] if len(percentiles) else []
+            )
+        return table.reset_index()
@@ -0,0 +1,104 @@
+import html
+import json
+
+import numpy as np
+
+STYLE = """
+body { font-family: system-ui, sans-serif; margin: 2rem auto; max-width: 60rem;
+       color: #222; }
+h1 { font-size: 1.6rem; }
+h2 { font-size: 1.2rem; margin-top: 2rem; border-bottom: 1px solid #ddd; }
+table { border-collapse: collapse; width: 100%; }
+th, td { text-align: left; padding: 0.3rem 0.6rem; border-bottom: 1px solid #eee; }
+td.num { text-align: right; font-variant-numeric: tabular-nums; }
+.bar { background: #4c72b0; height: 0.8rem; }
+svg.spark { display: block; }
+"""
+
+
+def json_ready(value):
+    """Plain Python values for json.dump (numpy scalars, NaN as null)."""
+    if isinstance(value, dict):
+        return {str(k): json_ready(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_ready(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+def write_json(report: dict, path) -> None:
+    with open(path, "w") as f:
+        json.dump(json_ready(report), f, indent=2)
+
+
+def _format(value) -> str:
+    if isinstance(value, float):
+        return f"{value:,.4g}" if abs(value) < 1e4 else f"{value:,.0f}"
+    if isinstance(value, int) and not isinstance(value, bool):
+        return f"{value:,}"
+    return "" if value is None else str(value)
+
+
+def sparkline(values: list, width: int = 120, height: int = 24) -> str:
+    """Inline SVG line of a series, scaled to its own maximum."""
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+    peak = values.max() if len(values) and values.max() > 0 else 1.0
+    x = np.linspace(0, width, len(values))
+    y = height - 1 - values / peak * (height - 2)
+    points = " ".join(f"{a:.1f},{b:.1f}" for a, b in zip(x, y))
+    return (
+        f'<svg class="spark" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}"><polyline fill="none" stroke="#4c72b0" '
+        f'stroke-width="1.5" points="{points}"/></svg>'
+    )
+
+
+def _cell(value) -> str:
+    if isinstance(value, list):
+        return f"<td>{sparkline(value)}</td>"
+    numeric = isinstance(value, (int, float)) and not isinstance(value, bool)
+    css = ' class="num"' if numeric else ""
+    return f"<td{css}>{html.escape(_format(value))}</td>"
+
+
+def _table(rows: list[dict], share_column: str | None = None) -> str:
+    """HTML table of `rows`, with a bar for the 0-1 `share_column`."""
+    if not rows:
+        return "<p>No data.</p>"
+    columns = list(rows[0])
+    head = "".join(f"<th>{html.escape(c)}</th>" for c in columns)
+    if share_column:
+        head += "<th></th>"
+    body = []
+    for row in rows:
+        cells = "".join(_cell(row[c]) for c in columns)
+        if share_column:
+            width = 100 * (row[share_column] or 0)
+            cells += f'<td><div class="bar" style="width: {width:.1f}%"></div></td>'
+        body.append(f"<tr>{cells}</tr>")
+    return f"<table><tr>{head}</tr>{''.join(body)}</table>"
+
+
+def render_html(report: dict, title: str = "Flow Analysis Report") -> str:
+    """Self-contained HTML page (inline CSS, no scripts or images) of a report
+    made of a "summary" mapping and named lists of table rows. List values are
+    drawn as inline SVG sparklines."""
+    report = json_ready(report)
+    sections = [f"<h1>{html.escape(title)}</h1>"]
+    summary = [{"Metric": k, "Value": v} for k, v in report["summary"].items()]
+    sections.append(f"<h2>Summary</h2>{_table(summary)}")
+    for name, rows in report.items():
+        if name == "summary":
+            continue
+        heading = name.replace("_", " ").capitalize()
+        share = "share" if rows and "share" in rows[0] else None
+        sections.append(f"<h2>{html.escape(heading)}</h2>{_table(rows, share)}")
+    return (
+        "<!DOCTYPE html>\n"
+        f'<html lang="en"><head><meta charset="utf-8">'
+        f"<title>{html.escape(title)}</title><style>{STYLE}</style></head>"
+        f"<body>{''.join(sections)}</body></html>\n"
+    )
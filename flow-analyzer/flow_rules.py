@@ -0,0 +1,80 @@
+import hashlib
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_RULES_PATH = Path(__file__).with_name("flow_rules.json")
+
+# Flow types are stored as int8 codes, so at most 127 rules plus the default
+MAX_RULES = 127
+
+_IDENTIFIER = re.compile(r"(?<![\w.])[A-Za-z_]\w*")
+_OPERATORS = {"and", "or", "not", "in", "True", "False"}
+
+
+class FlowRules:
+    """Classification rules in priority order: the first matching rule wins."""
+
+    def __init__(self, rules: list[dict], default: str = "Other"):
+        if len(rules) > MAX_RULES:
+            raise ValueError(f"At most {MAX_RULES} rules are supported")
+        names = [rule["name"] for rule in rules]
+        if len(set(names)) != len(names) or default in names:
+            raise ValueError("Rule names and the default flow type must be unique")
+        for rule in rules:
+            if not rule.get("when"):
+                raise ValueError(f"Rule '{rule['name']}' has no condition")
+
+        self.rules = rules
+        self.default = default
+        self.categories = names + [default]
+        spec = json.dumps({"rules": rules, "default": default}, sort_keys=True)
+        self.digest = hashlib.sha256(spec.encode()).hexdigest()
+
+    @property
+    def columns(self) -> list[str]:
+        """Flow columns referenced by the rule conditions."""
+        columns = []
+        for rule in self.rules:
+            for name in _IDENTIFIER.findall(rule["when"]):
+                if name in _OPERATORS or name in columns:
+                    continue
+                columns.append(name)
+        return columns
+
+    def classify(self, df: pd.DataFrame) -> tuple[pd.Categorical, pd.DataFrame]:
+        """Flow type of every row plus per-rule match counts.
+
+        Each condition is evaluated once over whole columns. Only the int8 codes
+        and one boolean mask are kept alongside the frame.
+        """
+        default_code = len(self.rules)
+        codes = np.full(len(df), default_code, dtype=np.int8)
+        unassigned = np.ones(len(df), dtype=bool)
+        counts = []
+
+        for code, rule in enumerate(self.rules):
+            try:
+                matched = np.asarray(df.eval(rule["when"]), dtype=bool)
+            except Exception as e:
+                raise ValueError(f"Rule '{rule['name']}' failed: {e}") from e
+            matched_count = int(matched.sum())
+            matched = matched & unassigned
+            codes[matched] = code
+            unassigned[matched] = False
+            counts.append((rule["name"], matched_count, int(matched.sum())))
+
+        remaining = int(unassigned.sum())
+        counts.append((self.default, remaining, remaining))
+        flow_types = pd.Categorical.from_codes(codes, categories=self.categories)
+        report = pd.DataFrame(counts, columns=["Rule", "Matched", "Assigned"])
+        return flow_types, report
+
+
+def load_flow_rules(path: str | Path = DEFAULT_RULES_PATH) -> FlowRules:
+    """Load classification rules from a JSON file."""
+    spec = json.loads(Path(path).read_text())
+    return FlowRules(spec["rules"], spec.get("default", "Other"))
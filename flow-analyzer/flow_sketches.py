@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+
+# HyperLogLog registers are 2**HLL_PRECISION bytes (16 KiB), for a standard
+# error of 1.04 / sqrt(2**14) = 0.81% on distinct counts
+HLL_PRECISION = 14
+# KLL items kept at the top level; memory is about 3 * KLL_K floats
+KLL_K = 200
+
+
+def _leading_zeros(x: np.ndarray) -> np.ndarray:
+    """Leading zero bits of every uint64, by binary search over 6 shifts."""
+    zeros = np.zeros(len(x), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high_clear = x < (np.uint64(1) << np.uint64(64 - shift))
+        zeros[high_clear] += shift
+        x = np.where(high_clear, x << np.uint64(shift), x)
+    return zeros + (x == 0)
+
+
+class HyperLogLog:
+    """Mergeable distinct-count estimate in fixed memory.
+
+    Values are hashed with pandas' stable 64-bit hash, so sketches built in
+    different processes can be merged.
+    """
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values) -> None:
+        values = pd.Series(pd.unique(np.asarray(values, dtype=object))).dropna()
+        if values.empty:
+            return
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        p = np.uint64(self.precision)
+        index = (hashes >> (np.uint64(64) - p)).astype(np.intp)
+        ranks = np.minimum(_leading_zeros(hashes << p) + 1, 64 - self.precision + 1)
+        np.maximum.at(self.registers, index, ranks.astype(np.uint8))
+
+    def merge(self, other: "HyperLogLog") -> None:
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    @property
+    def relative_error(self) -> float:
+        """Standard error of the estimate relative to the true count."""
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        empty = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and empty:
+            # Linear counting is more accurate for small cardinalities
+            return round(m * np.log(m / empty))
+        return round(raw)
+
+
+class KLLSketch:
+    """Mergeable quantile sketch (Karnin, Lang and Liberty) in fixed memory.
+
+    Level h holds items that each stand for 2**h values. When a level exceeds
+    its capacity it is sorted and every other item, from a random offset, moves
+    up a level. Capacities shrink geometrically below the top level.
+    """
+
+    # Normalized rank error at KLL_K = 200 with 99% confidence, as published
+    # for the reference KLL implementation (Apache DataSketches)
+    RANK_ERROR = 0.0165
+
+    def __init__(self, k: int = KLL_K, seed: int | None = None):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self) -> None:
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) <= self._capacity(level):
+                level += 1
+                continue
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(items)
+            # An odd item out stays behind at this level
+            leftover, items = items[: len(items) % 2], items[len(items) % 2 :]
+            promoted = items[self.rng.integers(2) :: 2]
+            self.levels[level] = leftover
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            # A new level shrinks the capacities below it, so start over
+            level = 0
+
+    def update(self, values) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other: "KLLSketch") -> None:
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+
+    def quantiles(self, qs) -> np.ndarray:
+        """Approximate values at the given quantiles (NaN if empty)."""
+        qs = np.asarray(qs, dtype=np.float64)
+        if self.count == 0:
+            return np.full(qs.shape, np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate(
+            [np.full(len(level), 2.0**h) for h, level in enumerate(self.levels)]
+        )
+        order = np.argsort(items, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        positions = np.searchsorted(cumulative, qs * cumulative[-1], side="left")
+        return items[order][np.minimum(positions, len(items) - 1)]
+
+
+class SpaceSaving:
+    """The heaviest keys by `weight` in at most `capacity` rows (Space-Saving).
+
+    Batches of per-key sums are added to the tracked rows. Beyond `capacity`
+    keys the lightest rows are evicted and `floor` rises to the heaviest weight
+    evicted so far. A key that comes back may have lost up to `floor` while it
+    was not tracked, so it restarts from `floor`: weights are never
+    underestimated and overestimated by at most the row's `error`. Other columns
+    only count what arrived while the key was tracked. With no more than
+    `capacity` distinct keys nothing is evicted and every row is exact.
+    """
+
+    def __init__(self, capacity: int, weight: str):
+        self.capacity = capacity
+        self.weight = weight
+        self.floor = 0.0
+        self.table = None
+
+    def update(self, sums: pd.DataFrame) -> None:
+        """Fold in a batch of exact per-key sums, indexed by key."""
+        error = np.zeros(len(sums))
+        if self.table is not None and self.floor:
+            error[~sums.index.isin(self.table.index)] = self.floor
+        sums = sums.assign(**{self.weight: sums[self.weight] + error, "error": error})
+        if self.table is not None:
+            sums = self.table.add(sums, fill_value=0)
+        if len(sums) > self.capacity:
+            sums = sums.sort_values(self.weight, ascending=False)
+            evicted = float(sums[self.weight].iloc[self.capacity])
+            self.floor = max(self.floor, evicted)
+            sums = sums.iloc[: self.capacity]
+        self.table = sums
+
+    def top(self, k: int) -> pd.DataFrame:
+        if self.table is None:
+            return pd.DataFrame(columns=[self.weight, "error"])
+        return self.table.nlargest(k, self.weight)
@@ -0,0 +1,266 @@
+import numpy as np
+import pandas as pd
+
+from flow_sketches import HyperLogLog, KLLSketch
+
+
+class RunningMoments:
+    """Count, mean, variance (Welford/Chan), min, max and sum of a stream."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.sum = 0.0
+
+    def update(self, values) -> None:
+        """Fold in a batch of values in one vectorized pass."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+        batch = RunningMoments()
+        batch.count = len(values)
+        batch.mean = float(values.mean())
+        batch.m2 = float(((values - batch.mean) ** 2).sum())
+        batch.min = float(values.min())
+        batch.max = float(values.max())
+        batch.sum = float(values.sum())
+        self.merge(batch)
+
+    def merge(self, other: "RunningMoments") -> None:
+        """Combine with moments of another, disjoint part of the stream."""
+        if other.count == 0:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta**2 * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sum += other.sum
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return self.variance**0.5
+
+
+class RunningCovariance:
+    """Mergeable pairwise-complete covariance/correlation of many columns.
+
+    Keeps, for every column pair, the number of rows where both are finite and
+    the sums of x, x**2 and x*y over those rows. Values are shifted by a per-column
+    reference (the first batch's mean) so the sums stay well conditioned.
+    """
+
+    def __init__(self, columns: list[str]):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.shift = None
+        self.count = np.zeros((k, k))
+        self.sums = np.zeros((k, k))  # sums[i, j]: sum of x_i where x_j is finite
+        self.squares = np.zeros((k, k))
+        self.products = np.zeros((k, k))
+
+    def update(self, df: pd.DataFrame) -> None:
+        """Fold in a batch of rows with a handful of matrix products."""
+        values = df[self.columns].to_numpy(dtype=np.float64)
+        finite = np.isfinite(values)
+        if self.shift is None:
+            with np.errstate(invalid="ignore"):
+                counts = finite.sum(axis=0)
+                totals = np.where(finite, values, 0.0).sum(axis=0)
+                self.shift = np.divide(
+                    totals, counts, out=np.zeros(len(counts)), where=counts > 0
+                )
+        values = np.where(finite, values - self.shift, 0.0)
+        mask = finite.astype(np.float64)
+        self.count += mask.T @ mask
+        self.sums += values.T @ mask
+        self.squares += (values * values).T @ mask
+        self.products += values.T @ values
+
+    def _rebase(self, shift: np.ndarray) -> None:
+        """Re-express the sums relative to another shift vector."""
+        delta = (self.shift - shift)[:, None]
+        self.products += (
+            self.sums * delta.T + delta * self.sums.T + delta * delta.T * self.count
+        )
+        self.squares += 2 * delta * self.sums + delta**2 * self.count
+        self.sums += delta * self.count
+        self.shift = shift
+
+    def copy(self) -> "RunningCovariance":
+        other = RunningCovariance(self.columns)
+        other.shift = None if self.shift is None else self.shift.copy()
+        other.count = self.count.copy()
+        other.sums = self.sums.copy()
+        other.squares = self.squares.copy()
+        other.products = self.products.copy()
+        return other
+
+    def merge(self, other: "RunningCovariance") -> None:
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge covariances of different columns")
+        if other.shift is None:
+            return
+        if self.shift is None:
+            self.shift = other.shift.copy()
+        if not np.array_equal(other.shift, self.shift):
+            other = other.copy()
+            other._rebase(self.shift)
+        self.count += other.count
+        self.sums += other.sums
+        self.squares += other.squares
+        self.products += other.products
+
+    def covariance(self) -> pd.DataFrame:
+        n = self.count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = (self.products - self.sums * self.sums.T / n) / (n - 1)
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    def correlation(self) -> pd.DataFrame:
+        """Pearson correlations; NaN where a column is constant over the pair."""
+        n = self.count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = n * self.products - self.sums * self.sums.T
+            var = n * self.squares - self.sums**2
+            corr = np.clip(cov / np.sqrt(var * var.T), -1.0, 1.0)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+class FlowAggregates:
+    """Mergeable running aggregates behind the summary statistics and report.
+
+    Memory is fixed whatever the number of flows: moments and sums are exact,
+    distinct IPs are HyperLogLog estimates and quantiles come from KLL sketches.
+    Expects chunks that already carry `flow_type` and `is_periodic`.
+    """
+
+    MOMENT_COLUMNS = ("flow_duration", "pkt_size_avg", "flow_byts_s")
+    SUM_COLUMNS = ("tot_fwd_pkts", "tot_bwd_pkts")
+    # Source columns folded in by update(), besides the derived ones
+    INPUT_COLUMNS = ("src_ip", "dst_ip", *MOMENT_COLUMNS, *SUM_COLUMNS)
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self):
+        self.flows = 0
+        self.periodic = 0
+        self.moments = {column: RunningMoments() for column in self.MOMENT_COLUMNS}
+        self.quantiles = {column: KLLSketch() for column in self.MOMENT_COLUMNS}
+        self.sums = {column: 0 for column in self.SUM_COLUMNS}
+        self.src_ips = HyperLogLog()
+        self.dst_ips = HyperLogLog()
+        self.flow_types = {}
+
+    def update(self, df: pd.DataFrame) -> None:
+        self.flows += len(df)
+        for column, moments in self.moments.items():
+            values = df[column].to_numpy()
+            moments.update(values)
+            self.quantiles[column].update(values)
+        for column in self.sums:
+            self.sums[column] += int(df[column].sum())
+        self.src_ips.update(df["src_ip"].unique())
+        self.dst_ips.update(df["dst_ip"].unique())
+        for flow_type, count in df["flow_type"].value_counts().items():
+            self.flow_types[flow_type] = self.flow_types.get(flow_type, 0) + count
+        if "is_periodic" in df:
+            self.periodic += int(df["is_periodic"].sum())
+
+    def merge(self, other: "FlowAggregates") -> None:
+        self.flows += other.flows
+        self.periodic += other.periodic
+        for column, moments in self.moments.items():
+            moments.merge(other.moments[column])
+            self.quantiles[column].merge(other.quantiles[column])
+        for column in self.sums:
+            self.sums[column] += other.sums[column]
+        self.src_ips.merge(other.src_ips)
+        self.dst_ips.merge(other.dst_ips)
+        for flow_type, count in other.flow_types.items():
+            self.flow_types[flow_type] = self.flow_types.get(flow_type, 0) + count
+
+    @property
+    def distinct_error(self) -> str:
+        # Three standard errors: about 99.7% of estimates are within this
+        return f"±{3 * self.src_ips.relative_error:.1%} (3σ)"
+
+    @property
+    def quantile_error(self) -> str:
+        return f"±{KLLSketch.RANK_ERROR:.2%} rank (99%)"
+
+    def _quantile_rows(self, column: str, label: str, digits: int) -> list[tuple]:
+        values = self.quantiles[column].quantiles(self.QUANTILES)
+        return [
+            (f"P{q * 100:g} {label}", f"{value:.{digits}f}", self.quantile_error)
+            for q, value in zip(self.QUANTILES, values)
+        ]
+
+    def summary_statistics(self) -> pd.DataFrame:
+        """Table of summary_statistics.csv, with the error bound of each value."""
+        duration = self.moments["flow_duration"]
+        rows = [
+            ("Total Flows", self.flows, "exact"),
+            ("Unique Source IPs", self.src_ips.estimate(), self.distinct_error),
+            ("Unique Destination IPs", self.dst_ips.estimate(), self.distinct_error),
+            ("Mean Flow Duration (s)", f"{duration.mean:.4f}", "exact"),
+            ("Max Flow Duration (s)", f"{duration.max:.4f}", "exact"),
+            ("Min Flow Duration (s)", f"{duration.min:.4f}", "exact"),
+            *self._quantile_rows("flow_duration", "Flow Duration (s)", 4),
+            (
+                "Mean Packet Size (bytes)",
+                f"{self.moments['pkt_size_avg'].mean:.2f}",
+                "exact",
+            ),
+            *self._quantile_rows("pkt_size_avg", "Packet Size (bytes)", 2),
+            (
+                "Mean Throughput (bytes/s)",
+                f"{self.moments['flow_byts_s'].mean:.2f}",
+                "exact",
+            ),
+            *self._quantile_rows("flow_byts_s", "Throughput (bytes/s)", 2),
+        ]
+        return pd.DataFrame(rows, columns=["Metric", "Value", "Error Bound"])
+
+    def summary_report(self) -> pd.DataFrame:
+        """Table of summary_report.csv, with the error bound of each value."""
+        most_common = (
+            max(sorted(self.flow_types), key=self.flow_types.get)
+            if self.flow_types
+            else None
+        )
+        rows = [
+            ("Total Flows", self.flows, "exact"),
+            ("Unique Source IPs", self.src_ips.estimate(), self.distinct_error),
+            ("Unique Destination IPs", self.dst_ips.estimate(), self.distinct_error),
+            (
+                "Average Flow Duration (s)",
+                self.moments["flow_duration"].mean,
+                "exact",
+            ),
+            (
+                "Average Throughput (bytes/s)",
+                self.moments["flow_byts_s"].mean,
+                "exact",
+            ),
+            (
+                "Average Packet Size (bytes)",
+                self.moments["pkt_size_avg"].mean,
+                "exact",
+            ),
+            ("Total Forward Packets", self.sums["tot_fwd_pkts"], "exact"),
+            ("Total Backward Packets", self.sums["tot_bwd_pkts"], "exact"),
+            ("Most Common Flow Type", most_common, "exact"),
+            ("Periodic Flows", self.periodic, "exact"),
+            ("Non-Periodic Flows", self.flows - self.periodic, "exact"),
+        ]
+        return pd.DataFrame(rows, columns=["Metric", "Value", "Error Bound"])
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+BYTE_COLUMNS = ["totlen_fwd_pkts", "totlen_bwd_pkts"]
+
+# Label of the rows that sum every flow type
+ALL_FLOWS = "All"
+
+
+def _per_bucket(index: np.ndarray, weights, groups: int, width: int) -> np.ndarray:
+    """Sum weights into a (groups, width) matrix at flat indices."""
+    totals = np.bincount(index, weights=weights, minlength=groups * width)
+    return totals.reshape(groups, width)
+
+
+def traffic_buckets(
+    df: pd.DataFrame,
+    bucket_seconds: float = 10.0,
+    rolling_seconds: float = 60.0,
+    group_column: str = "flow_type",
+) -> pd.DataFrame:
+    """Traffic per fixed time bucket, overall and per `group_column` value.
+
+    Each flow's bytes are spread evenly over its lifetime, so a long transfer
+    adds load to every bucket it spans rather than to its start bucket alone.
+    Rows: bucket start, group, flows started, flows active at any point in the
+    bucket, bytes, throughput and its rolling mean over `rolling_seconds`.
+    Per-group rows are only kept for buckets where that group was active.
+    """
+    starts = df["timestamp"]
+    origin = starts.min().floor(f"{bucket_seconds}s")
+    start = (starts - origin).dt.total_seconds().to_numpy()
+    duration = np.nan_to_num(df["flow_duration"].to_numpy(np.float64)).clip(min=0)
+    end = start + duration
+    size = df[BYTE_COLUMNS].sum(axis=1).to_numpy(np.float64)
+
+    first = (start // bucket_seconds).astype(np.int64)
+    last = (end // bucket_seconds).astype(np.int64)
+    buckets = int(last.max()) + 1 if len(df) else 0
+    groups = pd.Categorical(df[group_column])
+    codes = groups.codes.astype(np.int64)
+    n_groups = len(groups.categories)
+
+    # Bytes: partial first and last buckets plus a constant rate in between
+    same = first == last
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.where(same, 0.0, size / duration)
+    head = np.where(same, size, rate * ((first + 1) * bucket_seconds - start))
+    tail = rate * (end - last * bucket_seconds)
+    span = buckets + 1
+    middle = _per_bucket(
+        codes * span + first + 1, rate * bucket_seconds, n_groups, span
+    )
+    middle -= _per_bucket(codes * span + last, rate * bucket_seconds, n_groups, span)
+    volume = middle.cumsum(axis=1)[:, :buckets]
+    volume += _per_bucket(codes * buckets + first, head, n_groups, buckets)
+    volume += _per_bucket(codes * buckets + last, tail, n_groups, buckets)
+
+    started = _per_bucket(codes * buckets + first, None, n_groups, buckets)
+    active = _per_bucket(codes * span + first, None, n_groups, span)
+    active -= _per_bucket(codes * span + last + 1, None, n_groups, span)
+    active = active.cumsum(axis=1)[:, :buckets]
+
+    labels = [ALL_FLOWS] + list(groups.categories)
+    started = np.vstack([started.sum(axis=0), started])
+    active = np.vstack([active.sum(axis=0), active])
+    volume = np.vstack([volume.sum(axis=0), volume])
+    throughput = volume / bucket_seconds
+    window = max(1, round(rolling_seconds / bucket_seconds))
+    rolling = (
+        pd.DataFrame(throughput.T).rolling(window, min_periods=1).mean().to_numpy().T
+    )
+
+    bucket_start = origin + pd.to_timedelta(
+        np.arange(buckets) * bucket_seconds, unit="s"
+    )
+    table = pd.DataFrame(
+        {
+            "bucket_start": np.tile(bucket_start, len(labels)),
+            group_column: np.repeat(labels, buckets),
+            "flows": started.ravel().astype(np.int64),
+            "active_flows": np.rint(active.ravel()).astype(np.int64),
+            "bytes": volume.ravel(),
+            "throughput_bps": throughput.ravel(),
+            "rolling_throughput_bps": rolling.ravel(),
+        }
+    )
+    keep = (table[group_column] == ALL_FLOWS) | (table["active_flows"] > 0)
+    return table[keep].reset_index(drop=True)
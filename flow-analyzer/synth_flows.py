@@ -0,0 +1,144 @@
+import argparse
+import logging
+from collections.abc import Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from flow_io import TIMESTAMP_FORMAT, read_flow_csv
+
+logger = logging.getLogger("synth_flows")
+
+# Columns in seconds; a synthetic flow stretches all of them by the same factor
+TIME_COLUMNS = [
+    "flow_duration",
+    "flow_iat_mean",
+    "flow_iat_max",
+    "flow_iat_min",
+    "flow_iat_std",
+    "fwd_iat_tot",
+    "fwd_iat_max",
+    "fwd_iat_min",
+    "fwd_iat_mean",
+    "fwd_iat_std",
+    "bwd_iat_tot",
+    "bwd_iat_max",
+    "bwd_iat_min",
+    "bwd_iat_mean",
+    "bwd_iat_std",
+    "active_max",
+    "active_min",
+    "active_mean",
+    "active_std",
+    "idle_max",
+    "idle_min",
+    "idle_mean",
+    "idle_std",
+]
+# Per-second rates, which shrink by the same factor
+RATE_COLUMNS = ["flow_byts_s", "flow_pkts_s", "fwd_pkts_s", "bwd_pkts_s"]
+
+
+class FlowSynthesizer:
+    """Generate CICFlowMeter-schema flows resembling a sample capture.
+
+    Rows are bootstrapped from the sample, so the joint distribution of packet
+    counts, sizes and flags is kept. Each synthetic flow is then stretched in
+    time by a log-normal factor: durations, IATs and active/idle times are
+    multiplied by it and rates divided, which keeps every row self-consistent.
+    Start times follow a Poisson process at the sample's flow rate, and client
+    source ports are redrawn from the ephemeral range.
+    """
+
+    def __init__(self, sample: pd.DataFrame, jitter: float = 0.25, seed: int = 0):
+        self.sample = sample.reset_index(drop=True)
+        self.jitter = jitter
+        self.rng = np.random.default_rng(seed)
+
+        timestamps = self.sample["timestamp"]
+        span = (timestamps.max() - timestamps.min()).total_seconds()
+        self.flow_rate = len(self.sample) / max(span, 1.0)
+        self.next_start = timestamps.min()
+
+    def generate(self, rows: int, columns: Iterable[str] | None = None):
+        """Return `rows` synthetic flows, optionally only some columns."""
+        columns = list(self.sample.columns if columns is None else columns)
+        picks = self.rng.integers(0, len(self.sample), rows)
+        stretch = np.exp(self.rng.normal(0.0, self.jitter, rows))
+
+        data = {}
+        for column in columns:
+            if column == "timestamp":
+                continue
+            if column in ("src_ip", "dst_ip"):
+                codes = self.sample[column].cat.codes.to_numpy()[picks]
+                categories = self.sample[column].cat.categories
+                data[column] = pd.Categorical.from_codes(codes, categories=categories)
+                continue
+            values = self.sample[column].to_numpy()[picks]
+            if column in TIME_COLUMNS:
+                values = (values * stretch).astype(values.dtype)
+            elif column in RATE_COLUMNS:
+                values = (values / stretch).astype(values.dtype)
+            elif column == "src_port":
+                ephemeral = self.rng.integers(32768, 61000, rows, dtype=np.uint16)
+                values = np.where(values >= 32768, ephemeral, values)
+            data[column] = values
+
+        if "timestamp" in columns:
+            gaps = self.rng.exponential(1.0 / self.flow_rate, rows).cumsum()
+            starts = self.next_start + pd.to_timedelta(gaps, unit="s")
+            data["timestamp"] = starts.floor("s")
+            self.next_start = starts[-1]
+
+        return pd.DataFrame(data, columns=columns)
+
+    def iter_chunks(
+        self, rows: int, chunksize: int = 500_000, columns=None
+    ) -> Iterator[pd.DataFrame]:
+        for start in range(0, rows, chunksize):
+            yield self.generate(min(chunksize, rows - start), columns)
+
+
+def write_synthetic_csv(
+    synthesizer: FlowSynthesizer, rows: int, output_path: str, chunksize: int = 500_000
+) -> None:
+    """Write `rows` synthetic flows to a CSV in the CICFlowMeter layout."""
+    for i, chunk in enumerate(synthesizer.iter_chunks(rows, chunksize)):
+        chunk.to_csv(
+            output_path,
+            mode="w" if i == 0 else "a",
+            header=i == 0,
+            index=False,
+            date_format=TIMESTAMP_FORMAT,
+        )
+    logger.info(f"Wrote {rows} synthetic flows to {output_path}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic CICFlowMeter flows from a sample capture"
+    )
+    parser.add_argument("rows", type=int, help="number of flows to generate")
+    parser.add_argument("--sample", default="/data/flow.csv")
+    parser.add_argument("--output", default="flow_synthetic.csv")
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.25,
+        help="sigma of the log-normal time stretch per flow",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunksize", type=int, default=500_000)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    args = parse_args()
+    synthesizer = FlowSynthesizer(read_flow_csv(args.sample), args.jitter, args.seed)
+    write_synthetic_csv(synthesizer, args.rows, args.output, args.chunksize)
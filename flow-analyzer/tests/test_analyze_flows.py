@@ -0,0 +1,103 @@
+import functools
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import analyze_flows
+from flow_pipeline import STAGE_CACHE_DIR_NAME, plan_stages, source_columns
+
+
+@pytest.fixture
+def flow_csv(tmp_path):
+    rng = np.random.default_rng(0)
+    rows = 500
+    columns = source_columns(plan_stages(analyze_flows.STAGES, ["classify_flows"]))
+    df = pd.DataFrame(rng.integers(1, 1000, (rows, len(columns))), columns=columns)
+    df.insert(0, "src_ip", [f"10.0.0.{i % 20}" for i in range(rows)])
+    df.insert(1, "dst_ip", "10.0.1.1")
+    df.insert(2, "timestamp", "2025-01-01 00:00:00")
+    path = tmp_path / "flows.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Column lists of every flow load during the test."""
+    calls = []
+    load_flow_data = analyze_flows.load_flow_data
+
+    def counting(csv_path, columns=None, use_cache=True):
+        calls.append(columns)
+        return load_flow_data(csv_path, columns, use_cache)
+
+    monkeypatch.setattr(analyze_flows, "load_flow_data", counting)
+    return calls
+
+
+def test_derive_only_stage_reruns_from_cache(flow_csv, tmp_path, loads):
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    analyze_flows.run_pipeline(str(flow_csv), output_dir, ["classify_flows"])
+    assert len(loads) == 1
+    cached = list((output_dir / STAGE_CACHE_DIR_NAME).glob("classify_flows-*"))
+    assert len(cached) == 1
+
+    analyze_flows.run_pipeline(str(flow_csv), output_dir, ["classify_flows"])
+    assert len(loads) == 1
+    assert list((output_dir / STAGE_CACHE_DIR_NAME).glob("classify_flows-*")) == cached
+
+    analyze_flows.run_pipeline(
+        str(flow_csv), output_dir, ["classify_flows"], force=True
+    )
+    assert len(loads) == 2
+
+
+def test_changed_input_recomputes(flow_csv, tmp_path, loads):
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    analyze_flows.run_pipeline(str(flow_csv), output_dir, ["classify_flows"])
+    with open(flow_csv, "a") as f:
+        f.write(f"10.0.0.99,10.0.1.1,2025-01-01 00:00:01{',1' * 6}\n")
+    analyze_flows.run_pipeline(str(flow_csv), output_dir, ["classify_flows"])
+    assert len(loads) == 2
+    cached = list((output_dir / STAGE_CACHE_DIR_NAME).glob("classify_flows-*"))
+    assert len(cached) == 1
+    assert len(pd.read_parquet(cached[0])) == 501
+
+
+def test_report_reads_derived_columns_from_cache(flow_csv, tmp_path, loads):
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    analyze_flows.run_pipeline(str(flow_csv), output_dir, ["classify_flows"])
+    analyze_flows.run_pipeline(str(flow_csv), output_dir, ["plot_flow_classification"])
+    # Only the figure's source column is read; flow_type comes from the cache
+    assert loads[1] == ["flow_duration"]
+    assert (output_dir / "flow_classification.png").exists()
+
+    analyze_flows.run_pipeline(str(flow_csv), output_dir, ["plot_flow_classification"])
+    assert len(loads) == 2
+
+
+def test_rule_table_is_logged_once_per_run(tmp_path, monkeypatch, caplog):
+    rng = np.random.default_rng(1)
+    rows = 1000
+    columns = [c for c in analyze_flows.summary_columns() if not c.endswith("_ip")]
+    df = pd.DataFrame(rng.integers(1, 1000, (rows, len(columns))), columns=columns)
+    df.insert(0, "src_ip", [f"10.0.0.{i % 20}" for i in range(rows)])
+    df.insert(1, "dst_ip", "10.0.1.1")
+    path = tmp_path / "flows.csv"
+    df.to_csv(path, index=False)
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    chunked = functools.partial(analyze_flows.iter_flows, chunksize=100)
+    monkeypatch.setattr(analyze_flows, "iter_flows", chunked)
+
+    with caplog.at_level(logging.INFO):
+        aggregates = analyze_flows.summarize_flows(str(path), output_dir)
+        analyze_flows.run_pipeline(str(path), output_dir, ["classify_flows"])
+    assert aggregates.flows == rows
+    # Only the whole-frame classification logs it, not each of the ten chunks
+    assert caplog.text.count("=== Flow Classification ===") == 1
@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+
+from flow_io import cache_path_for, iter_flows, load_flows
+
+
+@pytest.fixture
+def flow_csv(tmp_path):
+    df = pd.DataFrame(
+        {
+            "src_ip": ["10.0.0.1", "10.0.0.2", "10.0.0.1", "10.0.0.3"],
+            "dst_ip": ["10.0.1.1"] * 4,
+            "dst_port": [443, 80, 443, 53],
+            "timestamp": ["2025-01-01 00:00:00"] * 4,
+            "flow_duration": [1.0, 2.0, 3.0, 4.0],
+        }
+    )
+    path = tmp_path / "flows.csv"
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def _plain(chunk: pd.DataFrame) -> pd.DataFrame:
+    return chunk.astype({"src_ip": str, "dst_ip": str}).reset_index(drop=True)
+
+
+def test_iter_flows_types_match_with_and_without_cache(flow_csv):
+    from_csv = list(iter_flows(flow_csv, chunksize=2, use_cache=False))
+    load_flows(flow_csv)
+    assert cache_path_for(flow_csv).exists()
+    from_cache = list(iter_flows(flow_csv, chunksize=2))
+
+    assert len(from_cache) == len(from_csv)
+    for cached, parsed in zip(from_cache, from_csv):
+        for column in ("src_ip", "dst_ip"):
+            assert isinstance(cached[column].dtype, pd.CategoricalDtype)
+            assert isinstance(parsed[column].dtype, pd.CategoricalDtype)
+        assert cached.dtypes.drop(["src_ip", "dst_ip"]).equals(
+            parsed.dtypes.drop(["src_ip", "dst_ip"])
+        )
+        pd.testing.assert_frame_equal(_plain(cached), _plain(parsed))
+
+
+def test_iter_flows_projects_cached_columns(flow_csv, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    load_flows(flow_csv, cache_dir=cache_dir)
+    (chunk,) = iter_flows(flow_csv, ["dst_port", "src_ip"], cache_dir=cache_dir)
+    assert list(chunk.columns) == ["src_ip", "dst_port"]
+    assert isinstance(chunk["src_ip"].dtype, pd.CategoricalDtype)
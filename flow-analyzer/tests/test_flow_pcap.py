@@ -0,0 +1,163 @@
+import socket
+import struct
+
+import pytest
+
+from flow_pcap import (
+    ACK,
+    DLT_EN10MB,
+    DLT_RAW,
+    PCAP_COLUMNS,
+    SYN,
+    TCP,
+    UDP,
+    decode_packet,
+    iter_capture_flows,
+    iter_packets,
+)
+
+
+def ipv4_tcp(src: str, dst: str, sport: int, dport: int, flags: int) -> bytes:
+    ip = struct.pack(
+        "!BBHHHBBH4s4s",
+        0x45,
+        0,
+        40,
+        1,
+        0x4000,  # don't fragment
+        64,
+        TCP,
+        0,
+        socket.inet_aton(src),
+        socket.inet_aton(dst),
+    )
+    tcp = struct.pack("!HHIIBBHHH", sport, dport, 0, 0, 0x50, flags, 512, 0, 0)
+    return ip + tcp
+
+
+def ipv6_udp(src: str, dst: str, sport: int, dport: int, payload: bytes) -> bytes:
+    ip = struct.pack(
+        "!IHBB16s16s",
+        6 << 28,
+        8 + len(payload),
+        UDP,
+        64,
+        socket.inet_pton(socket.AF_INET6, src),
+        socket.inet_pton(socket.AF_INET6, dst),
+    )
+    return ip + struct.pack("!HHHH", sport, dport, 8 + len(payload), 0) + payload
+
+
+def ethernet(packet: bytes, ethertype: int = 0x0800, vlan: int | None = None) -> bytes:
+    header = b"\x02" * 6 + b"\x04" * 6
+    if vlan is not None:
+        header += struct.pack("!HH", 0x8100, vlan)
+    return header + struct.pack("!H", ethertype) + packet
+
+
+def pcap(
+    packets: list[tuple[float, bytes]], linktype: int, endian="<", nanoseconds=False
+) -> bytes:
+    magic = 0xA1B23C4D if nanoseconds else 0xA1B2C3D4
+    scale = 1e9 if nanoseconds else 1e6
+    buf = struct.pack(endian + "IHHiIII", magic, 2, 4, 0, 0, 65535, linktype)
+    for ts, data in packets:
+        seconds = int(ts)
+        fraction = round((ts - seconds) * scale)
+        buf += struct.pack(endian + "IIII", seconds, fraction, len(data), len(data))
+        buf += data
+    return buf
+
+
+def pcapng(packets: list[tuple[float, bytes]], linktype: int, tsresol: int) -> bytes:
+    def block(block_type: int, body: bytes) -> bytes:
+        body += b"\0" * (-len(body) % 4)
+        length = 12 + len(body)
+        return struct.pack("<II", block_type, length) + body + struct.pack("<I", length)
+
+    section = block(0x0A0D0D0A, struct.pack("<IHHq", 0x1A2B3C4D, 1, 0, -1))
+    option = struct.pack("<HHB3x", 9, 1, tsresol) + struct.pack("<HH", 0, 0)
+    interface = block(1, struct.pack("<HHI", linktype, 0, 65535) + option)
+    buf = section + interface
+    for ts, data in packets:
+        units = round(ts * 10**tsresol)
+        header = struct.pack(
+            "<IIIII", 0, units >> 32, units & 0xFFFFFFFF, len(data), len(data)
+        )
+        buf += block(6, header + data)
+    return buf
+
+
+def test_pcap_header_and_records():
+    syn = ethernet(ipv4_tcp("10.0.0.1", "10.0.0.2", 40000, 443, SYN))
+    buf = pcap([(1700000000.25, syn), (1700000001.5, syn)], DLT_EN10MB)
+    packets = list(iter_packets(buf))
+
+    assert [p[0] for p in packets] == pytest.approx([1700000000.25, 1700000001.5])
+    _, linktype, offset, caplen, length = packets[0]
+    assert (linktype, offset, caplen, length) == (DLT_EN10MB, 40, len(syn), len(syn))
+    assert buf[offset : offset + caplen] == syn
+
+
+def test_big_endian_nanosecond_pcap():
+    packet = ipv4_tcp("10.0.0.1", "10.0.0.2", 1, 2, ACK)
+    buf = pcap([(12.000000123, packet)], DLT_RAW, endian=">", nanoseconds=True)
+    ((ts, linktype, *_),) = iter_packets(buf)
+    assert linktype == DLT_RAW
+    assert ts == pytest.approx(12.000000123, abs=1e-12)
+
+
+def test_truncated_last_record_is_skipped():
+    packet = ipv4_tcp("10.0.0.1", "10.0.0.2", 1, 2, ACK)
+    buf = pcap([(1.0, packet), (2.0, packet)], DLT_RAW)
+    assert len(list(iter_packets(buf[:-10]))) == 1
+
+
+def test_pcapng_interface_resolution():
+    packet = ipv4_tcp("10.0.0.1", "10.0.0.2", 1, 2, ACK)
+    buf = pcapng([(5.000000007, packet)], DLT_RAW, tsresol=9)
+    ((ts, linktype, offset, caplen, _),) = iter_packets(buf)
+    assert linktype == DLT_RAW
+    assert ts == pytest.approx(5.000000007, abs=1e-12)
+    assert buf[offset : offset + caplen] == packet
+
+
+def test_not_a_capture():
+    with pytest.raises(ValueError):
+        list(iter_packets(b"src_ip,dst_ip,src_port\n"))
+
+
+def test_decode_vlan_ipv4_tcp():
+    frame = ethernet(ipv4_tcp("10.0.0.1", "10.0.0.2", 40000, 443, SYN), vlan=7)
+    src, dst, sport, dport, protocol, header, flags, window = decode_packet(
+        frame, DLT_EN10MB, 0, len(frame)
+    )
+    assert (socket.inet_ntoa(src), socket.inet_ntoa(dst)) == ("10.0.0.1", "10.0.0.2")
+    assert (sport, dport, protocol, header, flags, window) == (
+        40000,
+        443,
+        TCP,
+        20,
+        SYN,
+        512,
+    )
+
+
+def test_decode_ipv6_udp_and_skip_other_ethertypes():
+    frame = ethernet(ipv6_udp("fe80::1", "fe80::2", 5353, 53, b"abcd"), 0x86DD)
+    decoded = decode_packet(frame, DLT_EN10MB, 0, len(frame))
+    assert decoded[2:6] == (5353, 53, UDP, 40)
+    arp = ethernet(b"\0" * 28, ethertype=0x0806)
+    assert decode_packet(arp, DLT_EN10MB, 0, len(arp)) is None
+
+
+def test_capture_flows_pair_both_directions():
+    forward = ipv4_tcp("10.0.0.1", "10.0.0.2", 40000, 443, SYN)
+    backward = ipv4_tcp("10.0.0.2", "10.0.0.1", 443, 40000, SYN | ACK)
+    buf = pcap([(10.0, forward), (10.5, backward), (11.0, forward)], DLT_RAW)
+    (record,) = iter_capture_flows(buf)
+    flow = dict(zip(PCAP_COLUMNS, record))
+    assert (flow["src_ip"], flow["dst_ip"]) == ("10.0.0.1", "10.0.0.2")
+    assert (flow["src_port"], flow["dst_port"], flow["protocol"]) == (40000, 443, TCP)
+    assert (flow["tot_fwd_pkts"], flow["tot_bwd_pkts"]) == (2, 1)
+    assert flow["totlen_fwd_pkts"] == 80
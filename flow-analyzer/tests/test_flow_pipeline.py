@@ -0,0 +1,166 @@
+import importlib.util
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+from flow_pipeline import (
+    ALL_COLUMNS,
+    DERIVE,
+    REPORT,
+    Stage,
+    code_fingerprint,
+    plan_stages,
+    source_columns,
+    stage_keys,
+)
+
+STAGE_MODULE = """
+THRESHOLD = {threshold}
+
+
+def is_large(values):
+    return values > THRESHOLD * {scale}
+
+
+def flag_large(df):
+    return is_large(df["size"])
+"""
+
+
+# Containers of objects whose repr holds their address, and a set of strings,
+# whose order depends on the hash seed
+OBJECT_STAGE_MODULE = """
+from flow_pipeline import DERIVE, Stage
+
+
+class Rule:
+    pass
+
+
+RULES = {"large": Rule(), "small": Rule()}
+PORTS = {"http", "https", "ssh", "dns"}
+UPSTREAM = {"a": Stage("a", len, DERIVE, ["x"], ["a"], version="1")}
+
+
+def flag(df):
+    return df["port"].isin(PORTS) & bool(RULES) & bool(UPSTREAM)
+"""
+
+
+def load_stage_module(directory, threshold=10, scale=1):
+    """A stage function with a helper and a constant, from its own module."""
+    path = directory / "stage_module.py"
+    path.write_text(textwrap.dedent(STAGE_MODULE.format(**locals())))
+    spec = importlib.util.spec_from_file_location(f"stage_{directory.name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.flag_large
+
+
+def derive(name, inputs, outputs):
+    return Stage(name, lambda df: df, DERIVE, inputs, outputs)
+
+
+def report(name, inputs):
+    return Stage(name, lambda df, output_dir: None, REPORT, inputs, [name])
+
+
+STAGES = {
+    "a": derive("a", ["x"], ["a"]),
+    "b": derive("b", ["a", "y"], ["b"]),
+    "c": derive("c", ["z"], ["c"]),
+    "report_b": report("report_b", ["b", "x"]),
+    "report_c": report("report_c", ["c", "a"]),
+    "dump": report("dump", [ALL_COLUMNS, "c"]),
+}
+
+
+def test_plan_adds_upstream_stages_in_declaration_order():
+    plan = plan_stages(STAGES, ["report_c", "report_b"])
+    assert [stage.name for stage in plan] == ["a", "b", "c", "report_b", "report_c"]
+    assert [stage.name for stage in plan_stages(STAGES, ["b"])] == ["a", "b"]
+
+
+def test_plan_rejects_unknown_stages():
+    with pytest.raises(ValueError, match="missing"):
+        plan_stages(STAGES, ["missing"])
+
+
+def test_source_columns_skip_derived_columns():
+    assert source_columns(plan_stages(STAGES, ["report_b"])) == ["x", "y"]
+    assert source_columns(plan_stages(STAGES, ["dump"])) is None
+
+
+def test_stage_keys_follow_upstream_changes():
+    plan = plan_stages(STAGES, ["report_b", "report_c"])
+    keys = stage_keys(plan, "file-1")
+    assert keys == stage_keys(plan, "file-1")
+    other_file = stage_keys(plan, "file-2")
+    assert all(other_file[name] != key for name, key in keys.items())
+
+    changed = dict(STAGES, a=derive("a", ["x"], ["a"]))
+    changed["a"].version = "2"
+    changed_keys = stage_keys(plan_stages(changed, ["report_b", "report_c"]), "file-1")
+    assert changed_keys["c"] == keys["c"]
+    for name in ("a", "b", "report_b", "report_c"):
+        assert changed_keys[name] != keys[name]
+
+
+def test_fingerprint_is_stable_across_identical_modules(tmp_path):
+    (tmp_path / "one").mkdir()
+    (tmp_path / "two").mkdir()
+    assert code_fingerprint(load_stage_module(tmp_path / "one")) == code_fingerprint(
+        load_stage_module(tmp_path / "two")
+    )
+
+
+def test_fingerprint_changes_with_module_constant(tmp_path):
+    (tmp_path / "one").mkdir()
+    (tmp_path / "two").mkdir()
+    before = load_stage_module(tmp_path / "one", threshold=10)
+    after = load_stage_module(tmp_path / "two", threshold=20)
+    assert code_fingerprint(before) != code_fingerprint(after)
+
+
+def test_fingerprint_changes_with_helper_literal(tmp_path):
+    (tmp_path / "one").mkdir()
+    (tmp_path / "two").mkdir()
+    before = load_stage_module(tmp_path / "one", scale=1)
+    after = load_stage_module(tmp_path / "two", scale=2)
+    assert code_fingerprint(before) != code_fingerprint(after)
+
+
+def test_fingerprint_is_stable_across_processes(tmp_path):
+    (tmp_path / "object_stages.py").write_text(OBJECT_STAGE_MODULE)
+    script = (
+        "import object_stages, flow_pipeline; "
+        "print(flow_pipeline.code_fingerprint(object_stages.flag))"
+    )
+    fingerprints = set()
+    for seed in ("1", "2"):
+        env = dict(os.environ, PYTHONPATH=str(tmp_path), PYTHONHASHSEED=seed)
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=Path(__file__).parents[1],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        fingerprints.add(result.stdout)
+    assert len(fingerprints) == 1
+
+
+def test_stage_key_changes_with_constant(tmp_path):
+    (tmp_path / "one").mkdir()
+    (tmp_path / "two").mkdir()
+    keys = []
+    for directory, threshold in (("one", 10), ("two", 11)):
+        func = load_stage_module(tmp_path / directory, threshold=threshold)
+        plan = [Stage("flag_large", func, DERIVE, ["size"], ["is_large"])]
+        keys.append(stage_keys(plan, "file-1")["flag_large"])
+    assert keys[0] != keys[1]
@@ -0,0 +1,61 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from flow_rules import FlowRules, load_flow_rules
+
+RULES = [
+    {"name": "Large", "when": "size > 100"},
+    {"name": "Slow", "when": "duration > 1 and size > 10"},
+]
+
+
+def test_first_matching_rule_wins():
+    df = pd.DataFrame({"size": [500, 50, 500, 5], "duration": [2, 2, 0, 2]})
+    flow_types, report = FlowRules(RULES).classify(df)
+    assert list(flow_types) == ["Large", "Slow", "Large", "Other"]
+    assert list(flow_types.categories) == ["Large", "Slow", "Other"]
+    # Slow matches the first row too, but Large assigned it first
+    assert report.to_dict("records") == [
+        {"Rule": "Large", "Matched": 2, "Assigned": 2},
+        {"Rule": "Slow", "Matched": 2, "Assigned": 1},
+        {"Rule": "Other", "Matched": 1, "Assigned": 1},
+    ]
+
+
+def test_columns_are_the_names_in_conditions():
+    assert FlowRules(RULES).columns == ["size", "duration"]
+
+
+@pytest.mark.parametrize(
+    "rules",
+    [
+        [{"name": "A", "when": "x > 1"}, {"name": "A", "when": "x > 2"}],
+        [{"name": "Other", "when": "x > 1"}],
+        [{"name": "A", "when": ""}],
+    ],
+)
+def test_invalid_rules(rules):
+    with pytest.raises(ValueError):
+        FlowRules(rules)
+
+
+def test_failing_condition_names_the_rule():
+    rules = FlowRules([{"name": "Broken", "when": "missing_column > 1"}])
+    with pytest.raises(ValueError, match="Broken"):
+        rules.classify(pd.DataFrame({"size": np.arange(3)}))
+
+
+def test_load_rules_from_file(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"default": "Unknown", "rules": RULES}))
+    rules = load_flow_rules(path)
+    assert rules.categories == ["Large", "Slow", "Unknown"]
+
+
+def test_default_rules_load():
+    rules = load_flow_rules()
+    assert rules.default in rules.categories
+    assert len(rules.categories) == len(rules.rules) + 1
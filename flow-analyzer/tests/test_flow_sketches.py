@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+from flow_sketches import HyperLogLog, KLLSketch, SpaceSaving
+
+
+def test_hyperloglog_estimate_within_error():
+    sketch = HyperLogLog()
+    sketch.update(np.arange(200_000))
+    error = abs(sketch.estimate() - 200_000) / 200_000
+    assert error < 4 * sketch.relative_error
+
+
+def test_hyperloglog_counts_duplicates_once():
+    sketch = HyperLogLog()
+    sketch.update([f"10.0.0.{i}" for i in range(100)] * 3)
+    # Linear counting: only the odd register collision is lost
+    assert 97 <= sketch.estimate() <= 100
+
+
+def test_hyperloglog_merge_equals_union():
+    left, right, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    left.update(np.arange(0, 60_000))
+    right.update(np.arange(40_000, 100_000))
+    union.update(np.arange(0, 100_000))
+    left.merge(right)
+    np.testing.assert_array_equal(left.registers, union.registers)
+    assert left.estimate() == union.estimate()
+
+
+def _rank_errors(sketch: KLLSketch, values: np.ndarray, qs: list[float]):
+    ordered = np.sort(values)
+    estimates = sketch.quantiles(qs)
+    ranks = np.searchsorted(ordered, estimates, side="right") / len(ordered)
+    return np.abs(ranks - np.asarray(qs))
+
+
+def test_kll_quantiles_within_rank_error():
+    values = np.random.default_rng(1).lognormal(size=100_000)
+    sketch = KLLSketch(seed=1)
+    for chunk in np.array_split(values, 37):
+        sketch.update(chunk)
+    qs = [0.01, 0.25, 0.5, 0.9, 0.99]
+    assert sketch.count == len(values)
+    assert sum(len(level) for level in sketch.levels) < 4 * sketch.k
+    assert np.all(_rank_errors(sketch, values, qs) <= KLLSketch.RANK_ERROR)
+
+
+def test_kll_merge_within_rank_error():
+    rng = np.random.default_rng(2)
+    values = np.concatenate([rng.normal(0, 1, 60_000), rng.normal(5, 2, 40_000)])
+    left, right = KLLSketch(seed=3), KLLSketch(seed=4)
+    left.update(values[:60_000])
+    right.update(values[60_000:])
+    left.merge(right)
+    qs = [0.05, 0.5, 0.6, 0.95]
+    assert left.count == len(values)
+    assert np.all(_rank_errors(left, values, qs) <= KLLSketch.RANK_ERROR)
+
+
+def test_kll_skips_non_finite_and_empty_is_nan():
+    sketch = KLLSketch()
+    assert np.isnan(sketch.quantiles([0.5])).all()
+    sketch.update([1.0, np.nan, np.inf, 3.0, 2.0])
+    assert sketch.count == 3
+    assert sketch.quantiles([0.5])[0] == 2.0
+
+
+def _sums(keys: np.ndarray, weights: np.ndarray) -> pd.DataFrame:
+    frame = pd.DataFrame({"key": keys, "bytes": weights, "flows": 1})
+    return frame.groupby("key").sum()
+
+
+def test_space_saving_bounds_after_eviction():
+    rng = np.random.default_rng(5)
+    keys = rng.zipf(1.5, 50_000) % 5_000
+    weights = rng.integers(1, 1_000, len(keys)).astype(np.float64)
+    heavy = SpaceSaving(capacity=200, weight="bytes")
+    for batch in np.array_split(np.arange(len(keys)), 25):
+        heavy.update(_sums(keys[batch], weights[batch]))
+
+    exact = _sums(keys, weights)["bytes"]
+    top = heavy.top(20)
+    truth = exact.loc[top.index]
+    assert heavy.floor > 0
+    assert (top["bytes"] >= truth).all()
+    assert (top["bytes"] - top["error"] <= truth).all()
+    # Keys heavier than the floor are never evicted
+    assert set(exact[exact > heavy.floor].index) <= set(heavy.table.index)
+
+
+def test_space_saving_exact_without_eviction():
+    rng = np.random.default_rng(6)
+    keys = rng.integers(0, 50, 5_000)
+    weights = rng.random(len(keys))
+    heavy = SpaceSaving(capacity=50, weight="bytes")
+    for batch in np.array_split(np.arange(len(keys)), 10):
+        heavy.update(_sums(keys[batch], weights[batch]))
+
+    exact = _sums(keys, weights)
+    top = heavy.top(10)
+    assert heavy.floor == 0
+    assert (top["error"] == 0).all()
+    pd.testing.assert_series_equal(
+        top["bytes"], exact["bytes"].nlargest(10), check_exact=False
+    )
+    assert (top["flows"] == exact.loc[top.index, "flows"]).all()
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from flow_stats import RunningCovariance, RunningMoments
+
+COLUMNS = ["a", "b", "c"]
+
+
+def test_running_moments_match_numpy():
+    values = np.random.default_rng(0).lognormal(3, 1, 10_000)
+    moments = RunningMoments()
+    for chunk in np.array_split(values, 13):
+        moments.update(chunk)
+    assert moments.count == len(values)
+    assert np.isclose(moments.mean, values.mean())
+    assert np.isclose(moments.variance, values.var(ddof=1))
+    assert (moments.min, moments.max) == (values.min(), values.max())
+    assert np.isclose(moments.sum, values.sum())
+
+
+def test_merged_moments_skip_non_finite():
+    left, right = RunningMoments(), RunningMoments()
+    left.update([1.0, 2.0, np.nan])
+    right.update([3.0, np.inf, 4.0])
+    left.merge(right)
+    assert left.count == 4
+    assert np.isclose(left.mean, 2.5)
+    assert np.isclose(left.variance, np.var([1, 2, 3, 4], ddof=1))
+    assert RunningMoments().variance == 0.0
+
+
+def _frame(rows: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    a = rng.normal(1e6, 10, rows)
+    values = np.column_stack([a, 3 * a + rng.normal(0, 5, rows), rng.random(rows)])
+    values[rng.random(values.shape) < 0.2] = np.nan
+    values[rng.random(rows) < 0.05, 2] = np.inf
+    return pd.DataFrame(values, columns=COLUMNS)
+
+
+def _pairwise_cov(df: pd.DataFrame) -> np.ndarray:
+    values = df.to_numpy()
+    finite = np.isfinite(values)
+    expected = np.empty((len(COLUMNS), len(COLUMNS)))
+    for i in range(len(COLUMNS)):
+        for j in range(len(COLUMNS)):
+            both = finite[:, i] & finite[:, j]
+            expected[i, j] = np.cov(values[both, i], values[both, j])[0, 1]
+    return expected
+
+
+def test_covariance_matches_numpy_on_pairwise_complete_rows():
+    df = _frame(5_000, 0)
+    running = RunningCovariance(COLUMNS)
+    for start in range(0, len(df), 700):
+        running.update(df.iloc[start : start + 700])
+    np.testing.assert_allclose(running.covariance().to_numpy(), _pairwise_cov(df))
+    np.testing.assert_allclose(
+        running.correlation().to_numpy(),
+        df.replace(np.inf, np.nan).corr().to_numpy(),
+        atol=1e-9,
+    )
+
+
+def test_merged_covariance_matches_numpy():
+    first, second = _frame(3_000, 1), _frame(2_000, 2)
+    second[["a", "b"]] += 500
+    left, right = RunningCovariance(COLUMNS), RunningCovariance(COLUMNS)
+    left.update(first)
+    right.update(second)
+    left.merge(right)
+
+    df = pd.concat([first, second], ignore_index=True)
+    np.testing.assert_allclose(left.covariance().to_numpy(), _pairwise_cov(df))
@@ -0,0 +1,346 @@
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import httpx
+
+from main import app
+
+# The request mixes replay the client's TRAFFIC_PATTERNS, and latencies are
+# summarised with the client's percentile so that both report the same figures
+CLIENT_DIR = Path(__file__).resolve().parent.parent / "client"
+sys.path.append(str(CLIENT_DIR))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+logger = logging.getLogger("benchmark")
+
+BENCH_USER = {"username": "bench", "email": "bench@example.com", "password": "bench"}
+
+# Request templates for every endpoint: (method, path, request kwargs)
+ENDPOINTS = {
+    "GET /": ("GET", "/", {}),
+    "GET /health": ("GET", "/health", {}),
+    "POST /users/register": ("POST", "/users/register", {}),
+    "POST /users/login": (
+        "POST",
+        "/users/login",
+        {"json": {"username": "bench", "password": "bench"}},
+    ),
+    "GET /users/{username}": ("GET", "/users/bench", {}),
+    "POST /messages": (
+        "POST",
+        "/messages",
+        {"json": {"user_id": "bench", "content": "Normal message"}},
+    ),
+    "GET /messages": ("GET", "/messages", {"params": {"limit": 5, "offset": 0}}),
+    "GET /data": ("GET", "/data", {}),
+    "GET /data/large": ("GET", "/data/large", {}),
+    "GET /search": (
+        "GET",
+        "/search",
+        {"params": {"q": "search term", "category": "tech", "limit": 10}},
+    ),
+    "POST /upload/metadata": (
+        "POST",
+        "/upload/metadata",
+        {
+            "json": {
+                "filename": "document_1.pdf",
+                "size": 102400,
+                "content_type": "application/pdf",
+            }
+        },
+    ),
+    "POST /echo": (
+        "POST",
+        "/echo",
+        {
+            "json": {
+                "name": "test",
+                "value": 42,
+                "data": {"nested": "value", "array": list(range(100))},
+                "extra_fields": [{"id": i, "data": f"field_{i}"} for i in range(50)],
+            }
+        },
+    ),
+    "DELETE /users/{username}": ("DELETE", "/users/bench_{seq}", {}),
+}
+
+
+def request_mixes() -> dict:
+    """Endpoint sequences of traced cycles of every client traffic pattern, with
+    composite actions (polling, download sessions, bursts) expanded"""
+    # Both services have a main module, so the client's is loaded under another name
+    spec = importlib.util.spec_from_file_location("client_main", CLIENT_DIR / "main.py")
+    client = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(client)
+    from request_mix import trace_patterns
+
+    return {
+        name: {
+            "weight": pattern["weight"],
+            "cycles": [[r.endpoint for r in cycle] for cycle in pattern["cycles"]],
+        }
+        for name, pattern in trace_patterns(client).items()
+    }
+
+
+def latency_summary(latencies: list[float], elapsed: float) -> dict:
+    from load_stats import percentile
+
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "throughput_rps": len(ordered) / elapsed if elapsed else 0.0,
+        "mean_us": sum(ordered) / len(ordered) * 1e6 if ordered else 0.0,
+        "p50_us": percentile(ordered, 50) * 1e6,
+        "p95_us": percentile(ordered, 95) * 1e6,
+        "p99_us": percentile(ordered, 99) * 1e6,
+    }
+
+
+async def _prepare(client: httpx.AsyncClient, endpoint: str, seqs: range) -> None:
+    """Create the users a DELETE run needs, outside the timed loop"""
+    if endpoint == "DELETE /users/{username}":
+        for seq in seqs:
+            await client.post(
+                "/users/register", json={**BENCH_USER, "username": f"bench_{seq}"}
+            )
+
+
+async def _request(client: httpx.AsyncClient, endpoint: str, seq: int):
+    method, path, kwargs = ENDPOINTS[endpoint]
+    if endpoint == "POST /users/register":
+        kwargs = {"json": {**BENCH_USER, "username": f"bench_{seq}"}}
+    elif endpoint == "DELETE /users/{username}":
+        path = f"/users/bench_{seq}"
+    response = await client.request(method, path, **kwargs)
+    if response.status_code >= 400:
+        raise RuntimeError(f"{endpoint} returned {response.status_code}")
+    return response
+
+
+async def bench_endpoint(client: httpx.AsyncClient, endpoint: str, seqs: range):
+    """Time sequential calls of one endpoint"""
+    await _prepare(client, endpoint, seqs)
+    latencies = []
+    start = time.perf_counter()
+    for seq in seqs:
+        t0 = time.perf_counter()
+        await _request(client, endpoint, seq)
+        latencies.append(time.perf_counter() - t0)
+    return latency_summary(latencies, time.perf_counter() - start)
+
+
+async def measure_allocations(client: httpx.AsyncClient, endpoint: str, seqs: range):
+    """Memory allocated per request, tracked separately to keep timings clean"""
+    await _prepare(client, endpoint, seqs)
+    peaks = []
+    retained = []
+    tracemalloc.start()
+    try:
+        for seq in seqs:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            await _request(client, endpoint, seq)
+            after, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(after - before)
+    finally:
+        tracemalloc.stop()
+    return {
+        "peak_alloc_bytes": sum(peaks) / len(peaks),
+        "retained_bytes": sum(retained) / len(retained),
+    }
+
+
+async def bench_mix(
+    client: httpx.AsyncClient, mix: dict, cycles: int, concurrency: int, seed: int
+):
+    """Replay pattern cycles drawn by weight, `concurrency` virtual users at a time"""
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name]["weight"] for name in names]
+    queue = [
+        rng.choice(mix[name]["cycles"])
+        for name in rng.choices(names, weights=weights, k=cycles)
+    ]
+    latencies: dict[str, list[float]] = {}
+    seq = iter(range(3_000_000, 4_000_000))
+
+    async def user():
+        while queue:
+            for endpoint in queue.pop():
+                t0 = time.perf_counter()
+                await _request(client, endpoint, next(seq))
+                latencies.setdefault(endpoint, []).append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    total = [latency for values in latencies.values() for latency in values]
+    return {
+        "cycles": cycles,
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "total": latency_summary(total, elapsed),
+        "endpoints": {
+            endpoint: latency_summary(values, elapsed)
+            for endpoint, values in sorted(latencies.items())
+        },
+    }
+
+
+async def run_benchmarks(args: argparse.Namespace) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        await client.post("/users/register", json=BENCH_USER)
+        await client.post("/users/login", json=BENCH_USER)
+
+        endpoints = {}
+        for endpoint in args.endpoint or ENDPOINTS:
+            # Distinct sequence ranges keep registered usernames unique per phase
+            warmup = range(1_000_000, 1_000_000 + args.warmup)
+            await bench_endpoint(client, endpoint, warmup)
+            result = await bench_endpoint(client, endpoint, range(args.requests))
+            if args.allocations:
+                allocs = range(2_000_000, 2_000_000 + args.alloc_requests)
+                result.update(await measure_allocations(client, endpoint, allocs))
+            endpoints[endpoint] = result
+            logger.info(
+                f"{endpoint:<28}{result['throughput_rps']:>10.0f} rps"
+                f"{result['p50_us']:>10.0f}us p50{result['p99_us']:>10.0f}us p99"
+            )
+
+        patterns = request_mixes()
+        mixes = {"all_patterns": patterns}
+        mixes.update({name: {name: patterns[name]} for name in patterns})
+        mix_results = {}
+        for name, mix in mixes.items():
+            result = await bench_mix(
+                client, mix, args.cycles, args.concurrency, args.seed
+            )
+            mix_results[name] = result
+            logger.info(
+                f"mix {name:<24}{result['total']['throughput_rps']:>10.0f} rps"
+                f"{result['total']['p99_us']:>10.0f}us p99"
+            )
+
+    return {"endpoints": endpoints, "mixes": mix_results}
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """List endpoints and mixes whose throughput dropped more than `threshold`"""
+    regressions = []
+    sections = [
+        ("endpoints", "endpoint", lambda r: r["throughput_rps"]),
+        ("mixes", "mix", lambda r: r["total"]["throughput_rps"]),
+    ]
+    for section, label, throughput in sections:
+        for name, result in current[section].items():
+            if name not in baseline.get(section, {}):
+                continue
+            before = throughput(baseline[section][name])
+            after = throughput(result)
+            if before and (before - after) / before > threshold:
+                regressions.append(
+                    f"{label} {name}: {before:.0f} -> {after:.0f} rps "
+                    f"({(after - before) / before:+.1%})"
+                )
+    return regressions
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="In-process ASGI benchmark of every server endpoint"
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument(
+        "--endpoint",
+        action="append",
+        choices=list(ENDPOINTS),
+        help="benchmark only this endpoint (repeatable)",
+    )
+    parser.add_argument(
+        "--cycles", type=int, default=500, help="pattern cycles per mix"
+    )
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--no-allocations",
+        dest="allocations",
+        action="store_false",
+        help="skip the tracemalloc pass",
+    )
+    parser.add_argument("--alloc-requests", type=int, default=50)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="relative throughput drop reported as a regression",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    # httpx logs every request at INFO, which would dominate the timings
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "parameters": {
+            "requests": args.requests,
+            "cycles": args.cycles,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        **asyncio.run(run_benchmarks(args)),
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            logger.warning(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        logger.info(f"No regressions against {args.compare}")